@@ -0,0 +1,270 @@
+"""記録済みHTMLを返すローカルのモックサイト
+
+食べログの一覧・詳細ページ、キャバキャバの一覧ページ、Google Mapsの店舗ページを
+本番サイトと同じパス構成で返す。レイテンシとエラー（503）の注入、秒間リクエスト数を超えたときの429に対応。
+
+    python benchmarks/mock_server.py --port 8000 --latency 0.1 --error-rate 0.05
+"""
+
+import argparse
+import collections
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from string import Template
+from urllib.parse import parse_qs, urlsplit
+
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+TABELOG_LIST_PATH = "/tokyo/A1306/rstLst/cond58-00-00/"
+TABELOG_AREA_STRIDE = 100_000  # エリアごとの店舗IDの範囲
+CABA2_LIST_PATH = "/tokyo/ginza/_list"
+
+TABELOG_PER_PAGE = 20
+CABA2_PER_PAGE = 50
+
+STATIONS = ["表参道駅", "明治神宮前駅", "原宿駅", "外苑前駅"]
+GENRES = ["和食", "イタリアン", "フレンチ", "カフェ", "焼肉", "寿司"]
+WEEKDAYS = ["月曜日", "火曜日", "水曜日", "木曜日", "金曜日", "土曜日", "日曜日"]
+
+
+def load_fixture(name):
+    return Template((FIXTURES_DIR / name).read_text(encoding="utf-8"))
+
+
+def make_padding(size):
+    """本番ページ相当の重さにするためのダミーのナビゲーション要素"""
+    item = '<li class="nav-item"><a class="nav-link" href="/tokyo/">東京のレストラン</a></li>'
+    return f'<ul class="nav">{item * max(0, size // len(item))}</ul>'
+
+
+class MockSite:
+    """モックサイトのHTTPサーバー（バックグラウンドスレッドで起動）"""
+
+    def __init__(
+        self,
+        port=0,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        tabelog_pages=5,
+        caba2_stores=200,
+        padding=50_000,
+        seed=0,
+        rate_limit=None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.tabelog_pages = tabelog_pages
+        self.caba2_stores = caba2_stores
+        self.padding = make_padding(padding)
+        self.random = random.Random(seed)
+        self.rate_limit = rate_limit
+        self._recent = collections.deque()
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "throttled": 0, "bytes": 0}
+
+        self.templates = {
+            name: load_fixture(f"{name}.html")
+            for name in (
+                "tabelog_list",
+                "tabelog_list_item",
+                "tabelog_detail",
+                "caba2_list",
+                "caba2_list_item",
+                "gmap_place",
+            )
+        }
+
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                site.handle(self)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _error_status(self):
+        """注入するエラーのステータス（なければNone）"""
+        with self.lock:
+            self.stats["requests"] += 1
+            now = time.monotonic()
+            while self._recent and self._recent[0] < now - 1.0:
+                self._recent.popleft()
+            if self.rate_limit and len(self._recent) >= self.rate_limit:
+                self.stats["throttled"] += 1
+                return 429
+            self._recent.append(now)
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            fail = self.random.random() < self.error_rate
+            if fail:
+                self.stats["errors"] += 1
+        if delay:
+            time.sleep(delay)
+        return 503 if fail else None
+
+    def handle(self, request):
+        status = self._error_status()
+        if status == 429:
+            self._send(request, 429, "Too Many Requests", {"Retry-After": "1"})
+            return
+        if status:
+            self._send(request, status, "Service Unavailable")
+            return
+
+        parts = urlsplit(request.path)
+        body = self.route(parts.path, parse_qs(parts.query))
+        if body is None:
+            self._send(request, 404, "Not Found")
+        else:
+            self._send(request, 200, body)
+
+    def _send(self, request, status, body, headers=None):
+        data = body.encode("utf-8")
+        with self.lock:
+            self.stats["bytes"] += len(data)
+        request.send_response(status)
+        request.send_header("Content-Type", "text/html; charset=utf-8")
+        request.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+        request.end_headers()
+        request.wfile.write(data)
+
+    def route(self, path, query):
+        match = re.fullmatch(r"/tokyo/A13(\d\d)/rstLst/cond58-00-00/(?:(\d+)/)?", path)
+        if match:
+            return self.tabelog_list(int(match.group(2) or 1), int(match.group(1)))
+        match = re.fullmatch(r"/tokyo/A13\d\d/A13\d\d01/(\d+)/", path)
+        if match:
+            return self.tabelog_detail(int(match.group(1)))
+        if path == CABA2_LIST_PATH:
+            return self.caba2_list(int(query.get("page", ["1"])[0]))
+        match = re.fullmatch(r"/maps/place/(\d+)", path)
+        if match:
+            return self.gmap_place(int(match.group(1)))
+        return None
+
+    def tabelog_url(self, area):
+        """エリア番号（A1306なら6）の一覧ページのURL"""
+        return f"{self.base_url}/tokyo/A13{area:02d}/rstLst/cond58-00-00/"
+
+    def tabelog_store(self, store_id):
+        code = f"A13{store_id // TABELOG_AREA_STRIDE:02d}"
+        return {
+            "rst_id": store_id,
+            "name": f"レストラン{store_id}",
+            "detail_url": f"{self.base_url}/tokyo/{code}/{code}01/{store_id}/",
+            "station": STATIONS[store_id % len(STATIONS)],
+            "genre": GENRES[store_id % len(GENRES)],
+            "walk": store_id % 15 + 1,
+            "rating": f"{3.0 + (store_id * 37 % 120) / 100:.2f}",
+            "reviews": store_id * 13 % 500,
+            "address": f"東京都渋谷区神宮前{store_id % 6 + 1}-{store_id % 30 + 1}-{store_id % 20 + 1}",
+        }
+
+    def tabelog_list(self, page, area=6):
+        items = ""
+        if page <= self.tabelog_pages:
+            first = area * TABELOG_AREA_STRIDE + (page - 1) * TABELOG_PER_PAGE + 1
+            items = "\n".join(
+                self.templates["tabelog_list_item"].substitute(self.tabelog_store(i))
+                for i in range(first, first + TABELOG_PER_PAGE)
+            )
+        return self.templates["tabelog_list"].substitute(
+            items=items, padding=self.padding
+        )
+
+    def tabelog_detail(self, store_id):
+        return self.templates["tabelog_detail"].substitute(
+            self.tabelog_store(store_id), padding=self.padding
+        )
+
+    def caba2_list(self, page):
+        first = (page - 1) * CABA2_PER_PAGE + 1
+        last = min(first + CABA2_PER_PAGE, self.caba2_stores + 1)
+        items = "\n".join(
+            self.templates["caba2_list_item"].substitute(
+                detail_url=f"{self.base_url}/tokyo/ginza/club{i}/",
+                name=f"Club{i}",
+                kana=f"クラブ{i}",
+                area="銀座",
+                type="キャバクラ",
+                budget=f"{5000 + i % 10 * 500:,}",
+                phone=f"03-{3500 + i:04d}-{i % 10000:04d}",
+                address=f"東京都中央区銀座{i % 8 + 1}-{i % 12 + 1}-{i % 9 + 1}  銀座ビル {i % 9 + 1}F",
+            )
+            for i in range(first, last)
+        )
+        return self.templates["caba2_list"].substitute(items=items, padding=self.padding)
+
+    def gmap_place(self, store_id):
+        hours = "\n".join(
+            f'<tr class="y0skZc"><td class="ylH6lf"><div>{day}</div></td>'
+            f'<td class="mxowUb"><ul><li>20:00～1:00</li></ul></td></tr>'
+            for day in WEEKDAYS
+        )
+        return self.templates["gmap_place"].substitute(
+            name=f"Club{store_id}",
+            rating=f"{3.5 + store_id % 15 / 10:.1f}",
+            website=f"https://example.com/club{store_id}",
+            phone=f"03{3500 + store_id:04d}{store_id % 10000:04d}",
+            hours=hours,
+            padding=self.padding,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ベンチマーク用のモックサイト")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, help="秒間リクエスト数の上限（超えると429）")
+    args = parser.parse_args()
+
+    site = MockSite(
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+    )
+    print(f"Mock site running at {site.base_url}")
+    try:
+        site.server.serve_forever()
+    except KeyboardInterrupt:
+        site.stop()
+
+
+if __name__ == "__main__":
+    main()
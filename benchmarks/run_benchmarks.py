@@ -0,0 +1,307 @@
+"""モックサイトを使ったオフラインのベンチマーク
+
+本番サイトにアクセスせずに、クローラー・パーサー・Google Maps取得・ルート探索の
+スループットとメモリ使用量を計測する。
+
+    python benchmarks/run_benchmarks.py --latency 0.05 --json results.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "tabelog"))
+sys.path.append(str(ROOT / "kyabakyaba"))
+
+from mock_server import CABA2_LIST_PATH, TABELOG_LIST_PATH, TABELOG_PER_PAGE, MockSite
+
+
+def read_rss_mb(field):
+    """/proc/self/statusのRSS（VmRSSは現在、VmHWMはピーク）をMBで返す（Linux以外はNone）"""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss():
+    """ピークRSSを現在のRSSに戻す（Linux 4.0以降のみ。戻せなければFalse）
+
+    getrusageのru_maxrssはプロセス全体のピークで下がらないため、ベンチマークごとに戻す。
+    """
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def measure(name, func, items, unit):
+    """funcを実行して所要時間・スループット・ピークRSSを記録する
+
+    peak_rss_mbはこのベンチマーク中のピークRSS、rss_increase_mbは開始直前のRSSからの
+    増加分。ピークを戻せない環境では前のベンチマークのピークが混ざるため記録しない。
+    """
+    output = io.StringIO()
+    isolated = reset_peak_rss()
+    baseline = read_rss_mb("VmRSS")
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(output):
+            func()
+    except Exception as e:
+        return {"name": name, "skipped": f"{type(e).__name__}: {e}"}
+    elapsed = time.perf_counter() - started
+    peak = read_rss_mb("VmHWM") if isolated else None
+    return {
+        "name": name,
+        "items": items,
+        "unit": unit,
+        "seconds": round(elapsed, 3),
+        "throughput": round(items / elapsed, 2) if elapsed else None,
+        "peak_rss_mb": round(peak, 1) if peak is not None else None,
+        "rss_increase_mb": round(peak - baseline, 1) if peak is not None else None,
+    }
+
+
+def format_mb(value):
+    return f"{value:.1f}MB" if value is not None else "-"
+
+
+def bench_tabelog_crawl(site, limit):
+    from tabecrawler import scrape_tabelog
+
+    url = site.base_url + TABELOG_LIST_PATH
+    return measure(
+        "tabelog crawl (async)",
+        lambda: scrape_tabelog(
+            url, limit=limit, async_mode=True, requests_per_second=1000.0
+        ),
+        limit,
+        "stores",
+    )
+
+
+def bench_tabelog_areas(site, num_areas, limit):
+    from tabecrawler import scrape_tabelog_areas
+
+    areas = {f"area{area}": site.tabelog_url(area) for area in range(1, num_areas + 1)}
+    return measure(
+        f"tabelog crawl ({num_areas} areas)",
+        lambda: scrape_tabelog_areas(
+            areas, limit=limit, max_concurrent=8, requests_per_second=1000.0
+        ),
+        num_areas * limit,
+        "stores",
+    )
+
+
+def bench_parsers(site, repeat):
+    from tabecrawler import parse_detail_page, parse_list_page
+    from kyabakyabacrawler import parse_listing_page
+
+    pages = {
+        "parse tabelog list": (
+            parse_list_page,
+            site.tabelog_list(1),
+        ),
+        "parse tabelog detail": (
+            parse_detail_page,
+            site.tabelog_detail(1),
+        ),
+        "parse caba2 list": (
+            parse_listing_page,
+            site.caba2_list(1),
+        ),
+    }
+    results = []
+    for name, (parser, html) in pages.items():
+        results.append(
+            measure(name, lambda: [parser(html) for _ in range(repeat)], repeat, "pages")
+        )
+    return results
+
+
+def bench_caba2_crawl(site, workdir):
+    from kyabakyabacrawler import scrape_cabacaba
+
+    return measure(
+        "caba2 crawl (http, 4 workers)",
+        lambda: scrape_cabacaba(
+            site.caba2_stores,
+            output_file=str(workdir / "cabacaba_stores.csv"),
+            checkpoint_file=str(workdir / "cabacaba_stores.checkpoint.json"),
+            existing_csv=str(workdir / "existing.csv"),
+            workers=4,
+            use_http=True,
+            delta_file=str(workdir / "cabacaba_delta.json"),
+            base_url=site.base_url + CABA2_LIST_PATH,
+        ),
+        site.caba2_stores,
+        "stores",
+    )
+
+
+def gmap_succeeded(output_file, column):
+    if not output_file.exists():
+        return False
+    return pd.read_csv(output_file)[column].notna().any()
+
+
+def bench_gmap(site, workdir, num_places):
+    try:
+        from gmap_enricher import FIELDS, process_csv_file
+    except ImportError as e:
+        return [{"name": "gmap enrich", "skipped": f"ImportError: {e}"}]
+
+    input_csv = workdir / "gmap_input.csv"
+    pd.DataFrame(
+        {
+            "name": [f"Club{i}" for i in range(1, num_places + 1)],
+            "gmap_url": [
+                f"{site.base_url}/maps/place/{i}" for i in range(1, num_places + 1)
+            ],
+        }
+    ).to_csv(input_csv, index=False)
+
+    results = []
+    for name, fields in (
+        ("gmap website", ["website"]),
+        ("gmap opening hours", ["opening_hours"]),
+    ):
+        output_file = workdir / f"gmap_{fields[0]}.csv"
+        results.append(
+            measure(
+                name,
+                lambda: asyncio.run(
+                    process_csv_file(
+                        str(input_csv), fields=fields, output_file=str(output_file)
+                    )
+                ),
+                num_places,
+                "places",
+            )
+        )
+        # process_csv_fileはブラウザ起動の失敗をログに出して戻るため、取得結果の有無で判定する
+        if "skipped" not in results[-1] and not gmap_succeeded(
+            output_file, FIELDS[fields[0]][1][0]
+        ):
+            results[-1] = {"name": name, "skipped": "Playwright browser unavailable"}
+    return results
+
+
+def bench_route(workdir, num_stores, time_budget):
+    from route_optimizer import RouteOptimizer
+    from route_solvers import AnnealingSolver, GreedySolver
+
+    rng = np.random.default_rng(0)
+    csv_file = workdir / "route_stores.csv"
+    pd.DataFrame(
+        {
+            "店舗名": [f"レストラン{i}" for i in range(num_stores)],
+            "評価点数": np.round(rng.uniform(3.0, 4.2, num_stores), 2),
+            "latitude": 35.6654 + rng.uniform(-0.015, 0.015, num_stores),
+            "longitude": 139.7090 + rng.uniform(-0.015, 0.015, num_stores),
+        }
+    ).to_csv(csv_file, index=False)
+
+    results = []
+    for solver in (GreedySolver(), AnnealingSolver(time_budget=time_budget, seed=0)):
+        optimizer = RouteOptimizer(str(csv_file))
+        results.append(
+            measure(
+                f"route {solver.name}",
+                lambda: optimizer.find_optimal_route(solver),
+                num_stores,
+                "stores",
+            )
+        )
+    return results
+
+
+def print_results(results):
+    print(
+        f"{'benchmark':<32} {'items':>7} {'seconds':>8} {'throughput':>16} "
+        f"{'peak RSS':>9} {'+RSS':>9}"
+    )
+    for result in results:
+        if "skipped" in result:
+            print(f"{result['name']:<32} skipped ({result['skipped']})")
+            continue
+        throughput = f"{result['throughput']} {result['unit']}/s"
+        print(
+            f"{result['name']:<32} {result['items']:>7} {result['seconds']:>8.3f} "
+            f"{throughput:>16} {format_mb(result['peak_rss_mb']):>9} "
+            f"{format_mb(result['rss_increase_mb']):>9}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="モックサイトを使ったオフラインベンチマーク")
+    parser.add_argument("--latency", type=float, default=0.05, help="レスポンス遅延（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="遅延のゆらぎ（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="503を返す割合")
+    parser.add_argument("--rate-limit", type=float, help="秒間リクエスト数の上限（超えると429）")
+    parser.add_argument("--tabelog-stores", type=int, default=60)
+    parser.add_argument("--tabelog-areas", type=int, default=4)
+    parser.add_argument("--caba2-stores", type=int, default=200)
+    parser.add_argument("--parse-repeat", type=int, default=20)
+    parser.add_argument("--gmap-places", type=int, default=20)
+    parser.add_argument("--route-stores", type=int, default=500)
+    parser.add_argument("--time-budget", type=float, default=1.0)
+    parser.add_argument("--skip-gmap", action="store_true")
+    parser.add_argument("--json", help="結果をJSONで保存するパス")
+    args = parser.parse_args()
+
+    site = MockSite(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        tabelog_pages=-(-args.tabelog_stores // TABELOG_PER_PAGE),
+        caba2_stores=args.caba2_stores,
+    )
+    results = []
+    with site, tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        results.extend(bench_parsers(site, args.parse_repeat))
+        results.append(bench_tabelog_crawl(site, args.tabelog_stores))
+        results.append(
+            bench_tabelog_areas(site, args.tabelog_areas, args.tabelog_stores)
+        )
+        results.append(bench_caba2_crawl(site, workdir))
+        if not args.skip_gmap:
+            results.extend(bench_gmap(site, workdir, args.gmap_places))
+        results.extend(bench_route(workdir, args.route_stores, args.time_budget))
+        requests = dict(site.stats)
+
+    print_results(results)
+    print(
+        f"\nmock site: {requests['requests']} requests, {requests['errors']} errors, "
+        f"{requests['throttled']} throttled, "
+        f"{requests['bytes'] / 1024 / 1024:.1f}MB served"
+    )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"results": results, "mock_site": requests}, f, indent=2)
+        print(f"Results saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
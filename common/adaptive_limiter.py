@@ -0,0 +1,255 @@
+import asyncio
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+
+# スロットリングとみなすステータスと、再試行するサーバーエラーのステータス
+THROTTLE_STATUSES = {429, 503}
+RETRYABLE_STATUSES = {500, 502, 504}
+
+# ブロック・CAPTCHAページのタイトルの目印
+CAPTCHA_TITLE_MARKERS = (
+    "captcha",
+    "unusual traffic",
+    "attention required",
+    "just a moment",
+    "アクセス制限",
+    "アクセスが集中",
+)
+_TITLE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+
+
+class ThrottledError(Exception):
+    """サーバーからのスロットリング（429/503・CAPTCHA）"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TransientError(Exception):
+    """再試行すれば成功する見込みのある一時的なエラー（5xxなど）"""
+
+
+def parse_retry_after(value):
+    """Retry-Afterヘッダー（秒数またはHTTP日付）を秒数に変換"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_captcha_title(title):
+    """ページのタイトルがブロック・CAPTCHAページのものかどうか"""
+    title = (title or "").lower()
+    return any(marker in title for marker in CAPTCHA_TITLE_MARKERS)
+
+
+def looks_like_captcha(text):
+    """HTMLの<title>からブロック・CAPTCHAページかどうか判定"""
+    match = _TITLE.search(text[:10000])
+    return is_captcha_title(match.group(1) if match else "")
+
+
+def check_status(status, url, headers=None):
+    """ステータスコードに応じてThrottledError・TransientErrorを送出"""
+    if status in THROTTLE_STATUSES:
+        headers = headers or {}
+        # Playwrightのヘッダーはキーが小文字
+        retry_after = parse_retry_after(
+            headers.get("Retry-After") or headers.get("retry-after")
+        )
+        raise ThrottledError(f"{status} {url}", retry_after)
+    if status in RETRYABLE_STATUSES:
+        raise TransientError(f"{status} {url}")
+
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=60.0):
+    """指数バックオフの待ち時間（full jitter: 0〜base_delay * 2^attemptの一様乱数）"""
+    return random.uniform(0, min(max_delay, base_delay * 2**attempt))
+
+
+def retry_call(func, retries=4, base_delay=1.0, max_delay=60.0, retry_on=(), metrics=None):
+    """同期版: スロットリングと一時的なエラーを指数バックオフで再試行してfunc()を実行"""
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except (ThrottledError, TransientError, *retry_on) as e:
+            if attempt == retries:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            if isinstance(e, ThrottledError) and e.retry_after:
+                delay = max(delay, e.retry_after)
+            if metrics:
+                metrics.incr("retries")
+            print(f"Retrying in {delay:.1f}s ({e})")
+            time.sleep(delay)
+
+
+class AdaptiveLimiter:
+    """サーバーの応答に応じて同時実行数と送信間隔を調整するリミッター（AIMD）
+
+    応答が速く成功が続く間は同時実行数と送信レートを少しずつ上げ（加算的増加）、
+    429/503・CAPTCHA・タイムアウトを受けると半分に下げる（乗算的減少）。
+    Retry-Afterの指定があれば全リクエストをその間止める。
+    requests_per_secondはホストごとの送信レートの上限で、Noneなら同時実行数だけを調整する。
+    """
+
+    def __init__(
+        self,
+        requests_per_second=1.0,
+        max_concurrency=4,
+        initial_concurrency=None,
+        min_requests_per_second=0.05,
+        latency_factor=3.0,
+        metrics=None,
+    ):
+        if requests_per_second is not None and requests_per_second <= 0:
+            raise ValueError("requests_per_second must be positive")
+        self.max_rate = requests_per_second
+        self.rate = requests_per_second
+        self.min_rate = min_requests_per_second
+        self.max_concurrency = max_concurrency
+        self.concurrency = initial_concurrency or max(1, max_concurrency // 2)
+        self.latency_factor = latency_factor
+        self.metrics = metrics
+        self.stats = {"successes": 0, "throttled": 0, "errors": 0}
+        self._in_flight = 0
+        self._window = 0
+        self._latency = None
+        self._baseline_latency = None
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._next_slot = {}
+        self._condition = None
+
+    @property
+    def _cond(self):
+        # イベントループの中で初めて使うときに作成する
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self, url):
+        """同時実行数の枠とホストの送信枠が空くまで待機"""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._in_flight < self.concurrency)
+            self._in_flight += 1
+
+        host = urlparse(url).netloc
+        now = time.monotonic()
+        slot = max(now, self._paused_until, self._next_slot.get(host, now))
+        if self.rate:
+            self._next_slot[host] = slot + 1.0 / self.rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def release(self):
+        async with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    @asynccontextmanager
+    async def slot(self, url):
+        stage = self.metrics.stage("wait") if self.metrics else None
+        if stage:
+            with stage:
+                await self.acquire(url)
+        else:
+            await self.acquire(url)
+        try:
+            yield
+        finally:
+            await self.release()
+
+    def on_success(self, latency):
+        """成功した応答を記録し、同時実行数分の応答ごとに同時実行数とレートを見直す
+
+        応答時間の移動平均が基準（これまでの最小値。ページの重さの変化に追従するよう
+        少しずつ上がる）のlatency_factor倍以内なら1つ増やし、超えていれば1つ減らす。
+        """
+        self.stats["successes"] += 1
+        if self._latency is None:
+            self._latency = self._baseline_latency = latency
+        else:
+            self._latency = 0.8 * self._latency + 0.2 * latency
+            self._baseline_latency = min(self._latency, self._baseline_latency * 1.01)
+
+        self._window += 1
+        if self._window < self.concurrency:
+            return
+        self._window = 0
+        if self._latency > self.latency_factor * self._baseline_latency:
+            self.concurrency = max(1, self.concurrency - 1)
+            return
+        self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+        if self.rate:
+            self.rate = min(self.max_rate, self.rate + 0.1 * self.max_rate)
+
+    def _should_decrease(self, started):
+        """前回下げた後に送ったリクエストの失敗でなければ下げない（同時に失敗した分で何度も下げない）"""
+        if started is not None and started < self._last_decrease:
+            return False
+        self._last_decrease = time.monotonic()
+        self._window = 0
+        return True
+
+    def on_throttle(self, retry_after=None, started=None):
+        """スロットリングを受けたら同時実行数とレートを半分にし、Retry-Afterの間は止める"""
+        self.stats["throttled"] += 1
+        if retry_after:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        if self._should_decrease(started):
+            self.concurrency = max(1, self.concurrency // 2)
+            if self.rate:
+                self.rate = max(self.min_rate, self.rate / 2)
+
+    def on_error(self, started=None):
+        """タイムアウト・接続エラーは過負荷の兆候として同時実行数だけを半分にする"""
+        self.stats["errors"] += 1
+        if self._should_decrease(started):
+            self.concurrency = max(1, self.concurrency // 2)
+
+    async def call(self, url, func, retries=4, base_delay=1.0, max_delay=60.0, retry_on=()):
+        """枠を確保してawait func()を実行し、スロットリングと一時的なエラーは再試行する
+
+        retry_onには再試行するクライアント固有の例外（タイムアウト・接続エラーなど）を渡す。
+        再試行しても失敗した場合は最後の例外を送出する。
+        """
+        for attempt in range(retries + 1):
+            started = None
+            try:
+                async with self.slot(url):
+                    started = time.monotonic()
+                    result = await func()
+                self.on_success(time.monotonic() - started)
+                return result
+            except ThrottledError as e:
+                self.on_throttle(e.retry_after, started)
+                error, retry_after = e, e.retry_after
+            except (TransientError, *retry_on) as e:
+                self.on_error(started)
+                error, retry_after = e, None
+
+            if attempt == retries:
+                raise error
+            delay = max(backoff_delay(attempt, base_delay, max_delay), retry_after or 0)
+            if self.metrics:
+                self.metrics.incr("retries")
+            await asyncio.sleep(delay)
+
+    def summary(self):
+        rate = f"{self.rate:.2f} req/s" if self.rate else "no rate cap"
+        return (
+            f"Limiter: concurrency {self.concurrency}/{self.max_concurrency}, {rate}, "
+            f"{self.stats['throttled']} throttled, {self.stats['errors']} errors"
+        )
@@ -0,0 +1,291 @@
+import re
+import sys
+import unicodedata
+from difflib import SequenceMatcher
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.store_schema import CABA2_SCHEMA, TABELOG_SCHEMA, read_table, write_table
+
+
+# 店舗名から除外する接尾辞・区切り
+_NAME_SEPARATOR = re.compile(r"\s+[-－‐ー―]\s+")
+_NON_WORD = re.compile(r"[\s\W_]+")
+_DIGITS = re.compile(r"\D")
+_ADDRESS_DASHES = re.compile(r"(?<=\d)[‐‑‒–—―−ーｰ－](?=\d)")
+_ADDRESS_NUMBERS = re.compile(r"(?<=\d)\s*(?:丁目|番地?|-)\s*(?=\d)")
+_ADDRESS_BLOCK = re.compile(r"^(.*?\d+(?:-\d+)*)")
+_ADDRESS_FLOOR = re.compile(r"(B|地下)?(\d+)(?:F|階)", re.IGNORECASE)
+_ADDRESS_AREA = re.compile(r"^(?:東京都|北海道|(?:京都|大阪)府|.{2,3}県)?(.+?[区市町村])")
+
+
+def normalize_name(name):
+    """店舗名を正規化（"Fairy - フェアリー" → "fairy"、全角半角・記号・空白の違いを除去）"""
+    text = unicodedata.normalize("NFKC", str(name or ""))
+    text = _NAME_SEPARATOR.split(text)[0]
+    return _NON_WORD.sub("", text).lower()
+
+
+def normalize_kana(kana):
+    """読み仮名を正規化（ひらがなをカタカナに揃える）"""
+    text = unicodedata.normalize("NFKC", str(kana or ""))
+    text = "".join(
+        chr(ord(c) + 0x60) if "ぁ" <= c <= "ゖ" else c for c in text
+    )
+    return _NON_WORD.sub("", text)
+
+
+def normalize_phone(phone):
+    """電話番号を数字だけに正規化（+81は0に置き換える）"""
+    digits = _DIGITS.sub("", unicodedata.normalize("NFKC", str(phone or "")))
+    if digits.startswith("81") and len(digits) in (11, 12):
+        digits = "0" + digits[2:]
+    return digits
+
+
+def _split_address(address):
+    """住所を番地までとそれ以降（建物名・階）に分ける"""
+    text = unicodedata.normalize("NFKC", str(address or ""))
+    text = _ADDRESS_DASHES.sub("-", text)
+    # "7丁目 12-3"・"1丁目7番1号"を"7-12-3"・"1-7-1"に揃える（番地の後の空白は区切りとして残す）
+    text = _ADDRESS_NUMBERS.sub("-", text).strip()
+    match = _ADDRESS_BLOCK.match(text)
+    if not match:
+        return re.sub(r"\s+", "", text), ""
+    return re.sub(r"\s+", "", match.group(1)), text[match.end() :]
+
+
+def normalize_address(address):
+    """住所を番地までに正規化（全角半角・丁目番地号・ハイフン・建物名の違いを除去）"""
+    return _split_address(address)[0]
+
+
+def address_floor(address):
+    """住所の番地より後ろから階を取り出す（"3F"・"3階" → "3"、"B1F"・"地下1階" → "B1"）"""
+    match = _ADDRESS_FLOOR.search(_split_address(address)[1])
+    if not match:
+        return ""
+    return ("B" if match.group(1) else "") + match.group(2)
+
+
+def address_area(address):
+    """正規化済みの住所から市区町村を取り出す"""
+    match = _ADDRESS_AREA.match(address)
+    return match.group(1) if match else ""
+
+
+def similarity(a, b, threshold=0.0):
+    """2つの正規化済み文字列の類似度（0〜1）。thresholdに届かないことが確定すれば0を返す"""
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    matcher = SequenceMatcher(None, a, b)
+    if matcher.real_quick_ratio() < threshold or matcher.quick_ratio() < threshold:
+        return 0.0
+    return matcher.ratio()
+
+
+class StoreKey:
+    """重複判定に使う正規化済みのキー"""
+
+    __slots__ = ("name", "kana", "phone", "address", "floor", "area")
+
+    def __init__(self, name="", kana="", phone="", address=""):
+        self.name = normalize_name(name)
+        self.kana = normalize_kana(kana)
+        self.phone = normalize_phone(phone)
+        self.address = normalize_address(address)
+        self.floor = address_floor(address)
+        self.area = address_area(self.address)
+
+    def blocks(self):
+        """ブロッキング用のキー（電話番号・住所の番地・店舗名の先頭・市区町村内の店舗名の先頭）
+
+        住所のない店舗も見つかるよう、店舗名の先頭は市区町村によらないブロックにも入れる。
+        """
+        keys = []
+        if len(self.phone) >= 9:
+            keys.append(("phone", self.phone))
+        if self.address:
+            keys.append(("address", self.address))
+        if self.name:
+            keys.append(("name", self.name[:3]))
+            if self.area:
+                keys.append(("area_name", self.area, self.name[:3]))
+        return keys
+
+
+class DedupIndex:
+    """正規化キーによるブロッキングとブロック内のあいまい一致で店舗を名寄せするインデックス
+
+    電話番号・番地・店舗名の先頭が一致する店舗だけを比較するため、
+    全件総当たりではなくほぼ線形の計算量で名寄せできる。
+    """
+
+    NAME_THRESHOLD = 0.85  # 店舗名だけで同一とみなす類似度
+    SUPPORTED_NAME_THRESHOLD = 0.6  # 電話番号が一致するときの店舗名の類似度
+    ADDRESS_NAME_THRESHOLD = 0.75  # 番地だけが一致するときの店舗名の類似度（同じビルの別店舗を除く）
+    MAX_BLOCK_COMPARISONS = 200  # 1つのブロック内で比較する直近の店舗数の上限
+
+    def __init__(self):
+        self.keys = []
+        self.records = []
+        self._blocks = {}
+        self._parent = []
+
+    def __len__(self):
+        return len(self.records)
+
+    def _find(self, i):
+        while self._parent[i] != i:
+            self._parent[i] = self._parent[self._parent[i]]
+            i = self._parent[i]
+        return i
+
+    def _union(self, i, j):
+        root_i, root_j = self._find(i), self._find(j)
+        if root_i != root_j:
+            self._parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    def name_score(self, a, b, threshold):
+        return max(
+            similarity(a.name, b.name, threshold), similarity(a.kana, b.kana, threshold)
+        )
+
+    def is_match(self, a, b):
+        """2つのキーが同一店舗かどうか判定"""
+        if a.phone and a.phone == b.phone:
+            return (
+                a.address == b.address
+                or self.name_score(a, b, self.SUPPORTED_NAME_THRESHOLD)
+                >= self.SUPPORTED_NAME_THRESHOLD
+            )
+        # 電話番号が食い違う店舗は、同じビルでも店舗名が似ていても別店舗
+        if a.phone and b.phone:
+            return False
+        if a.address and a.address == b.address:
+            # 同じビルの別の階は別店舗
+            if a.floor and b.floor and a.floor != b.floor:
+                return False
+            return (
+                self.name_score(a, b, self.ADDRESS_NAME_THRESHOLD)
+                >= self.ADDRESS_NAME_THRESHOLD
+            )
+        # 店舗名だけで判定するのは市区町村が同じ場合のみ
+        if a.area and b.area and a.area != b.area:
+            return False
+        return self.name_score(a, b, self.NAME_THRESHOLD) >= self.NAME_THRESHOLD
+
+    def add(self, record, name="", kana="", phone="", address=""):
+        """店舗を追加し、既存の店舗と一致すればその代表インデックスを返す"""
+        key = StoreKey(name, kana, phone, address)
+        index = len(self.records)
+        self.keys.append(key)
+        self.records.append(record)
+        self._parent.append(index)
+
+        candidates = set()
+        for block in key.blocks():
+            members = self._blocks.setdefault(block, [])
+            candidates.update(members[-self.MAX_BLOCK_COMPARISONS :])
+            members.append(index)
+
+        for other in sorted(candidates):
+            if self._find(other) != self._find(index) and self.is_match(
+                key, self.keys[other]
+            ):
+                self._union(index, other)
+
+        return self._find(index)
+
+    def find_duplicate(self, name="", kana="", phone="", address=""):
+        """インデックスに追加せずに一致する既存店舗の代表インデックスを返す（なければNone）"""
+        key = StoreKey(name, kana, phone, address)
+        candidates = set()
+        for block in key.blocks():
+            candidates.update(self._blocks.get(block, [])[-self.MAX_BLOCK_COMPARISONS :])
+        for other in sorted(candidates):
+            if self.is_match(key, self.keys[other]):
+                return self._find(other)
+        return None
+
+    def groups(self):
+        """名寄せ結果（同一店舗とみなしたレコードのリストのリスト）"""
+        grouped = {}
+        for i, record in enumerate(self.records):
+            grouped.setdefault(self._find(i), []).append(record)
+        return list(grouped.values())
+
+
+def merge_records(records):
+    """同一店舗のレコードを、空でない値を優先して1つにまとめる"""
+    merged = {}
+    for record in records:
+        for key, value in record.items():
+            if key not in merged or merged[key] in ("", None):
+                merged[key] = value
+    return merged
+
+
+# データソースごとのカラム対応（name, kana, phone, address）
+FIELD_MAPS = {
+    "caba2": {"name": "name", "kana": "kana", "phone": "phone", "address": "address"},
+    "tabelog": {"name": "店舗名", "address": "住所"},
+}
+
+
+def merge_datasets(datasets):
+    """複数ソースの店舗レコードを名寄せしてまとめる
+
+    datasetsは(ソース名, レコードのリスト)のリスト。まとめたレコードには
+    名寄せ元のソース名をsourcesカラムに記録する。
+    """
+    index = DedupIndex()
+    for source, records in datasets:
+        field_map = FIELD_MAPS[source]
+        for record in records:
+            index.add(
+                dict(record, sources=source),
+                **{field: record.get(column, "") for field, column in field_map.items()},
+            )
+
+    merged = []
+    for group in index.groups():
+        record = merge_records(group)
+        record["sources"] = ",".join(sorted({r["sources"] for r in group}))
+        merged.append(record)
+    return merged
+
+
+def main():
+    if len(sys.argv) < 4:
+        print("Usage: python dedup.py <caba2のCSV> <食べログのCSV> <出力CSV>")
+        print("（CSVの代わりにParquet・Arrowも指定できます）")
+        return
+
+    datasets = []
+    for source, path, schema in (
+        ("caba2", sys.argv[1], CABA2_SCHEMA),
+        ("tabelog", sys.argv[2], TABELOG_SCHEMA),
+    ):
+        df = read_table(path, schema)
+        records = df.astype(object).where(df.notna(), "").to_dict("records")
+        datasets.append((source, records))
+
+    merged = merge_datasets(datasets)
+    fieldnames = list(dict.fromkeys(key for record in merged for key in record))
+    write_table(
+        pd.DataFrame(merged, columns=fieldnames),
+        sys.argv[3],
+        {**TABELOG_SCHEMA, **CABA2_SCHEMA},
+    )
+
+    total = sum(len(records) for _, records in datasets)
+    print(f"名寄せ完了: {total}件 → {len(merged)}件")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# 集計するカウンター（Prometheusでは crawler_<name>_total として出力）
+COUNTERS = ("requests", "bytes", "items", "retries", "timeouts", "errors")
+
+
+def timed(func, *args):
+    """funcを実行して(結果, 所要秒数)を返す（プロセスプール内での解析時間の計測用）"""
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class CrawlMetrics:
+    """クローラーのステージごとの処理時間・転送量・リトライ数・同時実行数を集計する
+
+    stage()で囲んだ区間（fetch, wait, parse, extract, write）の回数と時間を記録する。
+    スレッドからもasyncioのタスクからも同じインスタンスを使える。
+    start_reporter()で定期的にJSONとPrometheusのテキスト形式のファイルを書き出す。
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.started = time.time()
+        self.stages = {}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.in_flight = {}
+        self.max_in_flight = {}
+        self._lock = threading.Lock()
+        self._reporter = None
+        self._stop = threading.Event()
+
+    @contextmanager
+    def stage(self, name):
+        """withで囲んだ区間をステージnameの処理時間として記録し、同時実行数を数える"""
+        with self._lock:
+            current = self.in_flight.get(name, 0) + 1
+            self.in_flight[name] = current
+            self.max_in_flight[name] = max(self.max_in_flight.get(name, 0), current)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.in_flight[name] -= 1
+            self.record(name, elapsed)
+
+    def record(self, name, seconds):
+        """計測済みの処理時間をステージnameに加算"""
+        with self._lock:
+            stats = self.stages.setdefault(
+                name, {"count": 0, "seconds": 0.0, "max_seconds": 0.0}
+            )
+            stats["count"] += 1
+            stats["seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        """現時点の集計結果を辞書で返す"""
+        with self._lock:
+            elapsed = time.time() - self.started
+            stages = {
+                name: dict(
+                    stats,
+                    avg_seconds=stats["seconds"] / stats["count"] if stats["count"] else 0.0,
+                    in_flight=self.in_flight.get(name, 0),
+                    max_in_flight=self.max_in_flight.get(name, 0),
+                )
+                for name, stats in self.stages.items()
+            }
+            counters = dict(self.counters)
+        return {
+            "crawler": self.crawler,
+            "timestamp": time.time(),
+            "elapsed_seconds": elapsed,
+            "counters": counters,
+            "items_per_second": counters["items"] / elapsed if elapsed else 0.0,
+            "bytes_per_second": counters["bytes"] / elapsed if elapsed else 0.0,
+            "stages": stages,
+        }
+
+    def prometheus_text(self):
+        """Prometheusのテキスト形式（node_exporterのtextfile collector向け）で返す"""
+        snapshot = self.snapshot()
+        crawler = snapshot["crawler"]
+        lines = [
+            "# TYPE crawler_elapsed_seconds gauge",
+            f'crawler_elapsed_seconds{{crawler="{crawler}"}} {snapshot["elapsed_seconds"]:.3f}',
+        ]
+        for name, value in snapshot["counters"].items():
+            lines.append(f"# TYPE crawler_{name}_total counter")
+            lines.append(f'crawler_{name}_total{{crawler="{crawler}"}} {value}')
+
+        stage_metrics = (
+            ("stage_calls_total", "counter", "count"),
+            ("stage_seconds_total", "counter", "seconds"),
+            ("stage_max_seconds", "gauge", "max_seconds"),
+            ("stage_in_flight", "gauge", "in_flight"),
+            ("stage_max_in_flight", "gauge", "max_in_flight"),
+        )
+        for metric, kind, key in stage_metrics:
+            lines.append(f"# TYPE crawler_{metric} {kind}")
+            for stage, stats in snapshot["stages"].items():
+                lines.append(
+                    f'crawler_{metric}{{crawler="{crawler}",stage="{stage}"}} {stats[key]:g}'
+                )
+        return "\n".join(lines) + "\n"
+
+    def dump(self, json_file=None, prometheus_file=None):
+        """集計結果をファイルに書き出す（書き込み途中のファイルは読まれないよう置き換える）"""
+        if json_file:
+            _write_atomic(json_file, json.dumps(self.snapshot(), indent=2))
+        if prometheus_file:
+            _write_atomic(prometheus_file, self.prometheus_text())
+
+    def start_reporter(self, json_file=None, prometheus_file=None, interval=10.0):
+        """interval秒ごとに集計結果を書き出すバックグラウンドスレッドを開始"""
+        if not (json_file or prometheus_file):
+            return
+
+        def report():
+            while not self._stop.wait(interval):
+                self.dump(json_file, prometheus_file)
+            self.dump(json_file, prometheus_file)
+
+        self._stop.clear()
+        self._reporter = threading.Thread(target=report, daemon=True)
+        self._reporter.start()
+
+    def stop_reporter(self):
+        """レポーターを止めて最終結果を書き出す"""
+        if self._reporter:
+            self._stop.set()
+            self._reporter.join()
+            self._reporter = None
+
+    def summary(self):
+        """ステージごとの時間とカウンターを文字列で返す"""
+        snapshot = self.snapshot()
+        stages = ", ".join(
+            f"{name} {stats['count']}x {stats['avg_seconds'] * 1000:.0f}ms avg"
+            + (
+                f" (max {stats['max_in_flight']} in flight)"
+                if stats["max_in_flight"]
+                else ""
+            )
+            for name, stats in snapshot["stages"].items()
+        )
+        counters = snapshot["counters"]
+        return (
+            f"Metrics: {counters['items']} items in {snapshot['elapsed_seconds']:.1f}s "
+            f"({snapshot['items_per_second']:.2f}/s), {counters['requests']} requests, "
+            f"{counters['bytes'] / 1024 / 1024:.1f}MB, {counters['retries']} retries, "
+            f"{counters['timeouts']} timeouts, {counters['errors']} errors"
+            + (f"\n  {stages}" if stages else "")
+        )
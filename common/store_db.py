@@ -0,0 +1,276 @@
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from common.store_schema import (
+    CABA2_SCHEMA,
+    GMAP_SCHEMA,
+    NORMALIZED_SCHEMA,
+    TABELOG_SCHEMA,
+    coerce_types,
+)
+
+
+# Google Mapsから取得する項目（gmap_enricher.FIELDS）。項目ごとに取得済みかを記録する
+GMAP_FIELDS = ("website", "opening_hours", "rating", "phone", "coordinates")
+
+# テーブルごとのカラム・店舗キー・インデックスと後段の処理
+# keyは店舗キーにするカラム（空なら次のカラム）、stagesは後段の処理とその入力のカラム
+STORE_TABLES = {
+    "tabelog": {
+        "schema": TABELOG_SCHEMA,
+        "key": ("食べログURL", "店舗名"),
+        "indexes": (("評価点数",), ("latitude", "longitude")),
+        "stages": {"geocode": ("住所",)},
+    },
+    "caba2": {
+        "schema": {**CABA2_SCHEMA, **GMAP_SCHEMA, **NORMALIZED_SCHEMA},
+        "key": ("website", "name"),
+        "indexes": (("area",), ("latitude", "longitude")),
+        "stages": {
+            "normalize": ("business_hours", "holiday", "budget"),
+            **{f"gmap_{field}": ("gmap_url",) for field in GMAP_FIELDS},
+        },
+    },
+}
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _marker(stage):
+    """後段の処理を終えた時刻のカラム（NULLなら未処理）"""
+    return f"{stage}_at"
+
+
+def _to_sql(value, kind):
+    """スキーマの型に合わせてSQLiteに保存する値にする（欠損値・数値にできない値はNULL）"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if kind in ("float", "int"):
+        try:
+            return float(value) if kind == "float" else int(round(float(value)))
+        except (TypeError, ValueError):
+            return None
+    return str(value)
+
+
+class StoreDB:
+    """全ステージで共有する店舗データのSQLiteデータベース（WALモード）
+
+    店舗は店舗キー（食べログURL、caba2は店舗ページのURLか店舗名）ごとに1行にまとめる。
+    クローラーはupsertで追加・更新し、後段（ジオコーディング・Google Maps取得・正規化）は
+    pendingで未処理の店舗だけを取り出し、updateで自分のカラムだけを書き込む。
+    後段の入力（住所・gmap_urlなど）が変わった店舗はupsertのときにその後段が未処理に戻るため、
+    各ステージの処理はデータ全体ではなく追加・変更された店舗の数に比例する。
+    WALモードのため、書き込み中のステージがあっても他のステージは読み込める。
+    """
+
+    def __init__(self, path, table):
+        if table not in STORE_TABLES:
+            raise ValueError(f"Unknown table: {table}")
+        spec = STORE_TABLES[table]
+        self.path = path
+        self.table = table
+        self.schema = spec["schema"]
+        self.key_fields = spec["key"]
+        self.stages = spec["stages"]
+        self._lock = threading.Lock()
+        self._upserts = {}
+        # 他のステージが書き込み中なら最大30秒待つ
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WALではコミットごとにfsyncしなくてもデータベースは壊れない
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_table(spec["indexes"])
+
+    def _create_table(self, indexes):
+        table = _quote(self.table)
+        columns = [
+            (column, {"float": "REAL", "int": "INTEGER"}.get(kind, "TEXT"))
+            for column, kind in self.schema.items()
+        ] + [(_marker(stage), "REAL") for stage in self.stages]
+        with self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "store_key TEXT PRIMARY KEY, updated_at REAL NOT NULL, "
+                + ", ".join(f"{_quote(name)} {kind}" for name, kind in columns)
+                + ")"
+            )
+            # スキーマに追加されたカラムを既存のテーブルに足す
+            existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            for name, kind in columns:
+                if name not in existing:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {_quote(name)} {kind}")
+            for index in indexes:
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {_quote('_'.join((self.table,) + index))} "
+                    f"ON {table} ({', '.join(map(_quote, index))})"
+                )
+            # 未処理の店舗だけの部分インデックス（処理済みの店舗が増えても小さいまま）
+            for stage in self.stages:
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {_quote(f'{self.table}_{stage}_pending')} "
+                    f"ON {table} (store_key) WHERE {_quote(_marker(stage))} IS NULL"
+                )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {_quote(self.table)}").fetchone()[0]
+
+    def key_of(self, record):
+        """店舗キー（keyのカラムのうち最初に値があるもの。なければNone）"""
+        for field in self.key_fields:
+            value = record.get(field)
+            if isinstance(value, str) and value:
+                return value
+        return None
+
+    def _upsert_statement(self, columns):
+        statement = self._upserts.get(columns)
+        if statement is None:
+            names = ["store_key", "updated_at", *columns]
+            assignments = [f"{_quote(c)} = excluded.{_quote(c)}" for c in names[1:]]
+            # 入力が変わった後段は未処理に戻す（右辺のカラムは更新前の値）
+            for stage, inputs in self.stages.items():
+                changed = [
+                    f"{_quote(c)} IS NOT excluded.{_quote(c)}" for c in inputs if c in columns
+                ]
+                if changed:
+                    marker = _quote(_marker(stage))
+                    assignments.append(
+                        f"{marker} = CASE WHEN {' OR '.join(changed)} THEN NULL ELSE {marker} END"
+                    )
+            statement = self._upserts[columns] = (
+                f"INSERT INTO {_quote(self.table)} ({', '.join(map(_quote, names))}) "
+                f"VALUES ({', '.join('?' * len(names))}) "
+                f"ON CONFLICT(store_key) DO UPDATE SET {', '.join(assignments)}"
+            )
+        return statement
+
+    def upsert(self, records):
+        """店舗を店舗キーで追加・更新し、書き込んだ件数を返す
+
+        recordsは辞書（StoreRecordも可）のイテラブル。レコードにないカラムと後段の結果は
+        そのまま残す。店舗キーのない店舗は書き込まない。1回のトランザクションで書き込む。
+        """
+        now = time.time()
+        batches = {}
+        for record in records:
+            key = self.key_of(record)
+            if key is None:
+                continue
+            columns = tuple(column for column in self.schema if column in record)
+            batches.setdefault(columns, []).append(
+                (key, now)
+                + tuple(_to_sql(record[column], self.schema[column]) for column in columns)
+            )
+        with self._lock, self._conn:
+            for columns, rows in batches.items():
+                self._conn.executemany(self._upsert_statement(columns), rows)
+        return sum(len(rows) for rows in batches.values())
+
+    def pending(self, stages, columns=()):
+        """stagesのいずれかが未処理の店舗の(店舗キー, columnsの値...)のリスト
+
+        後段の入力がすべて空の店舗は除く。
+        """
+        stages = [stages] if isinstance(stages, str) else list(stages)
+        selects = []
+        for stage in stages:
+            has_input = " OR ".join(
+                f"coalesce({_quote(c)}, '') != ''" for c in self.stages[stage]
+            )
+            # ステージごとに部分インデックスで未処理の店舗を引き、UNIONで重複を除く
+            selects.append(
+                f"SELECT {', '.join(['store_key', *map(_quote, columns)])} "
+                f"FROM {_quote(self.table)} "
+                f"WHERE {_quote(_marker(stage))} IS NULL AND ({has_input})"
+            )
+        with self._lock:
+            return self._conn.execute(" UNION ".join(selects)).fetchall()
+
+    def update(self, rows, columns, stages=()):
+        """店舗キーごとにcolumnsの値を書き込み、stagesを処理済みにする
+
+        rowsは(店舗キー, columnsの順の値)のイテラブル。1回のトランザクションで書き込み、
+        更新した件数を返す。
+        """
+        stages = [stages] if isinstance(stages, str) else list(stages)
+        now = time.time()
+        assignments = [f"{_quote(c)} = ?" for c in columns] + [
+            f"{_quote(c)} = ?" for c in ["updated_at", *map(_marker, stages)]
+        ]
+        params = [
+            tuple(_to_sql(value, self.schema[c]) for c, value in zip(columns, values))
+            + (now,) * (1 + len(stages))
+            + (key,)
+            for key, values in rows
+        ]
+        with self._lock, self._conn:
+            cursor = self._conn.executemany(
+                f"UPDATE {_quote(self.table)} SET {', '.join(assignments)} WHERE store_key = ?",
+                params,
+            )
+        return cursor.rowcount
+
+    def read(self, columns=None, ranges=None):
+        """店舗をスキーマの型のデータフレームで読み込む
+
+        rangesは{カラム: (下限, 上限)}（Noneの側は制限なし）。評価点数・座標などの
+        インデックスのあるカラムの範囲は、インデックスで該当する店舗だけを読む。
+        """
+        columns = [c for c in (columns or self.schema) if c in self.schema]
+        conditions, params = [], []
+        for column, (low, high) in (ranges or {}).items():
+            if low is not None:
+                conditions.append(f"{_quote(column)} >= ?")
+                params.append(low)
+            if high is not None:
+                conditions.append(f"{_quote(column)} <= ?")
+                params.append(high)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(map(_quote, columns))} FROM {_quote(self.table)}{where}",
+                params,
+            ).fetchall()
+        return coerce_types(pd.DataFrame.from_records(rows, columns=columns), self.schema)
+
+    def close(self):
+        with self._lock:
+            # 検索の実行計画に使う統計を更新してから閉じる
+            self._conn.execute("PRAGMA optimize")
+            self._conn.close()
+
+
+def table_for(schema):
+    """スキーマのデータを保存するテーブル（店舗キーのカラムで判定）"""
+    for table, spec in STORE_TABLES.items():
+        if spec["key"][0] in schema:
+            return table
+    raise ValueError("店舗キーのカラムがないデータは店舗データベースに保存できません")
+
+
+def read_db(path, schema, columns=None):
+    """店舗データベースからスキーマに対応するテーブルを読み込む"""
+    db = StoreDB(path, table_for(schema))
+    try:
+        return db.read(columns)
+    finally:
+        db.close()
+
+
+def write_db(df, path, schema):
+    """データフレームの店舗を店舗データベースに追加・更新する"""
+    db = StoreDB(path, table_for(schema))
+    try:
+        columns = list(df.columns)
+        return db.upsert(
+            dict(zip(columns, row)) for row in df.itertuples(index=False, name=None)
+        )
+    finally:
+        db.close()
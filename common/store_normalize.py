@@ -0,0 +1,155 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+
+# 曜日（月曜=0、datetime.weekday()と同じ）
+WEEKDAYS = "月火水木金土日"
+DAY_MINUTES = 24 * 60
+# 「LAST」（閉店時刻が決まっていない）は翌5時までとみなす
+LAST_CLOSING = 29 * 60
+
+_HOURS = re.compile(
+    r"(\d{1,2})[:時](\d{2})?分?\s*[~〜\-−ー]\s*翌?(?:(\d{1,2})[:時](\d{2})?分?|(LAST|ラスト))",
+    re.IGNORECASE,
+)
+_YEN = re.compile(r"(\d[\d,]*)円")
+_BUDGET_MINUTES = re.compile(r"(\d+)分")
+_OPEN_ENDED = re.compile(r"円\s*[~〜]")
+# 定休日の曜日以外の表記（「祝日」の「日」を日曜と取り違えないよう先に取り除く）
+_HOLIDAY_WORDS = re.compile(
+    r"曜日|祝祭?日|祭日|年末年始|お盆|不定休|第\d[\d・,、第]*[月火水木金土日]曜?"
+)
+_NO_HOLIDAY = ("無休", "なし")
+# 同じ表記は店舗間で繰り返し現れるため、解析結果を使い回す
+_PARSE_CACHE_SIZE = 65536
+# 構造化したカラム（common.store_schema.NORMALIZED_SCHEMAと同じ順）
+NORMALIZED_COLUMNS = ("open_hours", "closed_weekdays", "budget_min", "budget_max", "budget_minutes")
+
+
+@lru_cache(maxsize=_PARSE_CACHE_SIZE)
+def parse_hours(text):
+    """営業時間を開店・閉店の分のタプルにする（"20:00～1:00" → ((1200, 1500),)）
+
+    日付をまたぐ営業は閉店を24時以降（1:00 → 25:00）として表す。
+    曜日ごとに営業時間が違う表記は区別せず、書かれている時間帯をすべて返す。
+    """
+    text = unicodedata.normalize("NFKC", str(text or ""))
+    intervals = []
+    for open_hour, open_minute, close_hour, close_minute, last in _HOURS.findall(text):
+        start = int(open_hour) * 60 + int(open_minute or 0)
+        if last:
+            end = max(LAST_CLOSING, start + 60)
+        else:
+            end = int(close_hour) * 60 + int(close_minute or 0)
+            if end <= start:
+                end += DAY_MINUTES
+        if start < DAY_MINUTES:
+            intervals.append((start, end))
+    return tuple(intervals)
+
+
+@lru_cache(maxsize=_PARSE_CACHE_SIZE)
+def parse_holiday(text):
+    """定休日を(定休の曜日のタプル, 祝日休みか, 不定休か)にする（"日曜・祝日" → ((6,), True, False)）"""
+    text = unicodedata.normalize("NFKC", str(text or ""))
+    on_holidays = "祝" in text or "祭日" in text
+    irregular = "不定休" in text or "第" in text
+    if any(word in text for word in _NO_HOLIDAY):
+        return (), on_holidays, irregular
+    # 「第2・4日曜」のような隔週の定休は毎週の定休として扱わない
+    weekdays = _HOLIDAY_WORDS.sub("", text)
+    return (
+        tuple(sorted({WEEKDAYS.index(c) for c in weekdays if c in WEEKDAYS})),
+        on_holidays,
+        irregular,
+    )
+
+
+@lru_cache(maxsize=_PARSE_CACHE_SIZE)
+def parse_budget(text):
+    """予算を(最低金額, 最高金額, 時間(分))にする
+
+    "60分 5,500円〜" → (5500.0, None, 60)（上限なし）、"4,000円～6,000円" → (4000.0, 6000.0, None)。
+    金額がなければ(None, None, None)。
+    """
+    text = unicodedata.normalize("NFKC", str(text or ""))
+    amounts = [float(amount.replace(",", "")) for amount in _YEN.findall(text)]
+    minutes = _BUDGET_MINUTES.search(text)
+    minutes = int(minutes.group(1)) if minutes else None
+    if not amounts:
+        return None, None, minutes
+    low, high = min(amounts), max(amounts)
+    if len(amounts) == 1 and _OPEN_ENDED.search(text):
+        high = None
+    return low, high, minutes
+
+
+def format_hours(intervals):
+    """営業時間を文字列にする（((1200, 1500),) → "20:00-25:00"）"""
+    return ",".join(
+        f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}"
+        for start, end in intervals
+    )
+
+
+def normalize_store(store):
+    """店舗データの営業時間・定休日・予算を構造化したフィールドを返す"""
+    closed_weekdays, closed_on_holidays, irregular_holidays = parse_holiday(
+        store.get("holiday")
+    )
+    budget_min, budget_max, budget_minutes = parse_budget(store.get("budget"))
+    return {
+        "open_hours": parse_hours(store.get("business_hours")),
+        "closed_weekdays": closed_weekdays,
+        "closed_on_holidays": closed_on_holidays,
+        "irregular_holidays": irregular_holidays,
+        "budget_min": budget_min,
+        "budget_max": budget_max,
+        "budget_minutes": budget_minutes,
+    }
+
+
+def normalized_columns(normalized):
+    """normalize_storeの結果を保存用のカラムの値にする（NORMALIZED_COLUMNSの順）"""
+    return (
+        format_hours(normalized["open_hours"]),
+        ",".join(map(str, normalized["closed_weekdays"])),
+        normalized["budget_min"],
+        normalized["budget_max"],
+        normalized["budget_minutes"],
+    )
+
+
+def normalize_frame(df):
+    """データフレームに構造化したカラムを追加する（営業時間は"20:00-25:00"形式、定休日は曜日番号）"""
+    df = df.copy()
+    columns = df.reindex(columns=["business_hours", "holiday", "budget"])
+    values = [
+        normalized_columns(normalize_store(store))
+        for store in columns.where(columns.notna(), None).to_dict("records")
+    ]
+    for i, column in enumerate(NORMALIZED_COLUMNS):
+        df[column] = [row[i] for row in values]
+    return df
+
+
+def normalize_db(db_file):
+    """店舗データベースのうち、営業時間・定休日・予算が追加・変更された店舗だけを構造化する
+
+    構造化したカラムだけを1回のトランザクションで更新し、更新した件数を返す。
+    """
+    # store_dbはpandasを使うため、データベースを使うときだけ読み込む
+    from common.store_db import StoreDB
+
+    db = StoreDB(db_file, "caba2")
+    try:
+        rows = []
+        for key, hours, holiday, budget in db.pending(
+            "normalize", ["business_hours", "holiday", "budget"]
+        ):
+            store = {"business_hours": hours, "holiday": holiday, "budget": budget}
+            rows.append((key, normalized_columns(normalize_store(store))))
+        return db.update(rows, NORMALIZED_COLUMNS, "normalize")
+    finally:
+        db.close()
@@ -0,0 +1,243 @@
+import re
+import sys
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.store_normalize import DAY_MINUTES, WEEKDAYS, normalize_store
+
+
+WEEK_MINUTES = 7 * DAY_MINUTES
+_OPEN_AT = re.compile(r"^\s*([月火水木金土日])曜?日?\s*(\d{1,2}):(\d{2})\s*$")
+
+
+def parse_open_at(value):
+    """検索する日時を(曜日, 分)にする（"金 23:30" → (4, 1410)、datetimeも可）"""
+    if isinstance(value, datetime):
+        return value.weekday(), value.hour * 60 + value.minute
+    if isinstance(value, tuple):
+        return value
+    match = _OPEN_AT.match(unicodedata.normalize("NFKC", str(value)))
+    if not match:
+        raise ValueError(f"Invalid time: {value!r} (expected e.g. '金 23:30')")
+    weekday, hour, minute = match.groups()
+    return WEEKDAYS.index(weekday), int(hour) * 60 + int(minute)
+
+
+def week_intervals(open_hours, closed_weekdays):
+    """営業時間を1週間の通し分（月曜0:00が0）の区間のリストにする
+
+    定休日の営業は除く。前日から日付をまたいだ営業はその前日の営業として扱うため、
+    日曜定休でも土曜の夜から日曜の朝までは営業中になる。日曜の夜から月曜の朝にかかる
+    区間は週の終わりと始まりに分ける。
+    """
+    intervals = []
+    for weekday in range(7):
+        if weekday in closed_weekdays:
+            continue
+        for start, end in open_hours:
+            start += weekday * DAY_MINUTES
+            end += weekday * DAY_MINUTES
+            if end <= WEEK_MINUTES:
+                intervals.append((start, end))
+            else:
+                intervals.append((start, WEEK_MINUTES))
+                intervals.append((0, end - WEEK_MINUTES))
+    return intervals
+
+
+class StoreQueryEngine:
+    """営業時間・予算・エリアで店舗を絞り込むインメモリの検索エンジン
+
+    営業時間は区間インデックスで引く。全店舗の開店・閉店時刻で1週間を区切り、区切られた
+    各時間帯に営業している店舗をビット列で持つため、任意の時刻の営業中の店舗を二分探索
+    1回で取り出せる。予算は最低金額・最高金額でソートした範囲インデックス、エリアは
+    エリア名ごとの転置インデックスで引き、最も絞り込める条件から順に適用する。
+    店舗の番号はstoresでの順番。
+    """
+
+    def __init__(self, stores):
+        self.stores = list(stores)
+        normalized = [normalize_store(store) for store in self.stores]
+
+        # 予算の範囲インデックス（上限のない「〜」は上限を無限大とする）
+        self.budget_min = np.array(
+            [np.nan if n["budget_min"] is None else n["budget_min"] for n in normalized]
+        )
+        self.budget_max = np.array(
+            [
+                np.inf if n["budget_max"] is None else n["budget_max"]
+                for n in normalized
+            ]
+        )
+        self.budget_max[np.isnan(self.budget_min)] = np.nan
+        self._by_budget_min = self._sorted_index(self.budget_min)
+        self._by_budget_max = self._sorted_index(self.budget_max)
+
+        self.closed_on_holidays = np.array(
+            [n["closed_on_holidays"] for n in normalized], dtype=bool
+        )
+
+        # エリアの転置インデックス（エリア名ごとの店舗番号）と店舗ごとのエリア番号
+        areas = {}
+        codes = []
+        for i, store in enumerate(self.stores):
+            area = unicodedata.normalize("NFKC", str(store.get("area") or ""))
+            codes.append(areas.setdefault(area, len(areas)))
+        self._area_names = list(areas)
+        self._area_codes = np.array(codes, dtype=np.int64)
+        order = np.argsort(self._area_codes, kind="stable")
+        bounds = np.searchsorted(self._area_codes[order], np.arange(len(areas) + 1))
+        self._area_postings = [
+            order[bounds[code] : bounds[code + 1]] for code in range(len(areas))
+        ]
+        self._area_cache = {}
+
+        self._build_hours_index(normalized)
+
+    @staticmethod
+    def _sorted_index(values):
+        """値が入っている店舗を値の順に並べた(値, 店舗番号)"""
+        ids = np.flatnonzero(~np.isnan(values))
+        ids = ids[np.argsort(values[ids], kind="stable")]
+        return values[ids], ids
+
+    def _build_hours_index(self, normalized):
+        # 営業時間と定休日の組み合わせごとに区間を作り、その組み合わせの店舗に割り当てる
+        groups = {}
+        for i, n in enumerate(normalized):
+            key = (n["open_hours"], n["closed_weekdays"])
+            groups.setdefault(key, []).append(i)
+        starts, ends, owners = ([np.empty(0, dtype=np.int64)] for _ in range(3))
+        for key, ids in groups.items():
+            intervals = np.array(week_intervals(*key), dtype=np.int64).reshape(-1, 2)
+            starts.append(np.tile(intervals[:, 0], len(ids)))
+            ends.append(np.tile(intervals[:, 1], len(ids)))
+            owners.append(np.repeat(np.array(ids, dtype=np.int64), len(intervals)))
+        starts = np.concatenate(starts)
+        ends = np.concatenate(ends)
+        owners = np.concatenate(owners)
+
+        # 開店・閉店時刻で区切った時間帯ごとに、営業中の店舗のビット列を作る
+        self._boundaries = np.unique(np.concatenate(([0, WEEK_MINUTES], starts, ends)))
+        segments = len(self._boundaries) - 1
+        first = np.searchsorted(self._boundaries, starts)
+        last = np.searchsorted(self._boundaries, ends)
+        by_first = np.argsort(first, kind="stable")
+        by_last = np.argsort(last, kind="stable")
+        first_bounds = np.searchsorted(first[by_first], np.arange(segments + 1))
+        last_bounds = np.searchsorted(last[by_last], np.arange(segments + 1))
+
+        size = len(self.stores)
+        open_count = np.zeros(size, dtype=np.int32)
+        self._open_bits = np.empty((segments, (size + 7) // 8), dtype=np.uint8)
+        for segment in range(segments):
+            np.add.at(
+                open_count,
+                owners[by_first[first_bounds[segment] : first_bounds[segment + 1]]],
+                1,
+            )
+            np.subtract.at(
+                open_count,
+                owners[by_last[last_bounds[segment] : last_bounds[segment + 1]]],
+                1,
+            )
+            self._open_bits[segment] = np.packbits(open_count > 0)
+
+    def __len__(self):
+        return len(self.stores)
+
+    def _open_row(self, weekday, minute):
+        moment = (weekday * DAY_MINUTES + minute) % WEEK_MINUTES
+        return self._open_bits[np.searchsorted(self._boundaries, moment, "right") - 1]
+
+    def _is_open(self, row, ids):
+        return ((row[ids >> 3] >> (7 - (ids & 7))) & 1).astype(bool)
+
+    def _area_match(self, area):
+        """エリア名にareaを含むエリア番号のマスクと、そのエリアの店舗番号"""
+        area = unicodedata.normalize("NFKC", area)
+        cached = self._area_cache.get(area)
+        if cached is None:
+            match = np.array([area in name for name in self._area_names], dtype=bool)
+            postings = [self._area_postings[code] for code in np.flatnonzero(match)]
+            ids = np.concatenate(postings) if postings else np.empty(0, dtype=np.int64)
+            cached = self._area_cache[area] = (match, ids)
+        return cached
+
+    def area_ids(self, area):
+        """エリア名にareaを含む店舗の番号（"歌舞伎町" → 「歌舞伎町のガールズバー」なども含む）"""
+        return np.sort(self._area_match(area)[1])
+
+    def query(
+        self,
+        open_at=None,
+        max_budget=None,
+        min_budget=None,
+        area=None,
+        holiday=False,
+        limit=None,
+    ):
+        """条件をすべて満たす店舗の番号を昇順の配列で返す
+
+        open_at: その時刻に営業中（"金 23:30"・(曜日, 分)・datetime）
+        max_budget: 最低金額がmax_budget以下（予算内で入れる店舗）
+        min_budget: 最高金額がmin_budget以上
+        area: エリア名にareaを含む
+        holiday: Trueなら祝日休みの店舗を除く
+        営業時間・予算が不明な店舗は、その条件を指定したときは含めない。
+        """
+        candidates = []
+        if area is not None:
+            area_match, area_ids = self._area_match(area)
+            candidates.append(area_ids)
+        if max_budget is not None:
+            values, ids = self._by_budget_min
+            candidates.append(ids[: np.searchsorted(values, max_budget, "right")])
+        if min_budget is not None:
+            values, ids = self._by_budget_max
+            candidates.append(ids[np.searchsorted(values, min_budget, "left") :])
+        row = self._open_row(*parse_open_at(open_at)) if open_at is not None else None
+
+        size = len(self.stores)
+        ids = min(candidates, key=len) if candidates else None
+        if ids is None or len(ids) * 32 > size:
+            # 候補が多いときは全店舗のマスクをまとめて計算する方が速い
+            mask = (
+                np.unpackbits(row, count=size).astype(bool)
+                if row is not None
+                else np.ones(size, dtype=bool)
+            )
+            if area is not None:
+                in_area = np.zeros(size, dtype=bool)
+                in_area[area_ids] = True
+                mask &= in_area
+            if max_budget is not None:
+                mask &= self.budget_min <= max_budget
+            if min_budget is not None:
+                mask &= self.budget_max >= min_budget
+            if holiday:
+                mask &= ~self.closed_on_holidays
+            ids = np.flatnonzero(mask)
+            return ids[:limit] if limit else ids
+
+        # 候補が少ないときは、最も件数の少ない候補について残りの条件を確かめる
+        if area is not None:
+            ids = ids[area_match[self._area_codes[ids]]]
+        if max_budget is not None:
+            ids = ids[self.budget_min[ids] <= max_budget]
+        if min_budget is not None:
+            ids = ids[self.budget_max[ids] >= min_budget]
+        if holiday:
+            ids = ids[~self.closed_on_holidays[ids]]
+        if row is not None:
+            ids = ids[self._is_open(row, ids)]
+        ids = np.sort(ids)
+        return ids[:limit] if limit else ids
+
+    def find(self, **conditions):
+        """query()の条件に合う店舗のデータのリスト"""
+        return [self.stores[i] for i in self.query(**conditions)]
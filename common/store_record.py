@@ -0,0 +1,126 @@
+import sys
+from collections.abc import Mapping
+
+import pandas as pd
+
+
+class StoreRecord(Mapping):
+    """__slots__で値を持つ店舗レコードの基底クラス（record_typeでフィールドごとに作る）
+
+    店舗ごとに辞書を作るより1件あたりのメモリが数分の1で済む。辞書と同じように
+    record["name"]・get・keys・itemsで読み書きでき、csv.DictWriterやcontent_hashに
+    そのまま渡せる。JSONに書き出すときはdict(record)に変換する。
+    """
+
+    __slots__ = ()
+    FIELDS = ()
+    # 店舗間で同じ値が繰り返し現れるフィールド（エリア・営業時間など）は文字列を共有する
+    INTERNED = frozenset()
+    _DESCRIPTORS = {}
+
+    def __init__(self, data=None, **fields):
+        values = dict(data or {}, **fields)
+        for field, descriptor in self._DESCRIPTORS.items():
+            descriptor.__set__(self, self._intern(field, values.get(field, "")))
+
+    @classmethod
+    def _intern(cls, field, value):
+        if field in cls.INTERNED and type(value) is str:
+            return sys.intern(value)
+        return value
+
+    @classmethod
+    def from_values(cls, values):
+        """FIELDSの順の値から作成"""
+        record = cls.__new__(cls)
+        for (field, descriptor), value in zip(cls._DESCRIPTORS.items(), values):
+            descriptor.__set__(record, cls._intern(field, value))
+        return record
+
+    def __getitem__(self, field):
+        return self._DESCRIPTORS[field].__get__(self)
+
+    def __setitem__(self, field, value):
+        self._DESCRIPTORS[field].__set__(self, self._intern(field, value))
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def __reduce__(self):
+        # プロセスプールから返すときはフィールドの値だけを送る
+        return type(self).from_values, (tuple(self.values()),)
+
+
+def record_type(name, fields, interned=()):
+    """fieldsを__slots__に持つStoreRecordのサブクラスを作る
+
+    フィールド名は「Google Maps」のような識別子にできない名前でもよい。
+    """
+    slots = tuple(f"_{i}" for i in range(len(fields)))
+    cls = type(
+        name,
+        (StoreRecord,),
+        {
+            "__slots__": slots,
+            "FIELDS": tuple(fields),
+            "INTERNED": frozenset(interned),
+            # pickleで見つけられるよう、呼び出したモジュールのクラスにする
+            "__module__": sys._getframe(1).f_globals.get("__name__", __name__),
+        },
+    )
+    cls._DESCRIPTORS = {field: getattr(cls, slot) for field, slot in zip(fields, slots)}
+    return cls
+
+
+def records_from_frame(df, record_cls):
+    """データフレームの行をレコードのリストにする（to_dict("records")の代わり）"""
+    columns = [
+        df[field].tolist() if field in df.columns else [""] * len(df)
+        for field in record_cls.FIELDS
+    ]
+    return [record_cls.from_values(values) for values in zip(*columns)]
+
+
+def records_to_frame(records, fields):
+    """レコード（辞書も可）のリストをカラムごとにまとめてデータフレームにする"""
+    return pd.DataFrame(
+        {field: [record.get(field) for record in records] for field in fields},
+        columns=list(fields),
+    )
+
+
+# caba2.netの一覧ページから取得する店舗
+CabaStore = record_type(
+    "CabaStore",
+    (
+        "name",
+        "kana",
+        "area",
+        "type",
+        "business_hours",
+        "holiday",
+        "budget",
+        "phone",
+        "address",
+        "website",
+        "gmap_url",
+        "description",
+    ),
+    interned=("area", "type", "business_hours", "holiday", "budget"),
+)
+
+# 食べログの一覧・詳細ページから取得する店舗
+TabelogStore = record_type(
+    "TabelogStore",
+    ("店舗名", "エリア", "最寄駅", "ジャンル", "食べログURL", "住所", "Google Maps", "評価点数"),
+    interned=("エリア", "最寄駅", "ジャンル"),
+)
+
+# ルート探索で訪問候補にする店舗
+RouteStore = record_type("RouteStore", ("店舗名", "評価点数", "latitude", "longitude"))
@@ -0,0 +1,164 @@
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # CSVだけで使う場合はpyarrowがなくてもよい
+    pa = feather = pq = None
+
+
+# データソースごとのカラムと型（"string" / "float" / "int"）。スキーマにないカラムは文字列として扱う
+TABELOG_SCHEMA = {
+    "店舗名": "string",
+    "エリア": "string",
+    "最寄駅": "string",
+    "ジャンル": "string",
+    "食べログURL": "string",
+    "住所": "string",
+    "Google Maps": "string",
+    "評価点数": "float",
+    "latitude": "float",
+    "longitude": "float",
+}
+
+CABA2_SCHEMA = {
+    "name": "string",
+    "kana": "string",
+    "area": "string",
+    "type": "string",
+    "business_hours": "string",
+    "holiday": "string",
+    "budget": "string",
+    "phone": "string",
+    "address": "string",
+    "website": "string",
+    "gmap_url": "string",
+    "description": "string",
+    "latitude": "float",
+    "longitude": "float",
+}
+
+GMAP_SCHEMA = {
+    "official_website": "string",
+    "opening_hours": "string",
+    "gmap_rating": "float",
+    "gmap_phone": "string",
+    "latitude": "float",
+    "longitude": "float",
+}
+
+# 営業時間・定休日・予算を構造化したカラム（common.store_normalize.normalize_frameで追加）
+NORMALIZED_SCHEMA = {
+    "open_hours": "string",
+    "closed_weekdays": "string",
+    "budget_min": "float",
+    "budget_max": "float",
+    "budget_minutes": "float",
+}
+
+# 列指向フォーマットの拡張子
+PARQUET_EXTENSIONS = (".parquet",)
+ARROW_EXTENSIONS = (".arrow", ".feather")
+# 全ステージで共有する店舗データベース（common.store_db）
+DATABASE_EXTENSIONS = (".sqlite", ".sqlite3", ".db")
+DEFAULT_CHUNK_SIZE = 10_000  # Parquetの行グループ・Arrowのレコードバッチの行数
+
+
+def is_columnar(path):
+    return str(path).endswith(PARQUET_EXTENSIONS + ARROW_EXTENSIONS)
+
+
+def is_database(path):
+    return str(path).endswith(DATABASE_EXTENSIONS)
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError(
+            "Parquet/Arrowの読み書きにはpyarrowが必要です（pip install pyarrow）"
+        )
+
+
+def coerce_types(df, schema):
+    """スキーマに従って型を揃える（数値にできない評価点数などはNaN、それ以外は文字列）
+
+    "int"のカラムは欠損値を持てる整数型（Int64）にする（CSVに13.0のように書かれない）。
+    """
+    df = df.copy()
+    for column in df.columns:
+        if schema.get(column) == "float":
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype("float64")
+        elif schema.get(column) == "int":
+            df[column] = pd.to_numeric(df[column], errors="coerce").round().astype("Int64")
+        else:
+            df[column] = df[column].astype("string")
+    return df
+
+
+def arrow_schema(columns, schema):
+    """カラムのリストからArrowのスキーマを作成"""
+    require_pyarrow()
+    types = {"float": pa.float64(), "int": pa.int64(), "string": pa.string()}
+    return pa.schema(
+        [(column, types[schema.get(column, "string")]) for column in columns]
+    )
+
+
+def write_table(df, path, schema, chunk_size=DEFAULT_CHUNK_SIZE):
+    """拡張子に応じてParquet・Arrow・CSVで書き出す（列指向フォーマットはchunk_size行ごとに分割）
+
+    店舗データベースには書き直さず、店舗キーで追加・更新する。
+    """
+    df = coerce_types(df, schema)
+    if is_database(path):
+        # store_dbはこのモジュールを読み込むため、使うときに読み込む
+        from common.store_db import write_db
+
+        write_db(df, path, schema)
+        return
+    if not is_columnar(path):
+        df.to_csv(path, index=False, encoding="utf-8-sig")
+        return
+
+    table = pa.Table.from_pandas(
+        df, schema=arrow_schema(df.columns, schema), preserve_index=False
+    )
+    tmp_path = f"{path}.tmp"
+    if str(path).endswith(PARQUET_EXTENSIONS):
+        pq.write_table(table, tmp_path, row_group_size=chunk_size, compression="zstd")
+    else:
+        feather.write_feather(table, tmp_path, chunksize=chunk_size, compression="zstd")
+    os.replace(tmp_path, path)
+
+
+def read_table(path, schema, columns=None):
+    """拡張子に応じてParquet・Arrow・CSV・店舗データベースを読み込む
+
+    columnsを指定すると必要なカラムだけを読み込む（列指向フォーマットでは他のカラムは
+    ディスクから読まない）。ファイルにないカラムは無視する。
+    """
+    if is_database(path):
+        from common.store_db import read_db
+
+        return read_db(path, schema, columns)
+    if is_columnar(path):
+        require_pyarrow()
+        if str(path).endswith(PARQUET_EXTENSIONS):
+            available = pq.read_schema(path).names
+        else:
+            with pa.memory_map(str(path)) as source:
+                available = pa.ipc.open_file(source).schema.names
+        selected = [c for c in columns if c in available] if columns else None
+        if str(path).endswith(PARQUET_EXTENSIONS):
+            table = pq.read_table(path, columns=selected)
+        else:
+            table = feather.read_table(path, columns=selected, memory_map=True)
+        return table.to_pandas()
+
+    # CSVは型推論させずに文字列として読み、スキーマで型を揃える（電話番号の先頭の0などを守る）
+    usecols = (lambda column: column in columns) if columns else None
+    return coerce_types(pd.read_csv(path, usecols=usecols, dtype=str), schema)
+
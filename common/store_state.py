@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import unicodedata
+
+
+def content_hash(data):
+    """辞書の内容から安定したハッシュ値を計算（キー順・全角半角・前後の空白の違いは無視）"""
+    normalized = {
+        key: unicodedata.normalize("NFKC", str(value)).strip()
+        for key, value in data.items()
+        if value is not None
+    }
+    payload = json.dumps(normalized, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class StoreState:
+    """前回クロール時の店舗ごとのハッシュを保持し、今回の結果との差分を検出する
+
+    状態ファイルには店舗キーごとに一覧スニペットのハッシュ、レコードのハッシュ、
+    レコード本体を保存する。一覧スニペットが変わっていない店舗は前回のレコードを
+    再利用できるため、詳細ページやGoogle Mapsの取得を省略できる。
+
+    一覧を最後まで取得できたとき（クローラーがcompleteをTrueにしたとき）だけ、
+    今回見つからなかった店舗を削除として扱う。途中で打ち切ったクロールでは
+    今回取得しなかった店舗の前回の状態をそのまま残す。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.previous = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.previous = json.load(f)
+        self.current = {}
+        self.statuses = {}
+        self.failed = set()
+        self.complete = False
+
+    def mark_failed(self, key):
+        """詳細ページなどの取得に失敗した店舗（前回の状態を残し、次回取得し直す）"""
+        self.failed.add(key)
+
+    def reusable(self, key, snippet_hash):
+        """一覧スニペットが前回から変わっていなければ前回のレコードを返す"""
+        entry = self.previous.get(key)
+        if entry and entry.get("snippet_hash") == snippet_hash:
+            return dict(entry["record"])
+        return None
+
+    def update(self, key, record, snippet_hash=None):
+        """今回のレコードを登録し、added / changed / unchanged / failed のいずれかを返す"""
+        entry = self.previous.get(key)
+        if key in self.failed:
+            # 取得に失敗したレコードは保存しない（前回の状態があればそのまま残す）
+            if entry is not None:
+                self.current[key] = entry
+            return "failed"
+
+        record_hash = content_hash(record)
+        if entry is None:
+            status = "added"
+        elif entry["hash"] != record_hash:
+            status = "changed"
+        else:
+            status = "unchanged"
+
+        self.current[key] = {
+            "hash": record_hash,
+            "snippet_hash": snippet_hash,
+            "record": record,
+        }
+        self.statuses[key] = status
+        return status
+
+    def delta(self):
+        """前回からの差分（追加・変更・削除されたレコード）"""
+        delta = {"added": [], "changed": [], "removed": []}
+        for key, status in self.statuses.items():
+            if status != "unchanged":
+                delta[status].append(self.current[key]["record"])
+        if self.complete:
+            for key, entry in self.previous.items():
+                if key not in self.current:
+                    delta["removed"].append(entry["record"])
+        return delta
+
+    def save(self):
+        """今回の状態を保存（一覧を最後まで取得したときだけ、見つからなかった店舗を削除する）"""
+        current = self.current
+        if not self.complete:
+            current = {**self.previous, **self.current}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            # StoreRecordなど辞書以外のレコードは辞書にして書き出す
+            json.dump(current, f, ensure_ascii=False, default=dict)
+        os.replace(tmp_path, self.path)
+
+    def write_delta(self, delta_path):
+        """差分をJSONファイルに書き出し、件数を返す"""
+        delta = self.delta()
+        with open(delta_path, "w", encoding="utf-8") as f:
+            json.dump(delta, f, ensure_ascii=False, indent=2, default=dict)
+        return {status: len(records) for status, records in delta.items()}
+
+
+def load_delta_keys(delta_path, key_field):
+    """差分ファイルから追加・変更されたレコードのキーを読み込む"""
+    with open(delta_path, "r", encoding="utf-8") as f:
+        delta = json.load(f)
+    return {
+        record[key_field]
+        for status in ("added", "changed")
+        for record in delta[status]
+        if record.get(key_field)
+    }
@@ -0,0 +1,357 @@
+"""クローラー・Google Maps取得・ジオコーディング・ルート探索の共通コマンド
+
+    python hikaricrawler.py crawl-tabelog --area A1306 --limit 50
+    python hikaricrawler.py crawl-caba --stores 200 --http
+    python hikaricrawler.py enrich-gmap cabacaba_stores.csv --fields website,rating
+    python hikaricrawler.py geocode shinjuku_restaurants.csv
+    python hikaricrawler.py route shinjuku_restaurants_with_coordinates.csv --stations stations.csv
+    python hikaricrawler.py query cabacaba_stores.csv --open-at "金 23:30" --max-budget 6000 --area 歌舞伎町
+
+ファイルの代わりに店舗データベース（.sqlite）を指定すると、全ステージが1つのデータベースを
+共有し、各ステージは追加・変更された店舗だけを処理する。
+
+    python hikaricrawler.py crawl-caba --http --db stores.sqlite
+    python hikaricrawler.py enrich-gmap stores.sqlite --fields website,coordinates
+    python hikaricrawler.py normalize stores.sqlite
+    python hikaricrawler.py crawl-tabelog --area A1306 -o stores.sqlite
+    python hikaricrawler.py geocode stores.sqlite
+    python hikaricrawler.py route stores.sqlite
+
+Selenium・Playwright・pandas・foliumなどの重い依存はサブコマンドの中で読み込むため、
+--helpやcronから起動する短い処理はすぐに立ち上がる。
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+
+def _use(directory):
+    """サブコマンドが使うディレクトリのモジュールを読み込めるようにする"""
+    path = str(ROOT / directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def _add_metrics_arguments(parser):
+    parser.add_argument("--metrics-file", help="処理時間などの集計を書き出すJSONファイル")
+    parser.add_argument("--prometheus-file", help="Prometheusのテキスト形式で書き出すファイル")
+
+
+def crawl_tabelog(args):
+    _use("tabelog")
+    from tabecrawler import TOKYO_AREAS, scrape_tabelog_areas
+    from common.store_record import TabelogStore, records_to_frame
+    from common.store_schema import TABELOG_SCHEMA, write_table
+
+    # エリアはエリア名かコード（A1306など）で指定する
+    areas = {
+        name: url
+        for name, url in TOKYO_AREAS.items()
+        if not args.area or name in args.area or url.split("/")[4] in args.area
+    }
+    if not areas:
+        print(f"Error: Unknown area: {', '.join(args.area)}")
+        return 1
+
+    results = scrape_tabelog_areas(
+        areas,
+        limit=args.limit,
+        max_concurrent=args.max_concurrent,
+        requests_per_second=args.requests_per_second,
+        cache_dir=args.cache_dir,
+        parse_workers=args.parse_workers,
+        state_file=args.state_file,
+        delta_file=args.delta_file,
+        metrics_file=args.metrics_file,
+        prometheus_file=args.prometheus_file,
+    )
+    if not results:
+        print("\nデータの取得に失敗しました。")
+        return 1
+
+    write_table(
+        records_to_frame(results, TabelogStore.FIELDS), args.output, TABELOG_SCHEMA
+    )
+    print(f"\n{len(results)}件を '{args.output}' に保存しました！")
+    return 0
+
+
+def crawl_caba(args):
+    _use("kyabakyaba")
+    from kyabakyabacrawler import scrape_cabacaba
+
+    scrape_cabacaba(
+        args.stores,
+        output_file=args.output,
+        checkpoint_file=f"{Path(args.output).with_suffix('')}.checkpoint.json",
+        existing_csv=args.existing,
+        workers=args.workers,
+        use_http=args.http,
+        parse_workers=args.parse_workers,
+        state_file=args.state_file,
+        delta_file=args.delta_file,
+        metrics_file=args.metrics_file,
+        prometheus_file=args.prometheus_file,
+        parquet_file=args.parquet,
+        db_file=args.db,
+    )
+    return 0
+
+
+def enrich_gmap(args):
+    _use("kyabakyaba")
+    import asyncio
+    from gmap_enricher import FIELDS, process_csv_file
+
+    fields = [field.strip() for field in args.fields.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in FIELDS]
+    if unknown:
+        print(f"Error: Unknown fields: {', '.join(unknown)} (choose from {', '.join(FIELDS)})")
+        return 1
+
+    asyncio.run(
+        process_csv_file(
+            args.input,
+            fields=fields,
+            max_concurrent=args.max_concurrent,
+            output_file=args.output,
+            fast_mode=not args.slow,
+            delta_file=args.delta_file,
+            metrics_file=args.metrics_file,
+            prometheus_file=args.prometheus_file,
+            requests_per_second=args.requests_per_second,
+        )
+    )
+    return 0
+
+
+def geocode(args):
+    _use("tabelog")
+    from getlocation import geocode_file
+
+    output_file = geocode_file(args.input, args.output, verbose=args.verbose)
+    return 0 if output_file else 1
+
+
+def route(args):
+    _use("tabelog")
+    from route_solvers import AnnealingSolver, GreedySolver
+
+    solver = (
+        AnnealingSolver(time_budget=args.time_budget)
+        if args.solver == "annealing"
+        else GreedySolver()
+    )
+
+    # 複数の駅からのルートをまとめて計算
+    if args.stations:
+        from batch_routes import plan_routes
+
+        plan_routes(
+            args.stores,
+            args.stations,
+            args.output,
+            solver=solver,
+            workers=args.workers,
+            map_file=args.map,
+        )
+        return 0
+
+    # 駅名を指定した場合はジオコーディングした座標から出発する
+    if args.station:
+        from create_route_map import main as create_route
+
+        create_route(args.stores, args.station, solver=solver, map_file=args.map)
+        return 0
+
+    from route_optimizer import RouteOptimizer
+
+    optimizer = RouteOptimizer(args.stores)
+    route, total_distance = optimizer.find_optimal_route(solver)
+    optimizer.print_route(route, total_distance)
+    if args.map:
+        optimizer.create_map(route, total_distance, cluster=True, map_file=args.map)
+        print(f"\n地図を '{args.map}' に保存しました！")
+    return 0
+
+
+def _load_stores(path):
+    import json
+
+    from common.store_schema import CABA2_SCHEMA, read_table
+
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    df = read_table(path, CABA2_SCHEMA)
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def normalize(args):
+    import pandas as pd
+    from common.store_normalize import normalize_db, normalize_frame
+    from common.store_schema import (
+        CABA2_SCHEMA,
+        NORMALIZED_SCHEMA,
+        is_database,
+        write_table,
+    )
+
+    # 店舗データベースは営業時間・定休日・予算が追加・変更された店舗だけを更新する
+    if is_database(args.input):
+        updated = normalize_db(args.input)
+        print(f"{updated}件を '{args.input}' に保存しました！")
+        return 0
+
+    df = normalize_frame(pd.DataFrame(_load_stores(args.input)))
+    output_file = args.output or f"{Path(args.input).with_suffix('')}_normalized.parquet"
+    write_table(df, output_file, {**CABA2_SCHEMA, **NORMALIZED_SCHEMA})
+    print(f"{len(df)}件を '{output_file}' に保存しました！")
+    return 0
+
+
+def query(args):
+    import time
+
+    from common.store_normalize import format_hours, normalize_store
+    from common.store_query import StoreQueryEngine
+
+    engine = StoreQueryEngine(_load_stores(args.input))
+    started = time.perf_counter()
+    try:
+        ids = engine.query(
+            open_at=args.open_at,
+            max_budget=args.max_budget,
+            min_budget=args.min_budget,
+            area=args.area,
+            holiday=args.holiday,
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    elapsed = time.perf_counter() - started
+
+    for i in ids[: args.limit]:
+        store = engine.stores[i]
+        normalized = normalize_store(store)
+        budget = normalized["budget_min"]
+        print(
+            f"{store.get('name')} | {store.get('area')} | "
+            f"{format_hours(normalized['open_hours']) or '-'} | "
+            f"{f'{budget:,.0f}円〜' if budget is not None else '-'}"
+        )
+    print(f"\n{len(ids)}件 / {len(engine)}件（検索 {elapsed * 1000:.2f}ms）")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="hikaricrawler",
+        description="食べログ・キャバクラ情報サイトのクロールと店舗データの加工",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser("crawl-tabelog", help="食べログの店舗一覧と詳細を取得")
+    p.add_argument(
+        "--area",
+        action="append",
+        help="エリア名またはコード（A1306など。複数指定可、省略時は東京都内の全エリア）",
+    )
+    p.add_argument("--limit", type=int, default=100, help="エリアごとの取得件数")
+    p.add_argument("--max-concurrent", type=int, default=8)
+    p.add_argument("--requests-per-second", type=float, default=1.0)
+    p.add_argument("--cache-dir", default=".http_cache")
+    p.add_argument("--parse-workers", type=int, default=2)
+    p.add_argument("--state-file", default="tokyo_state.json")
+    p.add_argument("--delta-file", default="tokyo_delta.json")
+    p.add_argument(
+        "-o",
+        "--output",
+        default="tokyo_restaurants.parquet",
+        help="出力ファイル（.sqliteなら店舗データベースに追加・更新）",
+    )
+    _add_metrics_arguments(p)
+    p.set_defaults(handler=crawl_tabelog)
+
+    p = subparsers.add_parser("crawl-caba", help="キャバクラ情報サイトの店舗一覧を取得")
+    p.add_argument("--stores", type=int, default=200, help="取得する店舗数")
+    p.add_argument("-o", "--output", default="cabacaba_stores.csv")
+    p.add_argument(
+        "--existing", help="取得済みとして扱う既存の店舗CSV（環境変数CABACABA_EXISTING_CSVでも指定可）"
+    )
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--parse-workers", type=int, default=2)
+    p.add_argument("--http", action="store_true", help="ブラウザを使わずHTTPで取得")
+    p.add_argument("--state-file", default="cabacaba_state.json")
+    p.add_argument("--delta-file", default="cabacaba_delta.json")
+    p.add_argument("--parquet", help="型付きで書き出すParquetファイル")
+    p.add_argument("--db", help="取得した店舗を追加・更新する店舗データベース（.sqlite）")
+    _add_metrics_arguments(p)
+    p.set_defaults(handler=crawl_caba)
+
+    p = subparsers.add_parser("enrich-gmap", help="Google Mapsから店舗情報を追加")
+    p.add_argument(
+        "input", help="gmap_urlカラムを含む店舗データ（CSV・Parquet・Arrow・店舗データベース）"
+    )
+    p.add_argument("-o", "--output", help="出力ファイル（省略時は<入力>_enriched）")
+    p.add_argument(
+        "--fields",
+        default="website,opening_hours",
+        help="取得項目（カンマ区切り: website, opening_hours, rating, phone, coordinates）",
+    )
+    p.add_argument("--max-concurrent", type=int, default=5)
+    p.add_argument("--requests-per-second", type=float)
+    p.add_argument("--delta-file", help="差分クロールで変更のあった店舗だけを取得し直す")
+    p.add_argument("--slow", action="store_true", help="ページの読み込み完了まで待つ")
+    _add_metrics_arguments(p)
+    p.set_defaults(handler=enrich_gmap)
+
+    p = subparsers.add_parser("geocode", help="住所から座標を取得")
+    p.add_argument("input", help="住所カラムを含む店舗データ（店舗データベースなら未取得の店舗だけ）")
+    p.add_argument("-o", "--output", help="出力ファイル（省略時は<入力>_with_coordinates.csv）")
+    p.add_argument("-v", "--verbose", action="store_true", help="店舗ごとの座標を表示")
+    p.set_defaults(handler=geocode)
+
+    p = subparsers.add_parser("route", help="店舗を巡るルートを計算")
+    p.add_argument("stores", help="座標を含む店舗データ（CSV・Parquet・Arrow・店舗データベース）")
+    start = p.add_mutually_exclusive_group()
+    start.add_argument("--station", help="開始地点の駅名（省略時は表参道駅）")
+    start.add_argument(
+        "--stations", help="複数の開始地点（name,latitude,longitudeのCSV、または1行1駅名のテキスト）"
+    )
+    p.add_argument("-o", "--output", default="routes.csv", help="--stationsの結果の出力ファイル")
+    p.add_argument("--map", help="地図のHTMLファイル")
+    p.add_argument("--solver", choices=["greedy", "annealing"], default="greedy")
+    p.add_argument("--time-budget", type=float, default=1.0)
+    p.add_argument("--workers", type=int, help="--stationsのプロセス数")
+    p.set_defaults(handler=route)
+
+    p = subparsers.add_parser("normalize", help="営業時間・定休日・予算を構造化")
+    p.add_argument("input", help="店舗データ（CSV・Parquet・Arrow・JSON・店舗データベース）")
+    p.add_argument("-o", "--output", help="出力ファイル（省略時は<入力>_normalized.parquet）")
+    p.set_defaults(handler=normalize)
+
+    p = subparsers.add_parser("query", help="営業時間・予算・エリアで店舗を検索")
+    p.add_argument("input", help="店舗データ（CSV・Parquet・Arrow・JSON・店舗データベース）")
+    p.add_argument("--open-at", help='営業中の日時（例: "金 23:30"）')
+    p.add_argument("--max-budget", type=float, help="最低金額の上限（円）")
+    p.add_argument("--min-budget", type=float, help="最高金額の下限（円）")
+    p.add_argument("--area", help="エリア名（部分一致）")
+    p.add_argument("--holiday", action="store_true", help="祝日休みの店舗を除く")
+    p.add_argument("--limit", type=int, default=20, help="表示件数")
+    p.set_defaults(handler=query)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sys.path.append(str(ROOT))
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -38,4 +38,5 @@ def get_store_info():
         driver.quit()
 
 
-get_store_info()
+if __name__ == "__main__":
+    get_store_info()
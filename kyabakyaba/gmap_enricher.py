@@ -0,0 +1,628 @@
+import asyncio
+import json
+import os
+import re
+import sys
+from pathlib import Path
+from playwright.async_api import async_playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+import pandas as pd
+from typing import Any, Callable, Optional, List, Dict, Iterable, Tuple
+import logging
+
+# ロギングの設定
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.adaptive_limiter import (
+    AdaptiveLimiter,
+    ThrottledError,
+    check_status,
+    is_captcha_title,
+)
+from common.metrics import CrawlMetrics
+from common.store_db import StoreDB
+from common.store_schema import (
+    CABA2_SCHEMA,
+    GMAP_SCHEMA,
+    is_columnar,
+    is_database,
+    read_table,
+    write_table,
+)
+from common.store_state import load_delta_keys
+
+
+async def extract_website(page, fast_mode=False) -> Dict[str, Optional[str]]:
+    """公式サイトのURLを取得"""
+    website_button = await page.query_selector('a[data-item-id="authority"]')
+    if not website_button:
+        return {"official_website": None}
+
+    official_url = await website_button.get_attribute("href")
+    logger.info(f"✨ 公式サイト発見: {official_url}")
+    return {"official_website": official_url}
+
+
+async def extract_opening_hours(page, fast_mode=False) -> Dict[str, Optional[str]]:
+    """営業時間を取得して1つの文字列にまとめる"""
+    # 営業時間の情報が表示されるまで待機
+    if not fast_mode:
+        await page.wait_for_selector('div[class*="fontHeadlineSmall"]', timeout=10000)
+
+    # スクロールして営業時間セクションを表示
+    await page.evaluate("""() => {
+        const elements = document.querySelectorAll('div[class*="fontHeadlineSmall"]');
+        for (const element of elements) {
+            if (element.textContent.includes('営業時間')) {
+                element.scrollIntoView();
+                break;
+            }
+        }
+    }""")
+
+    if not fast_mode:
+        await asyncio.sleep(2)  # スクロール後の表示待ち
+
+    # 営業時間の情報を取得
+    hours_info = await page.query_selector_all("tr.y0skZc")
+    opening_hours_list = []
+
+    for row in hours_info:
+        day = await row.query_selector("td.ylH6lf div")
+        time_info = await row.query_selector("td.mxowUb")
+
+        if day and time_info:
+            day_text = await day.inner_text()
+            time_text = await time_info.inner_text()
+            opening_hours_list.append(f"{day_text}: {time_text}")
+
+    # 営業時間を1つの文字列にまとめる
+    if opening_hours_list:
+        logger.info(f"✨ 営業時間を取得: {len(opening_hours_list)}日分")
+        return {"opening_hours": "\n".join(opening_hours_list)}
+    return {"opening_hours": None}
+
+
+async def extract_rating(page, fast_mode=False) -> Dict[str, Optional[str]]:
+    """Googleマップ上の評価を取得"""
+    rating = await page.query_selector('div.F7nice span[aria-hidden="true"]')
+    return {"gmap_rating": (await rating.inner_text()).strip() if rating else None}
+
+
+async def extract_phone(page, fast_mode=False) -> Dict[str, Optional[str]]:
+    """電話番号を取得"""
+    phone_button = await page.query_selector('button[data-item-id^="phone:tel:"]')
+    if not phone_button:
+        return {"gmap_phone": None}
+    item_id = await phone_button.get_attribute("data-item-id")
+    return {"gmap_phone": item_id.replace("phone:tel:", "")}
+
+
+_COORDINATES_PATTERN = re.compile(r"!3d(-?\d+\.\d+)!4d(-?\d+\.\d+)|@(-?\d+\.\d+),(-?\d+\.\d+)")
+
+
+async def extract_coordinates(page, fast_mode=False) -> Dict[str, Optional[float]]:
+    """遷移後のURLから座標を取得"""
+    match = _COORDINATES_PATTERN.search(page.url)
+    if not match:
+        return {"latitude": None, "longitude": None}
+    lat, lng = match.group(1, 2) if match.group(1) else match.group(3, 4)
+    return {"latitude": float(lat), "longitude": float(lng)}
+
+
+# 取得項目名 -> (抽出関数, CSVに追加するカラム, 高速モードで待機するセレクタ)
+FIELDS = {
+    "website": (extract_website, ["official_website"], 'a[data-item-id="authority"]'),
+    "opening_hours": (extract_opening_hours, ["opening_hours"], "tr.y0skZc"),
+    "rating": (extract_rating, ["gmap_rating"], 'div.F7nice span[aria-hidden="true"]'),
+    "phone": (extract_phone, ["gmap_phone"], 'button[data-item-id^="phone:tel:"]'),
+    "coordinates": (extract_coordinates, ["latitude", "longitude"], None),
+}
+
+# 高速モードでブロックするリソース種別とURL（地図タイル・ストリートビュー画像）
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+BLOCKED_URL_PATTERNS = ("/maps/vt", "khms", "/kh/v", "streetviewpixels")
+
+PLACE_READY_SELECTOR = 'div[role="main"] h1'  # 店舗ページの読み込み完了の目印
+FIELD_WAIT_TIMEOUT = 3000  # 各項目のセレクタを待つ上限(ms)。項目が存在しない店舗もある
+
+DEFAULT_FIELDS = ("website", "opening_hours")
+
+# 取得結果を追加した店舗データのスキーマ
+ENRICHED_SCHEMA = {**CABA2_SCHEMA, **GMAP_SCHEMA}
+
+
+class GMapScraper:
+    """Google Mapsの店舗ページを1回だけ開いて、指定された項目をまとめて取得する"""
+
+    def __init__(
+        self,
+        max_concurrent: int = 5,
+        fields: Iterable[str] = DEFAULT_FIELDS,
+        fast_mode: bool = False,
+        metrics: Optional[CrawlMetrics] = None,
+        requests_per_second: Optional[float] = None,
+    ):
+        unknown = [field for field in fields if field not in FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {unknown}")
+        self.fields = list(fields)
+        self.fast_mode = fast_mode
+        self.metrics = metrics or CrawlMetrics("gmap")
+        self.max_concurrent = max_concurrent
+        # 開いたままのページ（情報の抽出中を含む）の上限
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        # ページを開く間隔と同時実行数は、max_concurrentから始めてアクセス制限の応答に応じて自動で調整する
+        self.limiter = AdaptiveLimiter(
+            requests_per_second,
+            max_concurrency=max_concurrent,
+            initial_concurrency=max_concurrent,
+            metrics=self.metrics,
+        )
+        self.playwright = None
+        self.browser = None
+        self.context = None
+        # 取得に失敗した（アクセス制限・タイムアウト・エラー）URL
+        self.failed = set()
+
+    @property
+    def columns(self) -> List[str]:
+        return [column for field in self.fields for column in FIELDS[field][1]]
+
+    async def init_browser(self):
+        """Playwrightブラウザの初期化"""
+        self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch(headless=True)
+        self.context = await self.browser.new_context(
+            viewport={"width": 1280, "height": 800}
+        )
+        if self.fast_mode:
+            await self.context.route("**/*", self._block_heavy_resources)
+
+    async def _block_heavy_resources(self, route):
+        """画像・動画・フォント・地図タイルのリクエストを中断"""
+        request = route.request
+        if request.resource_type in BLOCKED_RESOURCE_TYPES or any(
+            pattern in request.url for pattern in BLOCKED_URL_PATTERNS
+        ):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def _count_response_bytes(self, response):
+        """ページが受信したレスポンスの転送量を加算（Content-Lengthがあるものだけ）"""
+        length = response.headers.get("content-length")
+        if length and length.isdigit():
+            self.metrics.incr("bytes", int(length))
+
+    async def _wait_for_fields(self, page, fields: List[str]):
+        """networkidleの代わりに、抽出対象のセレクタだけを待つ"""
+        await page.wait_for_selector(PLACE_READY_SELECTOR, timeout=10000)
+        selectors = [FIELDS[field][2] for field in fields if FIELDS[field][2]]
+        # 該当項目がない店舗ではタイムアウトするため、例外は無視してまとめて待つ
+        await asyncio.gather(
+            *(
+                page.wait_for_selector(
+                    selector, state="attached", timeout=FIELD_WAIT_TIMEOUT
+                )
+                for selector in selectors
+            ),
+            return_exceptions=True,
+        )
+
+    async def _open_place(self, gmap_url: str, fields: List[str]):
+        """店舗ページを開く（アクセス制限・CAPTCHAページならThrottledErrorを送出）"""
+        page = await self.context.new_page()
+        try:
+            page.on("response", self._count_response_bytes)
+            with self.metrics.stage("fetch"):
+                response = await page.goto(
+                    gmap_url,
+                    wait_until="domcontentloaded" if self.fast_mode else "networkidle",
+                )
+            self.metrics.incr("requests")
+            if response:
+                check_status(response.status, gmap_url, response.headers)
+            if "/sorry/" in page.url or is_captcha_title(await page.title()):
+                raise ThrottledError(f"CAPTCHA {gmap_url}")
+            if self.fast_mode:
+                with self.metrics.stage("wait"):
+                    await self._wait_for_fields(page, fields)
+            return page
+        except BaseException as e:
+            if isinstance(e, PlaywrightTimeoutError):
+                self.metrics.incr("timeouts")
+            await page.close()
+            raise
+
+    async def close_browser(self):
+        """ブラウザのクリーンアップ"""
+        if self.context:
+            await self.context.close()
+        if self.browser:
+            await self.browser.close()
+        if self.playwright:
+            await self.playwright.stop()
+
+    async def get_place_info(
+        self, gmap_url: str, fields: Optional[Iterable[str]] = None
+    ) -> Dict[str, Optional[str]]:
+        """Google Maps URLを1回読み込み、指定項目をまとめて取得"""
+        fields = list(fields) if fields is not None else self.fields
+        info = {column: None for field in fields for column in FIELDS[field][1]}
+        if not gmap_url or not isinstance(gmap_url, str):
+            return info
+
+        async with self.semaphore:
+            page = None
+            try:
+                # アクセス制限・タイムアウトは間隔を空けて開き直す
+                page = await self.limiter.call(
+                    gmap_url,
+                    lambda: self._open_place(gmap_url, fields),
+                    retry_on=(PlaywrightTimeoutError,),
+                )
+
+                with self.metrics.stage("extract"):
+                    for field in fields:
+                        extractor = FIELDS[field][0]
+                        try:
+                            info.update(await extractor(page, fast_mode=self.fast_mode))
+                        except Exception as e:
+                            self.metrics.incr("errors")
+                            logger.error(f"❌ {field} の取得でエラーが発生しました: {str(e)}")
+
+            except ThrottledError as e:
+                self.failed.add(gmap_url)
+                self.metrics.incr("errors")
+                logger.error(f"🚫 アクセスが制限されました: {str(e)}")
+
+            except PlaywrightTimeoutError as e:
+                self.failed.add(gmap_url)
+                logger.error(f"⏱️ タイムアウトしました: {str(e)}")
+
+            except Exception as e:
+                self.failed.add(gmap_url)
+                self.metrics.incr("errors")
+                logger.error(f"❌ エラーが発生しました: {str(e)}")
+
+            finally:
+                if page:
+                    await page.close()
+
+        return info
+
+    async def get_official_website(self, gmap_url: str) -> Optional[str]:
+        """Google Maps URLから公式サイトのURLを取得"""
+        info = await self.get_place_info(gmap_url, ["website"])
+        return info["official_website"]
+
+    async def get_opening_hours(self, gmap_url: str) -> Optional[str]:
+        """Google Maps URLから営業時間を取得して1つの文字列にまとめる"""
+        info = await self.get_place_info(gmap_url, ["opening_hours"])
+        return info["opening_hours"]
+
+    async def process_urls_batch(self, urls: List[str]) -> List[Dict[str, Optional[str]]]:
+        """URLのバッチ処理"""
+        tasks = [self.get_place_info(url) for url in urls]
+        return await asyncio.gather(*tasks)
+
+
+async def stream_place_info(
+    scraper: GMapScraper,
+    items: Iterable[Tuple[Any, str]],
+    on_result: Callable[[Any, Dict[str, Optional[str]]], None],
+    max_concurrent: int = 5,
+):
+    """常にmax_concurrent件のURLを処理中に保つスライディングウィンドウで店舗情報を取得
+
+    1件終わるごとにon_result(key, info)を呼び出すため、遅いURLがあっても他の枠は止まらない。
+    """
+    queue = asyncio.Queue()
+    for item in items:
+        queue.put_nowait(item)
+
+    async def worker():
+        while True:
+            try:
+                key, gmap_url = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            on_result(key, await scraper.get_place_info(gmap_url))
+
+    await asyncio.gather(*(worker() for _ in range(max_concurrent)))
+
+
+def load_completed_urls(output_file: str) -> set:
+    """途中まで書き込まれた出力ファイルから処理済みのgmap_urlを読み込む"""
+    if not os.path.exists(output_file) or os.path.getsize(output_file) == 0:
+        return set()
+    partial = pd.read_csv(output_file, on_bad_lines="skip", dtype=str)
+    if "gmap_url" not in partial.columns:
+        return set()
+    return set(partial["gmap_url"].dropna())
+
+
+def load_failed_urls(failed_file: str) -> set:
+    """前回取得に失敗したgmap_urlを読み込む（出力ファイルには空の値で書かれている）"""
+    if not os.path.exists(failed_file):
+        return set()
+    with open(failed_file, "r", encoding="utf-8") as f:
+        return set(json.load(f))
+
+
+def save_failed_urls(failed_file: str, failed: set):
+    """取得に失敗したgmap_urlを保存し、次回の実行で取得し直す（なければファイルを削除）"""
+    if not failed:
+        if os.path.exists(failed_file):
+            os.remove(failed_file)
+        return
+    with open(failed_file, "w", encoding="utf-8") as f:
+        json.dump(sorted(failed), f, ensure_ascii=False)
+
+
+async def process_csv_file(
+    input_csv: str,
+    fields: Iterable[str] = DEFAULT_FIELDS,
+    max_concurrent: int = 5,
+    output_file: Optional[str] = None,
+    fast_mode: bool = True,
+    delta_file: Optional[str] = None,
+    metrics_file: Optional[str] = None,
+    prometheus_file: Optional[str] = None,
+    metrics_interval: float = 10.0,
+    requests_per_second: Optional[float] = None,
+):
+    """CSVファイルを処理してGoogle Mapsの店舗情報を追加する
+
+    取得できた行から順に出力ファイルへ追記し、再実行時は出力済みの行をスキップする。
+    取得に失敗した店舗は<output_file>.failed.jsonに記録し、再実行時に取得し直す。
+    全件完了後に入力と同じ行順で出力ファイルを書き直す。
+    delta_fileを指定すると、差分クロールで追加・変更された店舗だけを取得し直し、
+    それ以外は前回の出力ファイルの値を再利用する。
+    入力・出力にはCSVのほかParquet・Arrowも使える。列指向フォーマットに出力する場合、
+    途中経過は<output_file>.partial.csvに追記し、完了時に型付きで書き出す。
+    metrics_file・prometheus_fileを指定すると、ステージごとの処理時間を定期的に書き出す。
+    requests_per_secondを指定すると、ページを開く頻度をその値までに抑える。
+    入力が店舗データベース（.sqlite）の場合はprocess_store_dbで未取得の店舗だけを更新する
+    （output_file・delta_fileは使わない）。
+    """
+    if is_database(input_csv):
+        await process_store_db(
+            input_csv,
+            fields=fields,
+            max_concurrent=max_concurrent,
+            fast_mode=fast_mode,
+            metrics_file=metrics_file,
+            prometheus_file=prometheus_file,
+            metrics_interval=metrics_interval,
+            requests_per_second=requests_per_second,
+        )
+        return
+
+    scraper = None
+    metrics = CrawlMetrics("gmap")
+    metrics.start_reporter(metrics_file, prometheus_file, metrics_interval)
+    try:
+        # 店舗データを読み込む（CSV・Parquet・Arrowに対応）
+        df = read_table(input_csv, ENRICHED_SCHEMA)
+
+        if "gmap_url" not in df.columns:
+            logger.error("❌ CSVファイルにgmap_urlカラムがありません")
+            return
+
+        root, ext = os.path.splitext(input_csv)
+        output_file = output_file or f"{root}_enriched{ext}"
+        # 列指向フォーマットには追記できないため、途中経過はCSVに書く
+        progress_file = (
+            f"{output_file}.partial.csv" if is_columnar(output_file) else output_file
+        )
+
+        # スクレイパーの初期化
+        scraper = GMapScraper(
+            max_concurrent=max_concurrent,
+            fields=fields,
+            fast_mode=fast_mode,
+            metrics=metrics,
+            requests_per_second=requests_per_second,
+        )
+
+        # 取得項目のカラムを追加
+        df = df.drop(columns=[c for c in scraper.columns if c in df.columns])
+        for column in scraper.columns:
+            df[column] = None
+
+        # 前回の列指向フォーマットの出力があれば、差分の再取得に使えるよう途中経過のCSVに戻す
+        if (
+            progress_file != output_file
+            and os.path.exists(output_file)
+            and not os.path.exists(progress_file)
+        ):
+            read_table(output_file, ENRICHED_SCHEMA).to_csv(
+                progress_file, index=False, encoding="utf-8-sig"
+            )
+
+        # 出力済みの行はスキップ（前回取得に失敗した店舗は取得し直す）
+        failed_file = f"{output_file}.failed.json"
+        completed = load_completed_urls(progress_file) - load_failed_urls(failed_file)
+        if delta_file:
+            completed -= load_delta_keys(delta_file, "gmap_url")
+        pending = {}
+        for index, gmap_url in df["gmap_url"].items():
+            if isinstance(gmap_url, str) and gmap_url and gmap_url not in completed:
+                pending.setdefault(gmap_url, index)
+        if completed:
+            logger.info(f"🔁 出力済みの{len(completed)}件をスキップします")
+
+        total_rows = len(pending)
+        done = 0
+        resume = bool(completed)
+        with open(
+            progress_file,
+            "a" if resume else "w",
+            newline="",
+            encoding="utf-8" if resume else "utf-8-sig",
+        ) as f:
+            if not resume:
+                df.iloc[0:0].to_csv(f, index=False)
+
+            def write_row(index, info):
+                nonlocal done
+                done += 1
+                logger.info(f"📊 進捗: {done}/{total_rows}")
+                # 失敗した店舗は出力済みにしない
+                if df.at[index, "gmap_url"] in scraper.failed:
+                    return
+                with metrics.stage("write"):
+                    row = df.loc[[index]].copy()
+                    for column, value in info.items():
+                        row[column] = value
+                    row.to_csv(f, header=False, index=False)
+                    f.flush()
+                metrics.incr("items")
+
+            if pending:
+                await scraper.init_browser()
+                await stream_place_info(
+                    scraper,
+                    ((index, gmap_url) for gmap_url, index in pending.items()),
+                    write_row,
+                    max_concurrent=max_concurrent,
+                )
+        save_failed_urls(failed_file, scraper.failed)
+
+        # 入力と同じ行順で書き直す（同じgmap_urlの行には同じ結果を入れる）
+        results = (
+            pd.read_csv(progress_file, on_bad_lines="skip", dtype=str)
+            .dropna(subset=["gmap_url"])
+            .drop_duplicates("gmap_url", keep="last")
+            .set_index("gmap_url")
+        )
+        for column in scraper.columns:
+            df[column] = df["gmap_url"].map(results[column])
+        write_table(df, output_file, ENRICHED_SCHEMA)
+        if progress_file != output_file:
+            os.remove(progress_file)
+        logger.info(f"\n✅ 処理が完了しました！")
+        logger.info(f"📝 結果は {output_file} に保存されました")
+        if scraper.failed:
+            logger.warning(
+                f"⚠️ 取得に失敗した{len(scraper.failed)}件は次回の実行で取得し直します"
+            )
+
+    except Exception as e:
+        logger.error(f"❌ エラーが発生しました: {str(e)}")
+
+    finally:
+        # ブラウザのクリーンアップ
+        if scraper:
+            await scraper.close_browser()
+            logger.info(f"🚦 {scraper.limiter.summary()}")
+        metrics.stop_reporter()
+        logger.info(f"📊 {metrics.summary()}")
+
+
+async def process_store_db(
+    db_file: str,
+    fields: Iterable[str] = DEFAULT_FIELDS,
+    max_concurrent: int = 5,
+    fast_mode: bool = True,
+    metrics_file: Optional[str] = None,
+    prometheus_file: Optional[str] = None,
+    metrics_interval: float = 10.0,
+    requests_per_second: Optional[float] = None,
+    batch_size: int = 50,
+):
+    """店舗データベースのうち、指定項目が未取得の店舗だけGoogle Mapsから取得する
+
+    未取得の項目が1つでもある店舗は、同じページから指定項目をまとめて取得し直す。
+    取得した項目のカラムだけをbatch_size件ごとに1回のトランザクションで更新し、
+    項目ごとに取得済みとして記録する。gmap_urlが変わった店舗はクローラーの更新で
+    未取得に戻る。取得に失敗した店舗は未取得のまま残し、次回の実行で取得し直す。
+    """
+    scraper = None
+    db = StoreDB(db_file, "caba2")
+    metrics = CrawlMetrics("gmap")
+    metrics.start_reporter(metrics_file, prometheus_file, metrics_interval)
+    try:
+        scraper = GMapScraper(
+            max_concurrent=max_concurrent,
+            fields=fields,
+            fast_mode=fast_mode,
+            metrics=metrics,
+            requests_per_second=requests_per_second,
+        )
+        stages = [f"gmap_{field}" for field in scraper.fields]
+
+        # 同じgmap_urlの店舗は1回だけ開く
+        keys_by_url = {}
+        for key, gmap_url in db.pending(stages, ["gmap_url"]):
+            keys_by_url.setdefault(gmap_url, []).append(key)
+        logger.info(f"🗄️ 未取得の店舗: {len(keys_by_url)}件 / 全{len(db)}件")
+
+        updates = []
+        done = 0
+
+        def flush():
+            with metrics.stage("write"):
+                db.update(updates, scraper.columns, stages)
+            updates.clear()
+
+        def save_result(gmap_url, info):
+            nonlocal done
+            done += 1
+            logger.info(f"📊 進捗: {done}/{len(keys_by_url)}")
+            if gmap_url in scraper.failed:
+                return
+            values = [info[column] for column in scraper.columns]
+            updates.extend((key, values) for key in keys_by_url[gmap_url])
+            metrics.incr("items")
+            if len(updates) >= batch_size:
+                flush()
+
+        if keys_by_url:
+            await scraper.init_browser()
+            try:
+                await stream_place_info(
+                    scraper,
+                    ((gmap_url, gmap_url) for gmap_url in keys_by_url),
+                    save_result,
+                    max_concurrent=max_concurrent,
+                )
+            finally:
+                if updates:
+                    flush()
+        logger.info(f"\n✅ 処理が完了しました！（失敗 {len(scraper.failed)}件は次回取得し直します）")
+
+    except Exception as e:
+        logger.error(f"❌ エラーが発生しました: {str(e)}")
+
+    finally:
+        if scraper:
+            await scraper.close_browser()
+            logger.info(f"🚦 {scraper.limiter.summary()}")
+        db.close()
+        metrics.stop_reporter()
+        logger.info(f"📊 {metrics.summary()}")
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Error: gmap_urlカラムを含むCSVファイルのパスを指定してください。")
+        return
+    asyncio.run(
+        process_csv_file(
+            sys.argv[1],
+            fields=DEFAULT_FIELDS,
+            metrics_file="gmap_metrics.json",
+            prometheus_file="gmap_metrics.prom",
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,344 @@
 import time
 import csv
+import json
 import math
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+import os
+import queue
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+import sys
+from pathlib import Path
+import requests
 from bs4 import BeautifulSoup
 from urllib.parse import quote_plus
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.dedup import DedupIndex
+from common.store_db import StoreDB
+from common.metrics import CrawlMetrics, timed
+from common.store_record import CabaStore
+from common.store_schema import CABA2_SCHEMA, read_table, write_table
+from common.store_state import StoreState
+
 
 def calculate_pages_needed(total_stores):
     """必要なページ数を計算する"""
     return math.ceil(total_stores / 50)
 
 
-def scrape_cabacaba(total_stores=51):  # デフォルトで51件を取得
+FIELDNAMES = list(CabaStore.FIELDS)
+
+# 取得済みとして扱う既存の店舗CSV（環境変数で指定。なければ全件を新規として扱う）
+EXISTING_CSV_PATH = os.environ.get("CABACABA_EXISTING_CSV")
+
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept-Language": "ja,en-US;q=0.9,en;q=0.8",
+}
+
+
+def create_driver():
+    """ヘッドレスChromeを起動する"""
+    # HTTPモードではSeleniumを使わないため、ブラウザを起動するときだけ読み込む
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+
+    service = Service(executable_path="/usr/local/bin/chromedriver")
+    return webdriver.Chrome(service=service, options=options)
+
+
+class DriverPool:
+    """再利用可能なChromeセッションのプール（必要になった時点で最大size個まで起動）"""
+
+    def __init__(self, size):
+        self.size = size
+        self._idle = queue.Queue()
+        self._drivers = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self):
+        driver = None
+        try:
+            driver = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if len(self._drivers) < self.size:
+                    driver = create_driver()
+                    self._drivers.append(driver)
+            if driver is None:
+                driver = self._idle.get()
+        try:
+            yield driver
+        finally:
+            self._idle.put(driver)
+
+    def close(self):
+        for driver in self._drivers:
+            driver.quit()
+
+
+class ListingFetcher:
+    """一覧ページのHTMLを取得する（ブラウザプール or サーバーレンダリング時のHTTP）"""
+
+    def __init__(self, workers=1, use_http=False, metrics=None):
+        self.use_http = use_http
+        self.pool = None if use_http else DriverPool(workers)
+        self.metrics = metrics or CrawlMetrics("caba2")
+        self._local = threading.local()
+
+    def fetch(self, url):
+        """ページのHTMLを返す（タイムアウト時はNone）"""
+        if self.use_http:
+            with self.metrics.stage("fetch"):
+                html = self._fetch_http(url)
+        else:
+            html = self._fetch_browser(url)
+        if html is not None:
+            self.metrics.incr("requests")
+            self.metrics.incr("bytes", len(html.encode("utf-8")))
+        return html
+
+    def _fetch_http(self, url):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        try:
+            response = session.get(url, headers=HTTP_HEADERS, timeout=20)
+            response.raise_for_status()
+            return response.text
+        except requests.Timeout:
+            self.metrics.incr("timeouts")
+        except requests.RequestException:
+            self.metrics.incr("errors")
+        return None
+
+    def _fetch_browser(self, url):
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        with self.pool.acquire() as driver:
+            try:
+                with self.metrics.stage("fetch"):
+                    driver.get(url)
+                with self.metrics.stage("wait"):
+                    WebDriverWait(driver, 20).until(
+                        EC.presence_of_element_located((By.CLASS_NAME, "club-top"))
+                    )
+            except TimeoutException:
+                self.metrics.incr("timeouts")
+                return None
+            return driver.page_source
+
+    def close(self):
+        if self.pool:
+            self.pool.close()
+
+
+def parse_listing_page(html):
+    """一覧ページのHTMLから店舗情報を抽出する"""
+    soup = BeautifulSoup(html, "html.parser")
+    club_tops = soup.select("div.club-top")
+    store_infos = soup.select("div.list-info")
+
+    stores = []
+    for idx, (club_top, store_info) in enumerate(zip(club_tops, store_infos)):
+        store_data = CabaStore()
+
+        # 店舗名と読み仮名の取得
+        text_wrapper = club_top.select_one("div.text-wrapper")
+        if text_wrapper:
+            blog_title = text_wrapper.select_one("h2.blog-title a.link")
+            if blog_title:
+                full_name = blog_title.text.strip()
+                if " - " in full_name:
+                    store_data["name"], store_data["kana"] = full_name.split(" - ", 1)
+                else:
+                    store_data["name"] = full_name
+                store_data["website"] = blog_title["href"]
+
+            # 説明文の取得
+            description_container = soup.select_one(
+                f"#list-tab-content > div > div > div.infinite-scroll > div:nth-child({idx + 1}) > "
+                "div.club-content > div.club-right > div.club-tab-container.pc > "
+                "div.club-outer-wrapper > div > div > div > section.card > div.text-wrapper"
+            )
+
+            if description_container:
+                title_elem = description_container.select_one("h3 a")
+                description_elem = description_container.select_one("p.description")
+                if title_elem and description_elem:
+                    title = title_elem.text.strip()
+                    description = description_elem.text.strip()
+                    store_data["description"] = f"{title}\n{description}"
+
+            # エリアと店舗種類の取得
+            area_text = text_wrapper.select_one("p.comment")
+            if area_text:
+                full_area = area_text.text.strip()
+                if "の" in full_area:
+                    store_data["area"], store_data["type"] = full_area.split("の", 1)
+
+        # 店舗詳細情報の取得
+        info_items = store_info.select("ul li")
+        for item in info_items:
+            label = item.select_one("label.text")
+            value = item.select_one("span.show")
+
+            if label and value:
+                label_text = label.text.strip()
+                value_text = value.text.strip()
+
+                if "営業時間" in label_text:
+                    store_data["business_hours"] = value_text
+                elif "店休日" in label_text:
+                    store_data["holiday"] = value_text
+                elif "予算目安" in label_text:
+                    tax_info = value.select_one("span.tax-service-fee")
+                    if tax_info:
+                        store_data["budget"] = (
+                            f"{value_text.replace(tax_info.text, '')} {tax_info.text.strip()}"
+                        )
+                    else:
+                        store_data["budget"] = value_text
+                elif "電話番号" in label_text:
+                    store_data["phone"] = value_text
+                elif "所在地" in label_text:
+                    store_data["address"] = value_text
+                    search_query = f"{store_data['name']} {store_data['area']} {value_text.split(' ')[0]}"
+                    encoded_query = quote_plus(search_query)
+                    store_data["gmap_url"] = (
+                        f"https://www.google.com/maps/search/?api=1&query={encoded_query}"
+                    )
+
+        if all(store_data[field] for field in ["name", "area", "address"]):
+            stores.append(store_data)
+
+    # 抽出した値は文字列にしてあるので、ページのツリーはここで解放する
+    soup.decompose()
+    return stores
+
+
+def print_store(index, store_data):
+    """店舗情報を表示する"""
+    print(f"\n✨ 店舗情報 {index}:")
+    print(f"📍 店舗名: {store_data['name']}")
+    print(f"📖 読み仮名: {store_data['kana']}")
+    print(f"🏢 エリア: {store_data['area']}")
+    print(f"🏷️ 店舗種類: {store_data['type']}")
+    print(f"🕒 営業時間: {store_data['business_hours']}")
+    print(f"📅 定休日: {store_data['holiday']}")
+    print(f"💰 予算: {store_data['budget']}")
+    print(f"📱 電話: {store_data['phone']}")
+    print(f"🏠 住所: {store_data['address']}")
+    print(f"🔗 ウェブサイト: {store_data['website']}")
+    print(f"🗺️ Googleマップ: {store_data['gmap_url']}")
+    print(f"📝 説明文:\n{store_data['description']}")
+
+
+def load_rows(csv_path):
+    """CSVファイルから店舗情報を1行ずつ読み込む（全行をメモリに載せない）"""
+    with open(csv_path, "r", encoding="utf-8") as csvfile:
+        for row in csv.DictReader(csvfile):
+            yield CabaStore(row)
+
+
+def add_to_dedup_index(dedup, store_data):
+    """店舗名・読み仮名・電話番号・住所を正規化して名寄せインデックスに登録する"""
+    dedup.add(
+        store_data["name"],
+        name=store_data.get("name", ""),
+        kana=store_data.get("kana", ""),
+        phone=store_data.get("phone", ""),
+        address=store_data.get("address", ""),
+    )
+
+
+def find_duplicate(dedup, store_data):
+    """名寄せインデックスから同一店舗を探し、見つかればその店舗名を返す"""
+    match = dedup.find_duplicate(
+        name=store_data["name"],
+        kana=store_data["kana"],
+        phone=store_data["phone"],
+        address=store_data["address"],
+    )
+    return None if match is None else dedup.records[match]
+
+
+def store_key(store_data):
+    """差分検出用の店舗キー（店舗ページのURL、なければ店舗名）"""
+    return store_data["website"] or store_data["name"]
+
+
+def update_existing(state, store_data):
+    """既存データにある店舗を差分クロールの状態に登録し、変更があれば表示する"""
+    key = store_key(store_data)
+    # 同じ店舗が一覧に複数回載っていても最初の1回だけを登録する
+    if key in state.current:
+        return
+    if state.update(key, store_data) == "changed":
+        print(f"🔄 変更あり: {store_data['name']}")
+
+
+def load_checkpoint(checkpoint_file):
+    """チェックポイントを読み込む（存在しなければNone）"""
+    try:
+        with open(checkpoint_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(checkpoint_file, last_page, seen_names):
+    """最後に完了したページと取得済みの店舗名を保存する"""
+    tmp_file = f"{checkpoint_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(
+            {"last_page": last_page, "seen_names": sorted(seen_names)},
+            f,
+            ensure_ascii=False,
+        )
+    os.replace(tmp_file, checkpoint_file)
+
+
+def scrape_cabacaba(
+    total_stores=51,  # デフォルトで51件を取得
+    output_file="cabacaba_stores.csv",
+    checkpoint_file="cabacaba_stores.checkpoint.json",
+    flush_every=10,
+    existing_csv=EXISTING_CSV_PATH,
+    workers=1,
+    use_http=False,
+    parse_workers=None,
+    state_file=None,
+    delta_file="cabacaba_delta.json",
+    base_url="https://www.caba2.net/tokyo/ginza/_list",
+    metrics_file=None,
+    prometheus_file=None,
+    metrics_interval=10.0,
+    parquet_file=None,
+    db_file=None,
+):
     print(f"🌸 C-chan: {total_stores}件の店舗情報のスクレイピングを開始します！")
 
-    # 既存のCSVファイルから店舗名を読み込む
+    # 既存のCSVファイルから店舗を読み込み、表記ゆれを吸収する名寄せインデックスに登録
     existing_names = set()
-    csv_path = "/Users/hikarimac/Documents/python/crawler/kyabakyaba/first107/cabacaba_stores.csv"
+    dedup = DedupIndex()
     try:
-        with open(csv_path, "r", encoding="utf-8") as csvfile:
-            reader = csv.DictReader(csvfile)
-            existing_names = {row["name"] for row in reader}
+        if not existing_csv:
+            raise FileNotFoundError
+        for row in load_rows(existing_csv):
+            existing_names.add(row["name"])
+            add_to_dedup_index(dedup, row)
         print(f"📚 既存の店舗数: {len(existing_names)}件")
     except FileNotFoundError:
         print("⚠️ 既存のCSVファイルが見つかりませんでした。新規作成します。")
@@ -34,185 +346,170 @@ def scrape_cabacaba(total_stores=51):  # デフォルトで51件を取得
     pages_needed = calculate_pages_needed(total_stores)
     print(f"📚 必要なページ数: {pages_needed}ページ")
 
-    base_url = "https://www.caba2.net/tokyo/ginza/_list"
-    options = Options()
-    options.add_argument("--headless")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-
-    service = Service(executable_path="/usr/local/bin/chromedriver")
-    driver = webdriver.Chrome(service=service, options=options)
-    stores_data = []
+    # チェックポイントがあれば途中から再開する
     seen_names = existing_names.copy()
+    start_page = 1
+    stored_count = 0
+    checkpoint = load_checkpoint(checkpoint_file)
 
-    try:
-        for page in range(1, pages_needed + 1):
-            url = f"{base_url}?page={page}"
-            print(f"\n📄 ページ {page} をスクレイピング中...")
+    # 差分クロール: 前回の店舗ごとのハッシュと比較して追加・変更・削除を検出する
+    state = StoreState(state_file) if state_file else None
 
-            try:
-                driver.get(url)
-                WebDriverWait(driver, 20).until(
-                    EC.presence_of_element_located((By.CLASS_NAME, "club-top"))
-                )
-            except TimeoutException:
-                print(f"❌ ページ {page} の読み込みがタイムアウトしました")
-                continue
+    if checkpoint and os.path.exists(output_file):
+        for row in load_rows(output_file):
+            seen_names.add(row["name"])
+            stored_count += 1
+            add_to_dedup_index(dedup, row)
+            if state:
+                state.update(store_key(row), row)
+        seen_names.update(checkpoint["seen_names"])
+        start_page = checkpoint["last_page"] + 1
+        print(
+            f"🔁 チェックポイントから再開します: ページ {start_page} から（取得済み {stored_count}件）"
+        )
+
+    pages = list(range(start_page, pages_needed + 1))
+    # ステージごとの処理時間を集計し、指定があれば定期的にファイルへ書き出す
+    metrics = CrawlMetrics("caba2")
+    metrics.start_reporter(metrics_file, prometheus_file, metrics_interval)
+    fetcher = ListingFetcher(workers=workers, use_http=use_http, metrics=metrics)
+    parse_pool = ProcessPoolExecutor(parse_workers) if parse_workers else None
+    # 店舗データベースには書き込んだ店舗をページごとに店舗キーで追加・更新する
+    db = StoreDB(db_file, "caba2") if db_file else None
 
-            soup = BeautifulSoup(driver.page_source, "html.parser")
-            club_tops = soup.select("div.club-top")
-            store_infos = soup.select("div.list-info")
+    def fetch_listing(url):
+        """ページを取得し、解析はプロセスプールに渡してすぐに次の取得へ移る"""
+        html = fetcher.fetch(url)
+        if html is None:
+            return None
+        if parse_pool:
+            return parse_pool.submit(timed, parse_listing_page, html)
+        with metrics.stage("parse"):
+            return parse_listing_page(html)
 
-            for idx, (club_top, store_info) in enumerate(zip(club_tops, store_infos)):
-                if len(stores_data) >= total_stores:
+    # ページ範囲をワーカーに振り分け、結果はページ順に取り出して書き込む
+    executor = ThreadPoolExecutor(max_workers=max(1, workers))
+    futures = [
+        executor.submit(fetch_listing, f"{base_url}?page={page}") for page in pages
+    ]
+
+    # 一覧の最後のページまで欠けなく取得できたときだけ、削除された店舗を検出する
+    complete = start_page == 1
+
+    try:
+        mode = "a" if stored_count else "w"
+        with open(output_file, mode, newline="", encoding="utf-8") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+            if mode == "w":
+                writer.writeheader()
+
+            for page, future in zip(pages, futures):
+                if stored_count >= total_stores:
                     break
+                # 書き込んだページの結果は保持しない
+                futures[page - start_page] = None
 
-                store_data = {
-                    "name": "",
-                    "kana": "",
-                    "area": "",
-                    "type": "",
-                    "business_hours": "",
-                    "holiday": "",
-                    "budget": "",
-                    "phone": "",
-                    "address": "",
-                    "website": "",
-                    "gmap_url": "",
-                    "description": "",
-                }
-
-                # 店舗名と読み仮名の取得
-                text_wrapper = club_top.select_one("div.text-wrapper")
-                if text_wrapper:
-                    blog_title = text_wrapper.select_one("h2.blog-title a.link")
-                    if blog_title:
-                        full_name = blog_title.text.strip()
-                        store_name = (
-                            full_name.split(" - ")[0]
-                            if " - " in full_name
-                            else full_name
-                        )
+                print(f"\n📄 ページ {page} をスクレイピング中...")
+                stores = future.result()
+                if stores is None:
+                    print(f"❌ ページ {page} の読み込みがタイムアウトしました")
+                    complete = False
+                    continue
+                if isinstance(stores, Future):
+                    # プロセスプールでの解析結果（ワーカー内での解析時間を記録）
+                    stores, elapsed = stores.result()
+                    metrics.record("parse", elapsed)
+                if not stores and state:
+                    state.complete = complete
 
-                        # 既存のCSVファイルとの重複チェック
-                        if store_name in existing_names:
-                            print(f"⏭️ スキップ: {store_name} (既存データに存在します)")
-                            continue
-
-                        if " - " in full_name:
-                            store_data["name"], store_data["kana"] = full_name.split(
-                                " - "
-                            )
-                        else:
-                            store_data["name"] = full_name
-                        seen_names.add(store_data["name"])
-                        store_data["website"] = blog_title["href"]
-
-                    # 説明文の取得
-                    description_container = soup.select_one(
-                        f"#list-tab-content > div > div > div.infinite-scroll > div:nth-child({idx + 1}) > "
-                        "div.club-content > div.club-right > div.club-tab-container.pc > "
-                        "div.club-outer-wrapper > div > div > div > section.card > div.text-wrapper"
-                    )
+                written = []
+                for store_data in stores:
+                    if stored_count >= total_stores:
+                        break
 
-                    if description_container:
-                        title_elem = description_container.select_one("h3 a")
-                        description_elem = description_container.select_one(
-                            "p.description"
-                        )
-                        if title_elem and description_elem:
-                            title = title_elem.text.strip()
-                            description = description_elem.text.strip()
-                            store_data["description"] = f"{title}\n{description}"
-
-                    # エリアと店舗種類の取得
-                    area_text = text_wrapper.select_one("p.comment")
-                    if area_text:
-                        full_area = area_text.text.strip()
-                        if "の" in full_area:
-                            store_data["area"], store_data["type"] = full_area.split(
-                                "の"
-                            )
-
-                # 店舗詳細情報の取得
-                info_items = store_info.select("ul li")
-                for item in info_items:
-                    label = item.select_one("label.text")
-                    value = item.select_one("span.show")
-
-                    if label and value:
-                        label_text = label.text.strip()
-                        value_text = value.text.strip()
-
-                        if "営業時間" in label_text:
-                            store_data["business_hours"] = value_text
-                        elif "店休日" in label_text:
-                            store_data["holiday"] = value_text
-                        elif "予算目安" in label_text:
-                            tax_info = value.select_one("span.tax-service-fee")
-                            if tax_info:
-                                store_data["budget"] = (
-                                    f"{value_text.replace(tax_info.text, '')} {tax_info.text.strip()}"
-                                )
-                            else:
-                                store_data["budget"] = value_text
-                        elif "電話番号" in label_text:
-                            store_data["phone"] = value_text
-                        elif "所在地" in label_text:
-                            store_data["address"] = value_text
-                            search_query = f"{store_data['name']} {store_data['area']} {value_text.split(' ')[0]}"
-                            encoded_query = quote_plus(search_query)
-                            store_data["gmap_url"] = (
-                                f"https://www.google.com/maps/search/?api=1&query={encoded_query}"
-                            )
-
-                if all(store_data[field] for field in ["name", "area", "address"]):
-                    stores_data.append(store_data)
-                    print(f"\n✨ 店舗情報 {len(stores_data)}:")
-                    print(f"📍 店舗名: {store_data['name']}")
-                    print(f"📖 読み仮名: {store_data['kana']}")
-                    print(f"🏢 エリア: {store_data['area']}")
-                    print(f"🏷️ 店舗種類: {store_data['type']}")
-                    print(f"🕒 営業時間: {store_data['business_hours']}")
-                    print(f"📅 定休日: {store_data['holiday']}")
-                    print(f"💰 予算: {store_data['budget']}")
-                    print(f"📱 電話: {store_data['phone']}")
-                    print(f"🏠 住所: {store_data['address']}")
-                    print(f"🔗 ウェブサイト: {store_data['website']}")
-                    print(f"🗺️ Googleマップ: {store_data['gmap_url']}")
-                    print(f"📝 説明文:\n{store_data['description']}")
-
-        # CSVに保存
-        output_file = "cabacaba_stores.csv"
-        with open(output_file, "w", newline="", encoding="utf-8") as csvfile:
-            fieldnames = [
-                "name",
-                "kana",
-                "area",
-                "type",
-                "business_hours",
-                "holiday",
-                "budget",
-                "phone",
-                "address",
-                "website",
-                "gmap_url",
-                "description",
-            ]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            for store in stores_data:
-                writer.writerow(store)
-
-        print(f"\n🎉 スクレイピング完了！ {len(stores_data)}件の店舗情報を取得しました")
+                    # 既存データ・取得済みデータとの重複チェック（表記ゆれ・電話番号・住所で名寄せ）
+                    if store_data["name"] in seen_names:
+                        if state and store_data["name"] in existing_names:
+                            # 差分クロールでは既存の店舗も内容を比較して変更を検出する
+                            update_existing(state, store_data)
+                        print(f"⏭️ スキップ: {store_data['name']} (既存データに存在します)")
+                        continue
+                    duplicate = find_duplicate(dedup, store_data)
+                    if duplicate is not None:
+                        if state and duplicate in existing_names:
+                            update_existing(state, store_data)
+                        print(f"⏭️ スキップ: {store_data['name']} (既存の {duplicate} と同一店舗)")
+                        continue
+
+                    with metrics.stage("write"):
+                        writer.writerow(store_data)
+                    written.append(store_data)
+                    seen_names.add(store_data["name"])
+                    add_to_dedup_index(dedup, store_data)
+                    stored_count += 1
+                    metrics.incr("items")
+
+                    status = state.update(store_key(store_data), store_data) if state else None
+                    if status == "unchanged":
+                        print(f"⏸️ 変更なし: {store_data['name']}")
+                    else:
+                        print_store(stored_count, store_data)
+
+                    if stored_count % flush_every == 0:
+                        csvfile.flush()
+
+                # ページ単位でファイルとチェックポイントを確定させる
+                with metrics.stage("write"):
+                    csvfile.flush()
+                    if db is not None:
+                        db.upsert(written)
+                    save_checkpoint(checkpoint_file, page, seen_names)
+
+        if os.path.exists(checkpoint_file):
+            os.remove(checkpoint_file)
+
+        # 後段が必要なカラムだけを型付きで読めるよう、完了したCSVをParquetにも書き出す
+        if parquet_file:
+            write_table(read_table(output_file, CABA2_SCHEMA), parquet_file, CABA2_SCHEMA)
+            print(f"🗂️ Parquetにも保存しました: {parquet_file}")
+
+        if db is not None:
+            print(f"🗄️ 店舗データベースにも保存しました: {db_file}（{len(db)}件）")
+
+        if state:
+            counts = state.write_delta(delta_file)
+            state.save()
+            print(
+                f"🔍 差分: 追加 {counts['added']}件 / 変更 {counts['changed']}件 / 削除 {counts['removed']}件"
+                f" → {delta_file}"
+            )
+
+        print(f"\n🎉 スクレイピング完了！ {stored_count}件の店舗情報を取得しました")
         print(f"📝 結果は {output_file} に保存されました")
 
     except Exception as e:
+        metrics.incr("errors")
         print(f"❌ エラー発生: {str(e)}")
+        print(f"💾 {checkpoint_file} から再開できます")
 
     finally:
-        driver.quit()
+        executor.shutdown(wait=True, cancel_futures=True)
+        if parse_pool:
+            parse_pool.shutdown(cancel_futures=True)
+        fetcher.close()
+        if db is not None:
+            db.close()
+        metrics.stop_reporter()
+        print(f"📊 {metrics.summary()}")
 
 
 if __name__ == "__main__":
-    scrape_cabacaba(200)  # 取得したい店舗数を指定
+    scrape_cabacaba(
+        200,
+        workers=4,
+        parse_workers=2,
+        state_file="cabacaba_state.json",
+        metrics_file="cabacaba_metrics.json",
+        prometheus_file="cabacaba_metrics.prom",
+        parquet_file="cabacaba_stores.parquet",
+    )  # 取得したい店舗数と並列数を指定
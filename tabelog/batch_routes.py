@@ -0,0 +1,346 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from create_route_map import generate_google_maps_url, geocode_stations
+from route_optimizer import RouteConfig, read_route_stores, render_cluster_map
+from route_solvers import SOLVERS, GreedySolver, RouteProblem
+from spatial_index import (
+    METERS_PER_DEGREE,
+    GridIndex,
+    haversine_distances,
+    haversine_matrix,
+)
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.store_record import RouteStore, records_from_frame
+from common.store_schema import write_table
+
+
+# 駅ごとのルートの一覧（1駅1行）のスキーマ
+BATCH_ROUTE_SCHEMA = {
+    "開始地点": "string",
+    "latitude": "float",
+    "longitude": "float",
+    "店舗数": "int",
+    "評価点数合計": "float",
+    "総移動距離": "int",
+    "予想所要時間": "int",
+    "訪問順": "string",
+    "Google Maps": "string",
+}
+
+# 1つの距離行列に入れる店舗数の上限（3000件で約72MB）。超える場合は開始地点を分けて計算する
+MAX_MATRIX_POINTS = 3000
+
+# ワーカープロセスで共有する店舗の座標・評価点数・距離行列（_init_workerで設定）
+_shared = {}
+
+
+def _init_worker(latitudes, longitudes, scores, distances, config, solver):
+    _shared.update(
+        latitudes=latitudes,
+        longitudes=longitudes,
+        scores=scores,
+        distances=distances,
+        config=config,
+        solver=solver,
+    )
+
+
+def _solve_start(start_lat, start_lon, candidates):
+    """開始地点を1行目に加えた問題を共有の距離行列から組み立てて解く
+
+    candidatesは開始地点から到達できる店舗（共有行列のインデックス）。
+    戻り値は訪問する店舗の共有行列のインデックスと、各区間の距離。
+    """
+    latitudes = _shared["latitudes"][candidates]
+    longitudes = _shared["longitudes"][candidates]
+
+    # 店舗間の距離は共有行列から切り出し、開始地点の行と列だけを計算する
+    size = len(candidates) + 1
+    distances = np.empty((size, size))
+    distances[1:, 1:] = _shared["distances"][np.ix_(candidates, candidates)]
+    distances[0, 1:] = distances[1:, 0] = haversine_distances(
+        start_lat, start_lon, latitudes, longitudes
+    )
+    distances[0, 0] = 0.0
+
+    problem = RouteProblem(
+        np.concatenate(([start_lat], latitudes)),
+        np.concatenate(([start_lon], longitudes)),
+        np.concatenate(([0.0], _shared["scores"][candidates])),
+        _shared["config"],
+        distances=distances,
+    )
+    tour = _shared["solver"].solve(problem)
+    stops = [0] + tour
+    legs = [float(distances[stops[i - 1], stops[i]]) for i in range(1, len(stops))]
+    return [int(candidates[index - 1]) for index in tour], legs
+
+
+class BatchRoutePlanner:
+    """複数の開始地点（駅）のルートをまとめて計算する
+
+    店舗データの読み込みと評価点数での絞り込みは1回だけ行い、いずれかの開始地点から
+    到達できる店舗の間の距離行列を1回だけ計算して全ルートで共有する。
+    各開始地点は距離行列に1行追加するだけで済むため、ルート探索だけをプロセスプールで
+    並列に実行する。到達できる店舗がmax_matrix_pointsを超える場合は、近い開始地点同士で
+    グループに分け、グループごとに距離行列を作る。
+    """
+
+    def __init__(self, csv_file, config=None, max_matrix_points=MAX_MATRIX_POINTS):
+        self.config = config or RouteConfig()
+        self.max_matrix_points = max_matrix_points
+        df = read_route_stores(csv_file, self.config)
+        df = df[df["評価点数"] >= self.config.MIN_RATING]
+        self.stores = df.dropna(subset=["latitude", "longitude"]).reset_index(drop=True)
+        self.index = GridIndex(
+            self.stores["latitude"].to_numpy(),
+            self.stores["longitude"].to_numpy(),
+            cell_size=self.config.MAX_STORE_DISTANCE,
+        )
+
+    def _group_starts(self, start_points, reachable):
+        """到達できる店舗の合計がmax_matrix_points以下になるよう、近い開始地点同士をまとめる"""
+        cell = self.config.MAX_TOTAL_DISTANCE / METERS_PER_DEGREE
+        order = sorted(
+            range(len(start_points)),
+            key=lambda i: (
+                int(start_points[i]["latitude"] // cell),
+                start_points[i]["longitude"],
+            ),
+        )
+        groups, group, stores = [], [], set()
+        for i in order:
+            merged = stores.union(reachable[i].tolist())
+            if group and len(merged) > self.max_matrix_points:
+                groups.append(group)
+                group, merged = [], set(reachable[i].tolist())
+            group.append(i)
+            stores = merged
+        if group:
+            groups.append(group)
+        return groups
+
+    def _solve_group(self, start_points, reachable, solver, workers):
+        """開始地点のグループで共有する距離行列を作り、各開始地点のルートを並列に探索"""
+        used = np.unique(np.concatenate(reachable)).astype(int)
+        position = np.full(len(self.stores), -1)
+        position[used] = np.arange(len(used))
+        latitudes = self.stores["latitude"].to_numpy()[used]
+        longitudes = self.stores["longitude"].to_numpy()[used]
+        shared = (
+            latitudes,
+            longitudes,
+            self.stores["評価点数"].to_numpy()[used],
+            haversine_matrix(latitudes, longitudes),
+            self.config,
+            solver,
+        )
+        args = (
+            [start["latitude"] for start in start_points],
+            [start["longitude"] for start in start_points],
+            [position[stores] for stores in reachable],
+        )
+        if workers == 1 or len(start_points) == 1:
+            _init_worker(*shared)
+            results = list(map(_solve_start, *args))
+        else:
+            # forkではワーカーが親プロセスの距離行列をコピーせずに参照する
+            with ProcessPoolExecutor(
+                workers, initializer=_init_worker, initargs=shared
+            ) as pool:
+                results = list(pool.map(_solve_start, *args))
+        _shared.clear()
+        return [([int(used[index]) for index in tour], legs) for tour, legs in results]
+
+    def plan(self, start_points, solver=None, workers=None):
+        """開始地点のリスト（name, latitude, longitudeの辞書）ごとにルートを計算
+
+        戻り値は開始地点と同じ順のルートのリスト。各ルートは開始地点・訪問店舗・
+        各区間の距離・総移動距離・Google MapsのURLを持つ。
+        """
+        solver = solver or GreedySolver()
+        reachable = [
+            self.index.query_radius(
+                start["latitude"], start["longitude"], self.config.MAX_TOTAL_DISTANCE
+            ).astype(int)
+            for start in start_points
+        ]
+        groups = self._group_starts(start_points, reachable)
+        print(
+            f"{len(start_points)}地点のルートを計算します"
+            f"（対象店舗: {len(self.stores)}件、距離行列: {len(groups)}グループ）"
+        )
+
+        results = [None] * len(start_points)
+        for group in groups:
+            solved = self._solve_group(
+                [start_points[i] for i in group],
+                [reachable[i] for i in group],
+                solver,
+                workers,
+            )
+            for i, result in zip(group, solved):
+                results[i] = result
+
+        routes = []
+        for start, (tour, legs) in zip(start_points, results):
+            visits = records_from_frame(self.stores.iloc[tour], RouteStore)
+            route = [start] + visits
+            routes.append(
+                {
+                    "start": start,
+                    "stores": visits,
+                    "legs": legs,
+                    "total_distance": sum(legs),
+                    "google_maps_url": generate_google_maps_url(route),
+                }
+            )
+        return routes
+
+    def walking_time(self, distance):
+        """歩行時間を計算（分）"""
+        return int(distance / 1000 / self.config.WALKING_SPEED * 60)
+
+    def to_frame(self, routes):
+        """ルートの一覧を1地点1行のデータフレームにする"""
+        return pd.DataFrame(
+            [
+                {
+                    "開始地点": route["start"]["name"],
+                    "latitude": route["start"]["latitude"],
+                    "longitude": route["start"]["longitude"],
+                    "店舗数": len(route["stores"]),
+                    "評価点数合計": round(
+                        sum(store["評価点数"] for store in route["stores"]), 2
+                    ),
+                    "総移動距離": round(route["total_distance"]),
+                    "予想所要時間": self.walking_time(route["total_distance"]),
+                    "訪問順": " → ".join(store["店舗名"] for store in route["stores"]),
+                    "Google Maps": route["google_maps_url"],
+                }
+                for route in routes
+            ],
+            columns=list(BATCH_ROUTE_SCHEMA),
+        )
+
+    def save(self, routes, output_file):
+        """ルートの一覧を保存（.jsonは訪問店舗と区間距離を含む全情報、それ以外は1地点1行の表）"""
+        if not str(output_file).endswith(".json"):
+            write_table(self.to_frame(routes), output_file, BATCH_ROUTE_SCHEMA)
+            return
+
+        def stop(store, leg):
+            return {
+                "店舗名": store["店舗名"],
+                "評価点数": float(store["評価点数"]),
+                "latitude": float(store["latitude"]),
+                "longitude": float(store["longitude"]),
+                "距離": round(leg),
+            }
+
+        data = [
+            {
+                "start": route["start"],
+                "stores": [
+                    stop(store, leg) for store, leg in zip(route["stores"], route["legs"])
+                ],
+                "total_distance": round(route["total_distance"]),
+                "walking_minutes": self.walking_time(route["total_distance"]),
+                "google_maps_url": route["google_maps_url"],
+            }
+            for route in routes
+        ]
+        tmp_file = f"{output_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, output_file)
+
+
+def load_start_points(stations_file):
+    """開始地点を読み込む
+
+    name, latitude, longitudeカラムを持つCSVならその座標を使い、1行1駅名のテキストなら
+    Google Maps APIでジオコーディングする（結果はキャッシュを再利用）。
+    """
+    if stations_file.endswith(".csv"):
+        df = pd.read_csv(stations_file)
+        if {"latitude", "longitude"} <= set(df.columns):
+            return [
+                {
+                    "name": row["name"],
+                    "latitude": float(row["latitude"]),
+                    "longitude": float(row["longitude"]),
+                }
+                for row in df.to_dict("records")
+            ]
+        names = df["name"].dropna().tolist()
+    else:
+        with open(stations_file, encoding="utf-8") as f:
+            names = [line.strip() for line in f if line.strip()]
+
+    start_points = geocode_stations(names)
+    if start_points is None:
+        raise RuntimeError("API_KEY not found in .env file")
+    return start_points
+
+
+def plan_routes(
+    stores_file,
+    stations_file,
+    output_file="routes.csv",
+    solver=None,
+    workers=None,
+    map_file=None,
+):
+    """開始地点のファイルの全駅からのルートを計算して1つのファイルに保存"""
+    start_points = load_start_points(stations_file)
+    planner = BatchRoutePlanner(stores_file)
+    routes = planner.plan(start_points, solver=solver, workers=workers)
+    planner.save(routes, output_file)
+    if map_file:
+        render_cluster_map(planner.stores, routes, map_file)
+        print(f"地図を '{map_file}' に保存しました！")
+
+    for route in routes:
+        print(
+            f"{route['start']['name']}: {len(route['stores'])}店舗, "
+            f"約{route['total_distance'] / 1000:.1f}km"
+        )
+    print(f"\n{len(routes)}件のルートを '{output_file}' に保存しました！")
+    return routes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="複数の駅からのルートをまとめて計算")
+    parser.add_argument("stores", help="店舗データ（CSV・Parquet・Arrow）")
+    parser.add_argument(
+        "stations", help="開始地点（name,latitude,longitudeのCSV、または1行1駅名のテキスト）"
+    )
+    parser.add_argument("-o", "--output", default="routes.csv", help="出力ファイル（.jsonで全情報）")
+    parser.add_argument("--solver", choices=sorted(SOLVERS), default="greedy")
+    parser.add_argument("--time-budget", type=float, default=1.0, help="1ルートあたりの探索時間（秒）")
+    parser.add_argument("--workers", type=int, help="プロセス数（デフォルトはCPUコア数）")
+    parser.add_argument("--map", help="全店舗と全ルートを描画する地図のHTMLファイル")
+    args = parser.parse_args()
+
+    plan_routes(
+        args.stores,
+        args.stations,
+        args.output,
+        solver=SOLVERS[args.solver](time_budget=args.time_budget),
+        workers=args.workers,
+        map_file=args.map,
+    )
+
+
+if __name__ == "__main__":
+    main()
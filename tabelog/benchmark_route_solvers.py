@@ -0,0 +1,55 @@
+import argparse
+import time
+import numpy as np
+
+from route_optimizer import RouteConfig
+from route_solvers import RouteProblem, GreedySolver, AnnealingSolver
+
+
+def make_problem(num_stores, seed, center=(35.6654, 139.7090), spread=0.015):
+    """開始地点周辺にランダムな店舗を配置したベンチマーク用の問題を作成"""
+    rng = np.random.default_rng(seed)
+    latitudes = np.concatenate(
+        ([center[0]], center[0] + rng.uniform(-spread, spread, num_stores))
+    )
+    longitudes = np.concatenate(
+        ([center[1]], center[1] + rng.uniform(-spread, spread, num_stores))
+    )
+    scores = np.concatenate(([0.0], np.round(rng.uniform(3.0, 4.2, num_stores), 2)))
+    return RouteProblem(latitudes, longitudes, scores, RouteConfig())
+
+
+def run(solver, problem):
+    started = time.perf_counter()
+    tour = solver.solve(problem)
+    elapsed = time.perf_counter() - started
+    assert problem.is_feasible(tour)
+    return problem.score(tour), len(tour), problem.route_length(tour), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ルート探索エンジンのベンチマーク")
+    parser.add_argument("--stores", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--seeds", type=int, default=3)
+    parser.add_argument("--time-budget", type=float, default=1.0)
+    args = parser.parse_args()
+
+    print(
+        f"{'stores':>6} {'seed':>4} {'solver':>10} {'score':>7} {'stops':>5} {'distance':>9} {'time':>8}"
+    )
+    for num_stores in args.stores:
+        for seed in range(args.seeds):
+            problem = make_problem(num_stores, seed)
+            for solver in (
+                GreedySolver(),
+                AnnealingSolver(time_budget=args.time_budget, seed=seed),
+            ):
+                score, stops, distance, elapsed = run(solver, problem)
+                print(
+                    f"{num_stores:>6} {seed:>4} {solver.name:>10} {score:>7.2f} {stops:>5} "
+                    f"{distance:>8.0f}m {elapsed * 1000:>6.1f}ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
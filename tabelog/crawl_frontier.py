@@ -0,0 +1,51 @@
+import asyncio
+import itertools
+
+from http_cache import canonicalize_url
+
+
+# 優先度（小さいほど先に取り出す）。一覧ページは新しい詳細ページを見つけるため先に取得する
+LIST_PAGE = 0
+DETAIL_PAGE = 1
+
+
+class CrawlFrontier:
+    """複数エリアのクロール対象URLを優先度付きで管理するフロンティア
+
+    同じURLはエリアをまたいでも一度しか積まない。同じ優先度の中では積んだ順に取り出す。
+    """
+
+    def __init__(self):
+        self.queue = asyncio.PriorityQueue()
+        self.seen = set()
+        self._order = itertools.count()
+
+    def __len__(self):
+        return self.queue.qsize()
+
+    def visit(self, url):
+        """URLを取得済みとして記録（すでに記録済みならFalse）"""
+        key = canonicalize_url(url)
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        return True
+
+    def push(self, priority, url, payload=None):
+        """未取得のURLをキューに積む（取得済み・キュー済みのURLならFalse）"""
+        if not self.visit(url):
+            return False
+        self.queue.put_nowait((priority, next(self._order), url, payload))
+        return True
+
+    async def get(self):
+        """優先度の高いURLから(priority, url, payload)を取り出す"""
+        priority, _, url, payload = await self.queue.get()
+        return priority, url, payload
+
+    def task_done(self):
+        self.queue.task_done()
+
+    async def join(self):
+        """積まれたURLがすべて処理されるまで待機"""
+        await self.queue.join()
@@ -1,32 +1,20 @@
 import sys
 from route_optimizer import RouteOptimizer
 import urllib.parse
-from getlocation import get_coordinates
-import googlemaps
-from dotenv import load_dotenv
-import os
+from getlocation import create_client, get_coordinates
+from geocode_cache import GeocodeCache
 
 
 def format_route_data(route, total_distance, optimizer):
     """RouteOptimizerの結果をVisualizerの形式に変換"""
     route_data = []
+    legs = optimizer.route_legs(route)
 
     # 最初の地点（表参道駅）をスキップして店舗データのみを処理
     for i in range(1, len(route)):
         store = route[i]
-        # 前の地点からの距離を計算
-        if i > 0:
-            prev_point = route[i - 1]
-            distance = int(
-                optimizer.calculate_distance(
-                    prev_point["latitude"],
-                    prev_point["longitude"],
-                    store["latitude"],
-                    store["longitude"],
-                )
-            )
-        else:
-            distance = 0
+        # 前の地点からの距離は距離行列から取得
+        distance = int(legs[i])
 
         route_data.append(
             {
@@ -49,35 +37,40 @@ def generate_google_maps_url(route):
     return base_url + "/".join(encoded_locations)
 
 
-def main(csv_file_path, start_station_name):
-    # .envファイルから環境変数を読み込む
-    load_dotenv()
+def geocode_stations(station_names):
+    """駅名のリストから開始地点のリストを作成（ジオコーディング結果はキャッシュを再利用）
 
-    # 環境変数からAPIキーを取得
-    API_KEY = os.getenv("API_KEY")
+    座標が見つからない駅は除く。APIキーがなければNoneを返す。
+    """
+    gmaps = create_client()
+    if gmaps is None:
+        return None
 
-    if not API_KEY:
-        print("Error: API_KEY not found in .env file")
-        return
+    cache = GeocodeCache()
+    start_points = []
+    try:
+        for name in station_names:
+            lat, lng = get_coordinates(gmaps, name, cache)
+            if lat is None or lng is None:
+                print(f"Error: Could not find coordinates for {name}")
+                continue
+            start_points.append({"name": name, "latitude": lat, "longitude": lng})
+    finally:
+        cache.close()
+    return start_points
 
-    # Google Maps クライアントを初期化
-    gmaps = googlemaps.Client(key=API_KEY)
 
+def main(csv_file_path, start_station_name, solver=None, map_file=None):
     # 開始地点の座標を取得
-    start_lat, start_lng = get_coordinates(gmaps, start_station_name)
-    if start_lat is None or start_lng is None:
-        print(f"Error: Could not find coordinates for {start_station_name}")
+    start_points = geocode_stations([start_station_name])
+    if not start_points:
         return
 
     # 1. ルートの最適化
     print("ルートを計算中...")
-    start_point = {
-        "name": start_station_name,
-        "latitude": start_lat,
-        "longitude": start_lng,
-    }
+    start_point = start_points[0]
     optimizer = RouteOptimizer(csv_file_path, start_point=start_point)
-    route, total_distance = optimizer.find_optimal_route()
+    route, total_distance = optimizer.find_optimal_route(solver)
 
     # 最適化されたルートを表示
     optimizer.print_route(route, total_distance)
@@ -86,6 +79,11 @@ def main(csv_file_path, start_station_name):
     google_maps_url = generate_google_maps_url(route)
     print(f"\nGoogle Mapsで経路を確認: {google_maps_url}")
 
+    # 地図の作成（評価点数で絞り込んだ全店舗をクラスタリングして重ねる）
+    if map_file:
+        optimizer.create_map(route, total_distance, cluster=True, map_file=map_file)
+        print(f"\n地図を '{map_file}' に保存しました！")
+
     print(f"\n処理が完了しました！")
 
 
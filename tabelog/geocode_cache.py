@@ -0,0 +1,66 @@
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+
+DEFAULT_CACHE_PATH = "geocode_cache.sqlite3"
+
+# 数字に挟まれたハイフン類（番地の区切り）
+_DASHES = re.compile(r"(?<=\d)[‐‑‒–—―−ーｰ－](?=\d)")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_address(address):
+    """キャッシュキー用に住所を正規化（全角・半角の統一、番地のハイフンと空白の統一）"""
+    text = unicodedata.normalize("NFKC", str(address))
+    text = _DASHES.sub("-", text)
+    text = _SPACES.sub(" ", text).strip()
+    return text.lower()
+
+
+class GeocodeCache:
+    """正規化した住所をキーにSQLiteへ座標を保存するジオコーディングキャッシュ
+
+    見つからなかった住所も座標None(NULL)として保存し、再実行時にAPIを呼ばない。
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS geocode (
+                address_key TEXT PRIMARY KEY,
+                address TEXT NOT NULL,
+                latitude REAL,
+                longitude REAL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, address):
+        """キャッシュを検索（未登録ならNone、登録済みなら(lat, lng)）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT latitude, longitude FROM geocode WHERE address_key = ?",
+                (normalize_address(address),),
+            ).fetchone()
+        return None if row is None else (row[0], row[1])
+
+    def put(self, address, lat, lng):
+        """座標を保存"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?)",
+                (normalize_address(address), str(address), lat, lng, time.time()),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,65 +1,185 @@
-import pandas as pd
-import googlemaps
-import time
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
 import os
+import sys
+from pathlib import Path
 
+from geocode_cache import GeocodeCache, normalize_address
+from rate_limiter import RateLimiter
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.store_db import StoreDB
+from common.store_schema import (
+    TABELOG_SCHEMA,
+    is_columnar,
+    is_database,
+    read_table,
+    require_pyarrow,
+    write_table,
+)
+
+
+def geocode(gmaps_client, address):
+    """Geocoding APIで住所から座標を取得（API呼び出しの例外はそのまま送出）"""
+    result = gmaps_client.geocode(address)
+    if result:
+        location = result[0]["geometry"]["location"]
+        return location["lat"], location["lng"]
+    return None, None
+
+
+def get_coordinates(gmaps_client, address, cache=None):
+    """住所から座標を取得する関数（cacheがあればキャッシュを優先）"""
+    if cache is not None:
+        cached = cache.get(address)
+        if cached is not None:
+            return cached
 
-def get_coordinates(gmaps_client, address):
-    """住所から座標を取得する関数"""
     try:
         # Geocoding APIを使用して住所から座標を取得
-        result = gmaps_client.geocode(address)
-        if result:
-            location = result[0]["geometry"]["location"]
-            return location["lat"], location["lng"]
-        return None, None
+        lat, lng = geocode(gmaps_client, address)
     except Exception as e:
         print(f"Error getting coordinates for {address}: {e}")
         return None, None
 
+    if cache is not None:
+        cache.put(address, lat, lng)
+    return lat, lng
+
+
+def geocode_addresses(
+    gmaps_client, addresses, cache, max_workers=5, requests_per_second=10.0
+):
+    """住所のリストをまとめてジオコーディング（キャッシュにない住所だけを並行してAPIに送る）"""
+    results = {}
+    misses = {}
+    for address in addresses:
+        key = normalize_address(address)
+        if key in results or key in misses:
+            continue
+        cached = cache.get(address)
+        if cached is not None:
+            results[key] = cached
+        else:
+            misses[key] = address
+
+    print(f"キャッシュ: {len(results)}件ヒット / {len(misses)}件をAPIで取得")
+
+    limiter = RateLimiter(requests_per_second)
+
+    def fetch(address):
+        limiter.wait()
+        return get_coordinates(gmaps_client, address, cache)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for key, coordinates in zip(misses, executor.map(fetch, misses.values())):
+            results[key] = coordinates
+
+    return [results[normalize_address(address)] for address in addresses]
+
+
+def create_client():
+    """.envのAPI_KEYでGoogle Mapsのクライアントを作成（キーがなければNone）"""
+    import googlemaps
+    from dotenv import load_dotenv
 
-def main():
     # .envファイルから環境変数を読み込む
     load_dotenv()
 
     # 環境変数からAPIキーを取得
-    API_KEY = os.getenv("API_KEY")
-
-    if not API_KEY:
+    api_key = os.getenv("API_KEY")
+    if not api_key:
         print("Error: API_KEY not found in .env file")
-        return
+        return None
 
     # Google Maps クライアントを初期化
-    gmaps = googlemaps.Client(key=API_KEY)
+    return googlemaps.Client(key=api_key)
+
+
+def geocode_file(input_file, output_file=None, verbose=True):
+    """店舗データの住所から座標を取得してlatitude・longitudeを追加する
+
+    出力ファイルを省略すると<入力ファイル名>_with_coordinates.csvに保存する。
+    出力ファイルの拡張子が.parquet・.arrowならその形式で保存する（後段は必要なカラムだけを
+    型付きで読み込める）。
+    入力が店舗データベース（.sqlite）の場合はgeocode_dbで座標が未取得の店舗だけを更新する。
+    """
+    if is_database(input_file):
+        return geocode_db(input_file, verbose=verbose)
+
+    output_file = output_file or f"{os.path.splitext(input_file)[0]}_with_coordinates.csv"
+    # 有料のAPIを呼ぶ前に、出力形式に必要なpyarrowがあるかを確認する
+    if is_columnar(output_file):
+        require_pyarrow()
+
+    gmaps = create_client()
+    if gmaps is None:
+        return None
+    cache = GeocodeCache()
 
     # CSVファイルを読み込む
-    df = pd.read_csv("shinjuku_restaurants.csv")
-
-    # 新しい列を作成して座標を格納
-    df["latitude"] = None
-    df["longitude"] = None
-
-    # 各行の住所から座標を抽出
-    for index, row in df.iterrows():
-        lat, lng = get_coordinates(gmaps, row["住所"])
-        df.at[index, "latitude"] = lat
-        df.at[index, "longitude"] = lng
-
-        # 座標を表示
-        print(f"店舗名: {row['店舗名']}")
-        print(f"住所: {row['住所']}")
-        print(f"座標: 緯度={lat}, 経度={lng}")
-        print("-" * 50)  # 区切り線
-
-        # API制限を考慮して少し待機
-        time.sleep(0.5)
-
-    # 結果を新しいCSVファイルに保存
-    # 結果を新しいCSVファイルに保存
-    output_file = "shinjuku_restaurants_with_coordinates.csv"  # ここも修正！
-    df.to_csv(output_file, index=False)
+    df = read_table(input_file, TABELOG_SCHEMA)
+
+    # 各行の住所から座標を抽出（キャッシュ済みの住所はAPIを呼ばない）
+    coordinates = geocode_addresses(gmaps, df["住所"].tolist(), cache)
+    df["latitude"] = [lat for lat, _ in coordinates]
+    df["longitude"] = [lng for _, lng in coordinates]
+
+    if verbose:
+        for row, (lat, lng) in zip(df.itertuples(index=False), coordinates):
+            # 座標を表示
+            print(f"店舗名: {row.店舗名}")
+            print(f"住所: {row.住所}")
+            print(f"座標: 緯度={lat}, 経度={lng}")
+            print("-" * 50)  # 区切り線
+
+    cache.close()
+
+    write_table(df, output_file, TABELOG_SCHEMA)
     print(f"\nCompleted! Coordinates have been saved to {output_file}")
+    return output_file
+
+
+def geocode_db(db_file, verbose=True):
+    """店舗データベースのうち、座標が未取得か住所が変わった店舗だけをジオコーディングする
+
+    latitude・longitudeだけを1回のトランザクションで更新する。APIのエラーで座標を
+    取得できなかった店舗は未取得のまま残し、次回の実行で取得し直す。
+    """
+    gmaps = create_client()
+    if gmaps is None:
+        return None
+    db = StoreDB(db_file, "tabelog")
+    cache = GeocodeCache()
+    try:
+        pending = db.pending("geocode", ["店舗名", "住所"])
+        print(f"座標が未取得の店舗: {len(pending)}件 / 全{len(db)}件")
+
+        addresses = [address for _, _, address in pending]
+        coordinates = geocode_addresses(gmaps, addresses, cache)
+        updates = []
+        for (key, name, address), (lat, lng) in zip(pending, coordinates):
+            if verbose:
+                print(f"店舗名: {name}")
+                print(f"住所: {address}")
+                print(f"座標: 緯度={lat}, 経度={lng}")
+                print("-" * 50)  # 区切り線
+            # キャッシュにない住所はAPIのエラーで取得できなかった
+            if cache.get(address) is not None:
+                updates.append((key, (lat, lng)))
+        updated = db.update(updates, ["latitude", "longitude"], "geocode")
+    finally:
+        cache.close()
+        db.close()
+
+    print(f"\nCompleted! Coordinates of {updated} stores have been saved to {db_file}")
+    return db_file
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Error: 住所を含む店舗データのファイルを指定してください。")
+        return
+    geocode_file(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
 
 
 if __name__ == "__main__":
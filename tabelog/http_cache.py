@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+DEFAULT_TTL = 12 * 60 * 60  # キャッシュの有効期間(秒)
+
+
+def canonicalize_url(url):
+    """キャッシュキー用にURLを正規化（スキーム・ホストの小文字化、クエリの並び替え、フラグメント除去）"""
+    parts = urlsplit(url.strip())
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit(
+        (parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", query, "")
+    )
+
+
+class ResponseCache:
+    """正規化URLをキーにしたディスク上のレスポンスキャッシュ
+
+    TTL内のエントリはそのまま返し、期限切れのエントリは
+    ETag / Last-Modified を使った条件付きリクエストで再検証する。
+    """
+
+    def __init__(self, cache_dir=".http_cache", ttl=DEFAULT_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "stored": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url):
+        key = hashlib.sha256(canonicalize_url(url).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def load(self, url):
+        """キャッシュエントリを読み込む（存在しなければNone）"""
+        try:
+            with open(self._path(url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def is_fresh(self, entry):
+        return entry is not None and time.time() - entry["stored_at"] < self.ttl
+
+    def conditional_headers(self, entry):
+        """再検証用の条件付きリクエストヘッダーを作成"""
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url, text, headers):
+        """レスポンス本文と検証用ヘッダーを保存"""
+        entry = {
+            "url": canonicalize_url(url),
+            "stored_at": time.time(),
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "text": text,
+        }
+        self._write(url, entry)
+        self.stats["stored"] += 1
+        return entry
+
+    def touch(self, url, entry):
+        """304応答を受けたエントリの保存時刻を更新"""
+        entry["stored_at"] = time.time()
+        self._write(url, entry)
+        return entry
+
+    def _write(self, url, entry):
+        path = self._path(url)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def summary(self):
+        """ヒット・ミスの統計を文字列で返す"""
+        total = self.stats["hits"] + self.stats["revalidated"] + self.stats["misses"]
+        reused = self.stats["hits"] + self.stats["revalidated"]
+        rate = reused / total * 100 if total else 0.0
+        return (
+            f"Cache: {self.stats['hits']} hits, {self.stats['revalidated']} revalidated (304), "
+            f"{self.stats['misses']} misses ({rate:.1f}% reused)"
+        )
+
+
+class CachedResponse:
+    """キャッシュ経由で取得したレスポンス（ヘッダーは保存しないため空）"""
+
+    def __init__(self, url, text, status_code, from_cache):
+        self.url = url
+        self.text = text
+        self.status_code = status_code
+        self.from_cache = from_cache
+        self.headers = {}
+
+    def raise_for_status(self):
+        pass
+
+
+class CachedSession:
+    """requests.SessionにResponseCacheを組み合わせたセッション
+
+    validateを指定すると、ネットワークから取得したレスポンスを保存する前に呼び出す。
+    validateが例外を送出したレスポンス（CAPTCHAページなど）はキャッシュしない。
+    """
+
+    def __init__(self, session, cache, validate=None):
+        self.session = session
+        self.cache = cache
+        self.validate = validate
+
+    def get(self, url, headers=None):
+        entry = self.cache.load(url)
+        if self.cache.is_fresh(entry):
+            self.cache.stats["hits"] += 1
+            return CachedResponse(url, entry["text"], 200, True)
+
+        request_headers = dict(headers or {})
+        request_headers.update(self.cache.conditional_headers(entry))
+        response = self.session.get(url, headers=request_headers)
+
+        if response.status_code == 304 and entry is not None:
+            self.cache.stats["revalidated"] += 1
+            self.cache.touch(url, entry)
+            return CachedResponse(url, entry["text"], 200, True)
+
+        self.cache.stats["misses"] += 1
+        response.raise_for_status()
+        if self.validate:
+            self.validate(response)
+        self.cache.store(url, response.text, response.headers)
+        return response
@@ -0,0 +1,24 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """スレッド間で共有するレートリミッター"""
+
+    def __init__(self, requests_per_second=1.0):
+        if requests_per_second <= 0:
+            raise ValueError("requests_per_second must be positive")
+        self.interval = 1.0 / requests_per_second
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """次の送信枠まで待機"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
@@ -1,8 +1,26 @@
-import pandas as pd
-import folium
 import numpy as np
+import sys
 from math import radians, sin, cos, sqrt, atan2
 from datetime import datetime
+from pathlib import Path
+
+from spatial_index import EARTH_RADIUS, METERS_PER_DEGREE, GridIndex, haversine_matrix
+from route_solvers import RouteProblem, GreedySolver
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.store_db import StoreDB
+from common.store_record import RouteStore, records_from_frame
+from common.store_schema import TABELOG_SCHEMA, is_database, read_table
+
+
+# ルート探索と地図・経路の表示に使うカラム（Parquet/Arrowではこれ以外のカラムは読まない）
+ROUTE_COLUMNS = list(RouteStore.FIELDS)
+
+# 複数のルートを重ねるときに順番に使う線の色
+ROUTE_COLORS = ["blue", "red", "green", "purple", "orange", "darkred", "cadetblue"]
+
+# 地図に表示する地点がないときの中心（表参道駅）
+DEFAULT_CENTER = (35.6654, 139.7090)
 
 
 class RouteConfig:
@@ -15,6 +33,131 @@ class RouteConfig:
     WALKING_SPEED = 4.8  # 平均歩行速度(km/h)
 
 
+def map_file_name():
+    """現在時刻を含む地図のファイル名"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"optimal_route_{timestamp}.html"
+
+
+def read_route_stores(path, config, near=None):
+    """ルート探索に使うカラムの店舗データを読み込む
+
+    店舗データベース（.sqlite）からは評価点数がMIN_RATING以上の店舗だけを読み、
+    nearを指定するとその地点から総移動距離の上限の範囲（を囲む矩形）の店舗だけを
+    座標のインデックスで読む。
+    """
+    if not is_database(path):
+        return read_table(path, TABELOG_SCHEMA, columns=ROUTE_COLUMNS)
+
+    ranges = {"評価点数": (config.MIN_RATING, None)}
+    if near is not None:
+        lat_delta = config.MAX_TOTAL_DISTANCE / METERS_PER_DEGREE
+        lon_delta = lat_delta / cos(radians(near["latitude"]))
+        ranges["latitude"] = (near["latitude"] - lat_delta, near["latitude"] + lat_delta)
+        ranges["longitude"] = (near["longitude"] - lon_delta, near["longitude"] + lon_delta)
+    db = StoreDB(path, "tabelog")
+    try:
+        return db.read(ROUTE_COLUMNS, ranges)
+    finally:
+        db.close()
+
+
+def stores_geojson(stores):
+    """店舗のデータフレームをGeoJSONのFeatureCollectionにする（座標のない店舗は除く）"""
+    stores = stores.dropna(subset=["latitude", "longitude"])
+    features = [
+        {
+            "type": "Feature",
+            # 座標は小数点以下6桁（約10cm）に丸めてファイルを小さくする
+            "geometry": {"type": "Point", "coordinates": [round(lon, 6), round(lat, 6)]},
+            "properties": {"店舗名": name, "評価点数": rating},
+        }
+        for name, rating, lat, lon in zip(
+            stores["店舗名"].tolist(),
+            stores["評価点数"].tolist(),
+            stores["latitude"].tolist(),
+            stores["longitude"].tolist(),
+        )
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+
+def render_cluster_map(stores, routes=(), map_file=None):
+    """店舗全体をブラウザ側でクラスタリングする1つのGeoJSONレイヤーとして描画し、ルートを重ねる
+
+    店舗ごとにマーカーを書き出さないため、店舗数が数千件になってもHTMLが小さく開くのも速い。
+    routesはstart（開始地点）・stores（訪問店舗）・legs（各区間の距離）を持つ辞書のリスト
+    （BatchRoutePlanner.planの戻り値）。保存したJSONのように各店舗が「距離」を持つ場合は
+    legsがなくてもよい。距離は計算し直さない。
+    """
+    # 地図を作るときだけ読み込む（ルート計算だけならfoliumは不要）
+    import folium
+    from folium.plugins import MarkerCluster
+
+    # 地図の範囲は店舗とルートの地点から決める（どちらもなければDEFAULT_CENTERを中心にする）
+    stores = stores.dropna(subset=["latitude", "longitude"])
+    points = list(zip(stores["latitude"].tolist(), stores["longitude"].tolist()))
+    for route in routes:
+        points.append((route["start"]["latitude"], route["start"]["longitude"]))
+        points.extend((store["latitude"], store["longitude"]) for store in route["stores"])
+    if not points:
+        points = [DEFAULT_CENTER]
+    latitudes = [lat for lat, _ in points]
+    longitudes = [lon for _, lon in points]
+
+    m = folium.Map(
+        location=[sum(latitudes) / len(points), sum(longitudes) / len(points)],
+        zoom_start=15,
+        tiles="OpenStreetMap",
+        prefer_canvas=True,
+    )
+
+    # 店舗は1つのGeoJSONレイヤーにまとめ、ポップアップもレイヤー単位で設定する
+    # （GeoJsonPopupは空のレイヤーでは使えないため、店舗がなければレイヤーを作らない）
+    if len(stores):
+        cluster = MarkerCluster(name="店舗", disable_clustering_at_zoom=18).add_to(m)
+        folium.GeoJson(
+            stores_geojson(stores),
+            popup=folium.GeoJsonPopup(fields=["店舗名", "評価点数"]),
+        ).add_to(cluster)
+
+    for number, route in enumerate(routes):
+        color = ROUTE_COLORS[number % len(ROUTE_COLORS)]
+        start = route["start"]
+        legs = route.get("legs") or [store["距離"] for store in route["stores"]]
+        layer = folium.FeatureGroup(name=f"ルート: {start['name']}").add_to(m)
+
+        folium.Marker(
+            [start["latitude"], start["longitude"]],
+            popup=f"開始地点: {start['name']}",
+            icon=folium.Icon(color="red"),
+        ).add_to(layer)
+        for i, (store, distance) in enumerate(zip(route["stores"], legs), start=1):
+            folium.CircleMarker(
+                [store["latitude"], store["longitude"]],
+                radius=6,
+                color=color,
+                fill=True,
+                popup=(
+                    f"{i}. {store['店舗名']}<br>"
+                    f"評価点数: {store['評価点数']}<br>"
+                    f"前地点からの距離: {int(distance)}m"
+                ),
+            ).add_to(layer)
+
+        coordinates = [[start["latitude"], start["longitude"]]] + [
+            [store["latitude"], store["longitude"]] for store in route["stores"]
+        ]
+        folium.PolyLine(coordinates, weight=3, color=color, opacity=0.8).add_to(layer)
+
+    folium.LayerControl().add_to(m)
+    m.fit_bounds([[min(latitudes), min(longitudes)], [max(latitudes), max(longitudes)]])
+
+    map_file = map_file or map_file_name()
+    m.save(map_file)
+    return map_file
+
+
 class RouteOptimizer:
     def __init__(self, csv_file, start_point=None):
         # 表参道駅の座標をデフォルトの開始点とする
@@ -24,13 +167,19 @@ class RouteOptimizer:
             "longitude": 139.7090,
         }
 
-        # CSVファイルの読み込み
-        self.df = pd.read_csv(csv_file)
+        # 店舗データの読み込み（CSV・Parquet・Arrow・店舗データベースに対応）
         self.config = RouteConfig()
+        self.df = read_route_stores(csv_file, self.config, near=self.start_point)
+
+        # prepare_points()で作成する地点リストと距離行列
+        self.points = []
+        self.distance_matrix = None
+        self.problem = None
+        self._point_index = {}
 
     def calculate_distance(self, lat1, lon1, lat2, lon2):
         """二点間の距離をメートルで計算（Haversine公式）"""
-        R = 6371000  # 地球の半径（メートル）
+        R = EARTH_RADIUS
 
         lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
         dlat = lat2 - lat1
@@ -41,46 +190,68 @@ class RouteOptimizer:
 
         return R * c
 
-    def find_optimal_route(self):
-        """訪問順序を決定"""
-        # 評価点数でフィルタリング
-        filtered_df = self.df[self.df["評価点数"] >= self.config.MIN_RATING].copy()
-
-        route = [self.start_point]
-        remaining_locations = filtered_df.to_dict("records")
-        total_distance = 0
-
-        current_point = self.start_point
-
-        while remaining_locations and len(route) < self.config.MAX_LOCATIONS + 1:
-            # 現在地から指定距離以内の店舗を抽出
-            valid_locations = []
-            for loc in remaining_locations:
-                distance = self.calculate_distance(
-                    current_point["latitude"],
-                    current_point["longitude"],
-                    loc["latitude"],
-                    loc["longitude"],
-                )
-                if distance <= self.config.MAX_STORE_DISTANCE:
-                    valid_locations.append((loc, distance))
-
-            if not valid_locations:
-                break
-
-            # 距離が近い順にソート（同じ距離帯の場合は評価点数考慮）
-            # 距離を100mごとの帯に分けて、その中で評価点数を考慮
-            valid_locations.sort(key=lambda x: (int(x[1] / 100), -x[0]["評価点数"]))
-            next_location, distance = valid_locations[0]
-
-            # 総距離チェック
-            if total_distance + distance > self.config.MAX_TOTAL_DISTANCE:
-                break
-
-            route.append(next_location)
-            total_distance += distance
-            current_point = next_location
-            remaining_locations.remove(next_location)
+    def prepare_points(self):
+        """評価点数で絞り込んだ店舗と開始地点の距離行列を作成し、探索問題を組み立てる"""
+        # 評価点数でフィルタリング（ジオコーディングに失敗した座標のない店舗は除く）
+        filtered_df = self.df[self.df["評価点数"] >= self.config.MIN_RATING].dropna(
+            subset=["latitude", "longitude"]
+        )
+
+        # 開始地点から総移動距離の上限内にある店舗だけが訪問候補になる
+        store_index = GridIndex(
+            filtered_df["latitude"].to_numpy(),
+            filtered_df["longitude"].to_numpy(),
+            cell_size=self.config.MAX_STORE_DISTANCE,
+        )
+        reachable = store_index.query_radius(
+            self.start_point["latitude"],
+            self.start_point["longitude"],
+            self.config.MAX_TOTAL_DISTANCE,
+        )
+        stores = records_from_frame(filtered_df.iloc[reachable], RouteStore)
+
+        # 行列のインデックス0が開始地点、1以降が店舗
+        self.points = [self.start_point] + stores
+        self._point_index = {id(point): i for i, point in enumerate(self.points)}
+        latitudes = [point["latitude"] for point in self.points]
+        longitudes = [point["longitude"] for point in self.points]
+        self.distance_matrix = haversine_matrix(latitudes, longitudes)
+        self.problem = RouteProblem(
+            latitudes,
+            longitudes,
+            [0.0] + [point["評価点数"] for point in stores],
+            self.config,
+            distances=self.distance_matrix,
+        )
+        return self.problem
+
+    def distance_between(self, point_a, point_b):
+        """二地点間の距離を距離行列から取得（行列にない地点はその場で計算）"""
+        i = self._point_index.get(id(point_a))
+        j = self._point_index.get(id(point_b))
+        if i is not None and j is not None:
+            return float(self.distance_matrix[i, j])
+        return self.calculate_distance(
+            point_a["latitude"],
+            point_a["longitude"],
+            point_b["latitude"],
+            point_b["longitude"],
+        )
+
+    def route_legs(self, route):
+        """各地点の前地点からの距離のリスト（開始地点は0）"""
+        return [0.0] + [
+            self.distance_between(route[i - 1], route[i]) for i in range(1, len(route))
+        ]
+
+    def find_optimal_route(self, solver=None):
+        """訪問順序を決定（solver未指定時は貪欲法）"""
+        problem = self.prepare_points()
+        solver = solver or GreedySolver()
+        tour = solver.solve(problem)
+
+        route = [self.start_point] + [self.points[index] for index in tour]
+        total_distance = problem.route_length(tour)
 
         return route, total_distance
 
@@ -89,8 +260,23 @@ class RouteOptimizer:
         hours = distance / 1000 / self.config.WALKING_SPEED
         return int(hours * 60)
 
-    def create_map(self, route, total_distance):
-        """地図の作成"""
+    def create_map(self, route, total_distance, cluster=False, map_file=None):
+        """地図の作成
+
+        cluster=Trueのときは評価点数で絞り込んだ全店舗をクラスタリングして描画し、
+        その上にルートを重ねる（render_cluster_mapを参照）。
+        """
+        if cluster:
+            stores = self.df[self.df["評価点数"] >= self.config.MIN_RATING]
+            legs = self.route_legs(route)[1:]
+            return render_cluster_map(
+                stores,
+                [{"start": route[0], "stores": route[1:], "legs": legs}],
+                map_file,
+            )
+
+        import folium
+
         center_lat = sum(point["latitude"] for point in route) / len(route)
         center_lon = sum(point["longitude"] for point in route) / len(route)
 
@@ -100,6 +286,7 @@ class RouteOptimizer:
 
         # 経路を描画
         coordinates = []
+        legs = self.route_legs(route)
         for i, point in enumerate(route):
             # マーカーの色（開始点は赤、それ以外は青）
             color = "red" if i == 0 else "blue"
@@ -108,12 +295,7 @@ class RouteOptimizer:
             if i == 0:
                 popup_text = f"開始地点: {point['name']}"
             else:
-                distance = self.calculate_distance(
-                    route[i - 1]["latitude"],
-                    route[i - 1]["longitude"],
-                    point["latitude"],
-                    point["longitude"],
-                )
+                distance = legs[i]
                 popup_text = f"{i}. {point['店舗名']}\n"
                 popup_text += f"評価点数: {point['評価点数']}\n"
                 popup_text += f"前地点からの距離: {int(distance)}m"
@@ -131,24 +313,19 @@ class RouteOptimizer:
         folium.PolyLine(coordinates, weight=2, color="blue", opacity=0.8).add_to(m)
 
         # 現在時刻をファイル名に含める
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        map_file = f"optimal_route_{timestamp}.html"
+        map_file = map_file or map_file_name()
         m.save(map_file)
         return map_file
 
     def print_route(self, route, total_distance):
         """経路の詳細を表示"""
         print("\n=== 推奨訪問順序 ===")
+        legs = self.route_legs(route)
         for i, point in enumerate(route):
             if i == 0:
                 print(f"{i + 1}. {point['name']} (開始地点)")
             else:
-                distance = self.calculate_distance(
-                    route[i - 1]["latitude"],
-                    route[i - 1]["longitude"],
-                    point["latitude"],
-                    point["longitude"],
-                )
+                distance = legs[i]
                 print(f"{i + 1}. {point['店舗名']}")
                 print(f"   距離: 約{int(distance)}m")
                 print(f"   評価点数: {point['評価点数']}")
@@ -159,8 +336,12 @@ class RouteOptimizer:
 
 
 def main():
-    # RouteOptimizerのインスタンス作成
-    optimizer = RouteOptimizer("harajuku_restaurants_with_coordinates.csv")
+    if len(sys.argv) < 2:
+        print("Error: 座標を含む店舗データのファイルを指定してください。")
+        return
+
+    # RouteOptimizerのインスタンス作成（開始地点は表参道駅）
+    optimizer = RouteOptimizer(sys.argv[1])
 
     # 最適な経路を計算
     route, total_distance = optimizer.find_optimal_route()
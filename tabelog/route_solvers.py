@@ -0,0 +1,284 @@
+import math
+import random
+import time
+import numpy as np
+
+from spatial_index import GridIndex, haversine_matrix
+
+
+class RouteProblem:
+    """ルート探索の問題定義（インデックス0が開始地点、1以降が店舗）
+
+    各区間がMAX_STORE_DISTANCE以内、総距離がMAX_TOTAL_DISTANCE以内、
+    店舗数がMAX_LOCATIONS以下という制約のもとで評価点数の合計を最大化する
+    オリエンテーリング問題。
+    """
+
+    def __init__(self, latitudes, longitudes, scores, config, distances=None):
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        self.scores = np.asarray(scores, dtype=float)
+        self.config = config
+        self.distances = (
+            haversine_matrix(self.latitudes, self.longitudes)
+            if distances is None
+            else distances
+        )
+
+    def __len__(self):
+        return len(self.scores)
+
+    def build_index(self):
+        """店舗（インデックス1以降）の空間インデックスを作成"""
+        return GridIndex(
+            self.latitudes[1:],
+            self.longitudes[1:],
+            cell_size=self.config.MAX_STORE_DISTANCE,
+            ids=np.arange(1, len(self)),
+        )
+
+    def route_length(self, tour):
+        """開始地点から順に訪問したときの総距離"""
+        length = 0.0
+        previous = 0
+        for index in tour:
+            length += self.distances[previous, index]
+            previous = index
+        return float(length)
+
+    def score(self, tour):
+        """訪問店舗の評価点数の合計"""
+        return float(sum(self.scores[index] for index in tour))
+
+    def is_feasible(self, tour):
+        """距離・店舗数の制約を満たすか判定"""
+        if len(tour) > self.config.MAX_LOCATIONS:
+            return False
+        previous = 0
+        length = 0.0
+        for index in tour:
+            leg = self.distances[previous, index]
+            if leg > self.config.MAX_STORE_DISTANCE:
+                return False
+            length += leg
+            previous = index
+        return length <= self.config.MAX_TOTAL_DISTANCE
+
+
+class RouteSolver:
+    """ルート探索エンジンの基底クラス
+
+    solve()は時間予算内で見つかった最良の訪問順（店舗インデックスのリスト）を返す。
+    """
+
+    name = "base"
+
+    def __init__(self, time_budget=1.0):
+        self.time_budget = time_budget
+
+    def solve(self, problem):
+        raise NotImplementedError
+
+
+class GreedySolver(RouteSolver):
+    """近い順（100mごとの距離帯内では評価点数順）に店舗を選ぶ貪欲法"""
+
+    name = "greedy"
+
+    def solve(self, problem):
+        config = problem.config
+        distances = problem.distances
+        remaining = problem.build_index()
+
+        tour = []
+        total_distance = 0.0
+        current = 0
+
+        while len(remaining) and len(tour) < config.MAX_LOCATIONS:
+            # 現在地から指定距離以内の店舗を空間インデックスで抽出
+            row = distances[current]
+            candidates = remaining.query_radius(
+                problem.latitudes[current],
+                problem.longitudes[current],
+                config.MAX_STORE_DISTANCE,
+            )
+
+            if candidates.size == 0:
+                break
+
+            # 距離が近い順にソート（同じ距離帯の場合は評価点数考慮）
+            # 距離を100mごとの帯に分けて、その中で評価点数を考慮
+            bands = (row[candidates] / 100).astype(int)
+            order = np.lexsort((candidates, -problem.scores[candidates], bands))
+            next_index = int(candidates[order[0]])
+            distance = float(row[next_index])
+
+            # 総距離チェック
+            if total_distance + distance > config.MAX_TOTAL_DISTANCE:
+                break
+
+            tour.append(next_index)
+            total_distance += distance
+            current = next_index
+            remaining.remove(next_index)
+
+        return tour
+
+
+class AnnealingSolver(RouteSolver):
+    """焼きなまし法による局所探索
+
+    貪欲法の解から出発し、店舗の挿入・削除・入れ替え、2-opt（区間反転）、
+    Or-opt（1〜3店舗の区間移動）を近傍として評価点数の合計を最大化する。
+    総距離は同点時のタイブレークとしてわずかに考慮する。
+    """
+
+    name = "annealing"
+
+    DISTANCE_WEIGHT = 1e-4  # 総距離1mあたりのペナルティ
+    START_TEMPERATURE = 1.0
+    END_TEMPERATURE = 0.01
+
+    def __init__(self, time_budget=1.0, seed=None, max_iterations=None):
+        super().__init__(time_budget)
+        self.seed = seed
+        self.max_iterations = max_iterations
+
+    def _objective(self, problem, tour):
+        return problem.score(tour) - self.DISTANCE_WEIGHT * problem.route_length(tour)
+
+    def _neighbour(self, problem, tour, neighbours, rng):
+        """ランダムな近傍解を1つ生成"""
+        new_tour = list(tour)
+        move = rng.random()
+        visited = set(tour)
+
+        if move < 0.3 or not new_tour:
+            # 挿入: 直前の地点の近くにある未訪問店舗を差し込む
+            if len(new_tour) >= problem.config.MAX_LOCATIONS:
+                return None
+            position = rng.randint(0, len(new_tour))
+            previous = new_tour[position - 1] if position > 0 else 0
+            options = [i for i in neighbours[previous] if i not in visited]
+            if not options:
+                return None
+            new_tour.insert(position, rng.choice(options))
+        elif move < 0.45:
+            # 削除
+            del new_tour[rng.randrange(len(new_tour))]
+        elif move < 0.65:
+            # 入れ替え: 訪問中の店舗を近くの未訪問店舗と交換
+            position = rng.randrange(len(new_tour))
+            options = [i for i in neighbours[new_tour[position]] if i not in visited]
+            if not options:
+                return None
+            new_tour[position] = rng.choice(options)
+        elif move < 0.85:
+            # 2-opt: 区間を反転
+            if len(new_tour) < 2:
+                return None
+            i, j = sorted(rng.sample(range(len(new_tour)), 2))
+            new_tour[i : j + 1] = reversed(new_tour[i : j + 1])
+        else:
+            # Or-opt: 1〜3店舗の区間を別の位置へ移動
+            if len(new_tour) < 2:
+                return None
+            length = rng.randint(1, min(3, len(new_tour) - 1))
+            start = rng.randrange(len(new_tour) - length + 1)
+            segment = new_tour[start : start + length]
+            del new_tour[start : start + length]
+            position = rng.randint(0, len(new_tour))
+            new_tour[position:position] = segment
+
+        return new_tour
+
+    def _two_opt(self, problem, tour):
+        """2-optで総距離を短縮（改善がなくなるまで）"""
+        best = list(tour)
+        best_length = problem.route_length(best)
+        improved = True
+        while improved:
+            improved = False
+            for i in range(len(best) - 1):
+                for j in range(i + 1, len(best)):
+                    candidate = best[:i] + best[i : j + 1][::-1] + best[j + 1 :]
+                    length = problem.route_length(candidate)
+                    if length < best_length - 1e-9 and problem.is_feasible(candidate):
+                        best, best_length = candidate, length
+                        improved = True
+        return best
+
+    def _fill(self, problem, tour, neighbours):
+        """余った距離で挿入できる店舗を評価点数の高い順に追加"""
+        tour = list(tour)
+        while len(tour) < problem.config.MAX_LOCATIONS:
+            visited = set(tour)
+            best = None
+            for position in range(len(tour) + 1):
+                previous = tour[position - 1] if position > 0 else 0
+                for index in neighbours[previous]:
+                    if index in visited:
+                        continue
+                    candidate = tour[:position] + [index] + tour[position:]
+                    if not problem.is_feasible(candidate):
+                        continue
+                    value = self._objective(problem, candidate)
+                    if best is None or value > best[0]:
+                        best = (value, candidate)
+            if best is None:
+                break
+            tour = best[1]
+        return tour
+
+    def solve(self, problem):
+        rng = random.Random(self.seed)
+        config = problem.config
+        distances = problem.distances
+        neighbours = [
+            [
+                int(j)
+                for j in np.flatnonzero(distances[i] <= config.MAX_STORE_DISTANCE)
+                if j != 0 and j != i
+            ]
+            for i in range(len(problem))
+        ]
+
+        current = GreedySolver().solve(problem)
+        current_value = self._objective(problem, current)
+        best, best_value = list(current), current_value
+
+        started = time.perf_counter()
+        iteration = 0
+        while True:
+            elapsed = time.perf_counter() - started
+            if elapsed >= self.time_budget:
+                break
+            if self.max_iterations is not None and iteration >= self.max_iterations:
+                break
+            iteration += 1
+
+            progress = elapsed / self.time_budget if self.time_budget else 1.0
+            temperature = self.START_TEMPERATURE * (
+                self.END_TEMPERATURE / self.START_TEMPERATURE
+            ) ** progress
+
+            candidate = self._neighbour(problem, current, neighbours, rng)
+            if candidate is None or not problem.is_feasible(candidate):
+                continue
+
+            value = self._objective(problem, candidate)
+            delta = value - current_value
+            if delta >= 0 or rng.random() < math.exp(delta / temperature):
+                current, current_value = candidate, value
+                if value > best_value:
+                    best, best_value = list(candidate), value
+
+        # 最良解の距離を詰めて、空いた距離に店舗を追加
+        best = self._fill(problem, self._two_opt(problem, best), neighbours)
+        return best
+
+
+SOLVERS = {
+    GreedySolver.name: GreedySolver,
+    AnnealingSolver.name: AnnealingSolver,
+}
@@ -0,0 +1,121 @@
+import math
+import numpy as np
+
+
+EARTH_RADIUS = 6371000  # 地球の半径（メートル）
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS / 180
+
+
+def haversine_distances(lat, lon, latitudes, longitudes):
+    """一地点から複数地点への距離をメートルで計算（Haversine公式のベクトル版）"""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2 = np.radians(np.asarray(latitudes, dtype=float))
+    lon2 = np.radians(np.asarray(longitudes, dtype=float))
+
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(
+        (lon2 - lon1) / 2
+    ) ** 2
+    a = np.clip(a, 0.0, 1.0)
+    return EARTH_RADIUS * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def haversine_matrix(latitudes, longitudes):
+    """座標配列から全地点間の距離行列をメートルで計算（Haversine公式のベクトル版）"""
+    lat = np.radians(np.asarray(latitudes, dtype=float))
+    lon = np.radians(np.asarray(longitudes, dtype=float))
+    cos_lat = np.cos(lat)
+
+    # 行列の一時配列を作らないよう、2つの配列の上でその場で計算する（ピークは結果の2倍）
+    a = np.subtract.outer(lat, lat)
+    a *= 0.5
+    np.sin(a, out=a)
+    np.square(a, out=a)
+    b = np.subtract.outer(lon, lon)
+    b *= 0.5
+    np.sin(b, out=b)
+    np.square(b, out=b)
+    for row, cos_row in zip(b, cos_lat):
+        row *= cos_row * cos_lat
+    a += b
+    np.clip(a, 0.0, 1.0, out=a)
+
+    np.subtract(1.0, a, out=b)
+    np.sqrt(b, out=b)
+    np.sqrt(a, out=a)
+    np.arctan2(a, b, out=a)
+    a *= 2 * EARTH_RADIUS
+    return a
+
+
+class GridIndex:
+    """一様グリッドによる空間インデックス
+
+    座標を基準緯度で平面（メートル）に近似投影し、cell_size四方のセルに振り分ける。
+    半径検索は候補セルの地点だけを厳密な距離で判定するため、O(セル内の地点数)で済む。
+    """
+
+    def __init__(self, latitudes, longitudes, cell_size=500, ids=None):
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        self.ids = np.arange(len(self.latitudes)) if ids is None else np.asarray(ids)
+        self.cell_size = cell_size
+
+        self._lat0 = float(self.latitudes.mean()) if len(self.latitudes) else 0.0
+        self._lon0 = float(self.longitudes.mean()) if len(self.longitudes) else 0.0
+        self._x_scale = METERS_PER_DEGREE * math.cos(math.radians(self._lat0))
+
+        self._cells = {}
+        self._cell_of = {}
+        self._position = {}
+        for pos, (lat, lon, point_id) in enumerate(
+            zip(self.latitudes, self.longitudes, self.ids)
+        ):
+            key = self._cell_key(lat, lon)
+            self._cells.setdefault(key, set()).add(int(point_id))
+            self._cell_of[int(point_id)] = key
+            self._position[int(point_id)] = pos
+
+    def __len__(self):
+        return len(self._cell_of)
+
+    def __contains__(self, point_id):
+        return point_id in self._cell_of
+
+    def _cell_key(self, lat, lon):
+        x = (lon - self._lon0) * self._x_scale
+        y = (lat - self._lat0) * METERS_PER_DEGREE
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def remove(self, point_id):
+        """地点をインデックスから削除"""
+        point_id = int(point_id)
+        key = self._cell_of.pop(point_id, None)
+        if key is None:
+            return
+        cell = self._cells[key]
+        cell.discard(point_id)
+        if not cell:
+            del self._cells[key]
+
+    def query_radius(self, lat, lon, radius):
+        """指定地点から半径radius(m)以内の地点IDを昇順で返す"""
+        cx, cy = self._cell_key(lat, lon)
+        # 近似投影の誤差を吸収するため1セル分余分に探索
+        reach = math.ceil(radius / self.cell_size) + 1
+
+        found = []
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                cell = self._cells.get((cx + dx, cy + dy))
+                if cell:
+                    found.extend(cell)
+
+        if not found:
+            return np.empty(0, dtype=int)
+
+        found = np.sort(np.fromiter(found, dtype=int, count=len(found)))
+        positions = [self._position[point_id] for point_id in found]
+        distances = haversine_distances(
+            lat, lon, self.latitudes[positions], self.longitudes[positions]
+        )
+        return found[distances <= radius]
@@ -1,147 +1,656 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
 import requests
+import aiohttp
 from bs4 import BeautifulSoup
-import pandas as pd
+import sys
 import time
 import urllib.parse
+from pathlib import Path
 
+from crawl_frontier import CrawlFrontier, DETAIL_PAGE, LIST_PAGE
+from http_cache import ResponseCache, CachedSession, DEFAULT_TTL
 
-def scrape_tabelog(url, limit=5):
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Language": "ja,en-US;q=0.9,en;q=0.8",
-        "Accept-Encoding": "gzip, deflate, br",
-        "Connection": "keep-alive",
-        "Cache-Control": "max-age=0",
-    }
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.adaptive_limiter import (
+    AdaptiveLimiter,
+    ThrottledError,
+    TransientError,
+    check_status,
+    looks_like_captcha,
+    retry_call,
+)
+from common.metrics import CrawlMetrics, timed
+from common.store_record import TabelogStore, records_to_frame
+from common.store_schema import TABELOG_SCHEMA, write_table
+from common.store_state import StoreState, content_hash
 
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "ja,en-US;q=0.9,en;q=0.8",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Connection": "keep-alive",
+    "Cache-Control": "max-age=0",
+}
+
+AREA_NAME = "原宿・表参道・青山"
+
+# 東京都内のエリア（エリア名: 一覧ページのURL）
+TOKYO_AREAS = {
+    name: f"https://tabelog.com/tokyo/{code}/rstLst/cond58-00-00/"
+    for code, name in (
+        ("A1301", "銀座・新橋・有楽町"),
+        ("A1302", "東京・日本橋"),
+        ("A1303", "渋谷"),
+        ("A1304", "新宿・代々木・大久保"),
+        ("A1305", "池袋～高田馬場・早稲田"),
+        ("A1306", "原宿・表参道・青山"),
+        ("A1307", "六本木・麻布・広尾"),
+        ("A1308", "赤坂・永田町・溜池"),
+        ("A1309", "四ツ谷・市ヶ谷・飯田橋"),
+        ("A1310", "秋葉原・神田・水道橋"),
+        ("A1311", "上野・浅草・日暮里"),
+        ("A1312", "両国・錦糸町・小岩"),
+        ("A1313", "築地・湾岸・お台場"),
+        ("A1314", "浜松町・田町・品川"),
+        ("A1315", "大井・蒲田"),
+        ("A1316", "目黒・白金・五反田"),
+    )
+}
+
+
+def page_url_for(url, page):
+    """一覧ページのURLを生成"""
+    return f"{url}{page}/" if page > 1 else url
+
+
+def parse_list_page(html):
+    """一覧ページから店舗名・URL・評価点数を抽出"""
+    soup = BeautifulSoup(html, "lxml")
+    entries = []
+    for restaurant in soup.select("div.list-rst"):
+        url_elem = restaurant.select_one("a.list-rst__rst-name-target")
+        if not url_elem or "href" not in url_elem.attrs:
+            continue
+
+        name = url_elem.text.strip()
+        if not name:
+            continue
+
+        # 評価点数の取得
+        rating = ""
+        rating_elem = restaurant.select_one("span.list-rst__rating-val")
+        if rating_elem:
+            rating = rating_elem.text.strip()
+
+        entries.append({"name": name, "website": url_elem["href"], "rating": rating})
+    # 抽出した値は文字列にしてあるので、ページのツリーはここで解放する
+    soup.decompose()
+    return entries
+
+
+def parse_detail_page(html):
+    """詳細ページから住所・最寄駅・ジャンルを抽出"""
+    detail_soup = BeautifulSoup(html, "lxml")
+
+    # 住所の取得
+    address = ""
+    gmap_url = ""
+    address_elem = detail_soup.select_one("p.rstinfo-table__address")
+    if address_elem:
+        address = address_elem.text.strip()
+        gmap_url = f"https://www.google.com/maps/search/?api=1&query={urllib.parse.quote(address)}"
+
+    # 最寄駅・ジャンルの取得
+    station = ""
+    genre = ""
+    linktree = detail_soup.select("span.linktree__parent-target-text")
+    if linktree:
+        station = linktree[0].text.strip()
+    if len(linktree) > 1:
+        genre = linktree[1].text.strip()
+    detail_soup.decompose()
+
+    return {"address": address, "gmap_url": gmap_url, "station": station, "genre": genre}
+
+
+def build_record(entry, detail, area=AREA_NAME):
+    """一覧と詳細の情報からCSV出力用のレコードを作成"""
+    return TabelogStore.from_values(
+        (
+            entry["name"],
+            area,
+            detail.get("station", ""),
+            detail.get("genre", ""),
+            entry["website"],
+            detail.get("address", ""),
+            detail.get("gmap_url", ""),
+            entry["rating"],
+        )
+    )
+
+
+def snippet_hash(entry):
+    """一覧ページの情報（店舗名・URL・評価点数）のハッシュ"""
+    return content_hash(
+        {"name": entry["name"], "website": entry["website"], "rating": entry["rating"]}
+    )
+
+
+def record_snippet_hash(record):
+    return snippet_hash(
+        {"name": record["店舗名"], "website": record["食べログURL"], "rating": record["評価点数"]}
+    )
+
+
+def print_record(index, record):
+    """取得した店舗情報を表示"""
+    print(f"\nProcessing restaurant {index}:")
+    print(f"Name: {record['店舗名']}")
+    print(f"Website: {record['食べログURL']}")
+    for label, key in (
+        ("Rating", "評価点数"),
+        ("Address", "住所"),
+        ("Station", "最寄駅"),
+        ("Genre", "ジャンル"),
+    ):
+        if record[key]:
+            print(f"{label}: {record[key]}")
+
+
+def scrape_tabelog(
+    url,
+    limit=5,
+    async_mode=False,
+    max_concurrent=4,
+    requests_per_second=1.0,
+    cache_dir=None,
+    cache_ttl=DEFAULT_TTL,
+    parse_workers=None,
+    state_file=None,
+    delta_file="tabelog_delta.json",
+    metrics_file=None,
+    prometheus_file=None,
+    metrics_interval=10.0,
+):
+    def crawl(cache, state, metrics):
+        if async_mode:
+            return asyncio.run(
+                scrape_tabelog_async(
+                    url,
+                    limit=limit,
+                    max_concurrent=max_concurrent,
+                    requests_per_second=requests_per_second,
+                    cache=cache,
+                    parse_workers=parse_workers,
+                    state=state,
+                    metrics=metrics,
+                )
+            )
+        return _scrape_tabelog_sync(url, limit, cache, state, metrics)
+
+    return _run_crawl(
+        crawl,
+        cache_dir=cache_dir,
+        cache_ttl=cache_ttl,
+        state_file=state_file,
+        delta_file=delta_file,
+        metrics_file=metrics_file,
+        prometheus_file=prometheus_file,
+        metrics_interval=metrics_interval,
+    )
+
+
+def scrape_tabelog_areas(
+    areas,
+    limit=5,
+    max_concurrent=4,
+    max_per_host=None,
+    requests_per_second=1.0,
+    cache_dir=None,
+    cache_ttl=DEFAULT_TTL,
+    parse_workers=None,
+    state_file=None,
+    delta_file="tabelog_delta.json",
+    metrics_file=None,
+    prometheus_file=None,
+    metrics_interval=10.0,
+):
+    """複数エリアを1つのプロセスでまとめてクロールする（areasは{エリア名: 一覧ページのURL}）
+
+    limitはエリアごとの取得件数。全エリアのURLを1つのフロンティアで管理し、
+    ホストごとの同時接続数とリクエスト間隔の上限を全エリアで共有する。
+    """
+
+    def crawl(cache, state, metrics):
+        return asyncio.run(
+            scrape_areas_async(
+                areas,
+                limit=limit,
+                max_concurrent=max_concurrent,
+                max_per_host=max_per_host,
+                requests_per_second=requests_per_second,
+                cache=cache,
+                parse_workers=parse_workers,
+                state=state,
+                metrics=metrics,
+            )
+        )
+
+    return _run_crawl(
+        crawl,
+        cache_dir=cache_dir,
+        cache_ttl=cache_ttl,
+        state_file=state_file,
+        delta_file=delta_file,
+        metrics_file=metrics_file,
+        prometheus_file=prometheus_file,
+        metrics_interval=metrics_interval,
+    )
+
+
+def _run_crawl(
+    crawl,
+    cache_dir=None,
+    cache_ttl=DEFAULT_TTL,
+    state_file=None,
+    delta_file="tabelog_delta.json",
+    metrics_file=None,
+    prometheus_file=None,
+    metrics_interval=10.0,
+):
+    """キャッシュ・差分クロールの状態・メトリクスを用意してcrawl(cache, state, metrics)を実行"""
+    cache = ResponseCache(cache_dir, ttl=cache_ttl) if cache_dir else None
+    # 差分クロール: 一覧の情報が前回と同じ店舗は詳細ページを取得せず前回の結果を使う
+    state = StoreState(state_file) if state_file else None
+    # ステージごとの処理時間を集計し、指定があれば定期的にファイルへ書き出す
+    metrics = CrawlMetrics("tabelog")
+    metrics.start_reporter(metrics_file, prometheus_file, metrics_interval)
+    try:
+        results = crawl(cache, state, metrics)
+
+        if state and results:
+            for record in results:
+                state.update(
+                    record["食べログURL"], record, snippet_hash=record_snippet_hash(record)
+                )
+            with metrics.stage("write"):
+                counts = state.write_delta(delta_file)
+                state.save()
+            print(
+                f"\nDelta: {counts['added']} added, {counts['changed']} changed, "
+                f"{counts['removed']} removed -> {delta_file}"
+            )
+            if not state.complete:
+                print("Partial crawl: removed stores are not detected")
+        return results
+    finally:
+        metrics.stop_reporter()
+        print(f"\n{metrics.summary()}")
+        if cache:
+            print(cache.summary())
+
+
+def validate_response(response):
+    """アクセス制限の応答・CAPTCHAページなら例外を送出する（キャッシュには保存させない）"""
+    check_status(response.status_code, response.url, response.headers)
+    if looks_like_captcha(response.text):
+        raise ThrottledError(f"CAPTCHA {response.url}")
+
+
+def fetch_response(session, url, metrics):
+    """同期版のページ取得（スロットリング・一時的なエラーは指数バックオフで再試行）
+
+    キャッシュから返したレスポンスはリクエスト数・転送量に数えない。
+    """
+
+    def request():
+        try:
+            with metrics.stage("fetch"):
+                response = session.get(url, headers=HEADERS)
+        except requests.Timeout:
+            metrics.incr("timeouts")
+            raise
+        except requests.HTTPError as e:
+            # CachedSessionはエラー応答をHTTPErrorとして送出する
+            check_status(e.response.status_code, url, e.response.headers)
+            raise
+        if not getattr(response, "from_cache", False):
+            metrics.incr("requests")
+            metrics.incr("bytes", len(response.content))
+        validate_response(response)
+        return response
+
+    return retry_call(
+        request, retry_on=(requests.ConnectionError, requests.Timeout), metrics=metrics
+    )
+
+
+def _scrape_tabelog_sync(url, limit, cache=None, state=None, metrics=None):
+    metrics = metrics or CrawlMetrics("tabelog")
     session = requests.Session()
+    if cache:
+        # CAPTCHAページなどはキャッシュに保存する前に弾き、再試行でネットワークから取り直す
+        session = CachedSession(session, cache, validate=validate_response)
     restaurants = []
     seen_urls = set()
     page = 1
 
     while len(restaurants) < limit:
         try:
-            page_url = f"{url}{page}/" if page > 1 else url
+            page_url = page_url_for(url, page)
             print(f"\nFetching page {page}...")
 
-            response = session.get(page_url, headers=headers)
+            response = fetch_response(session, page_url, metrics)
             response.raise_for_status()
 
-            soup = BeautifulSoup(response.text, "lxml")
-            restaurant_list = soup.select("div.list-rst")
+            with metrics.stage("parse"):
+                entries = parse_list_page(response.text)
 
-            if not restaurant_list:
+            if not entries:
                 print("No more restaurants found.")
+                if state:
+                    # 一覧を最後まで取得できたときだけ削除された店舗を検出する
+                    state.complete = True
                 break
 
-            print(f"Found {len(restaurant_list)} restaurants on page {page}")
+            print(f"Found {len(entries)} restaurants on page {page}")
 
-            for restaurant in restaurant_list:
-                try:
-                    # 基本情報の取得
-                    url_elem = restaurant.select_one("a.list-rst__rst-name-target")
-                    if not url_elem or "href" not in url_elem.attrs:
-                        continue
-
-                    website = url_elem["href"]
-                    if website in seen_urls:
-                        continue
-                    seen_urls.add(website)
-
-                    name = url_elem.text.strip()
-                    if not name:
-                        continue
-
-                    print(f"\nProcessing restaurant {len(restaurants) + 1}:")
-                    print(f"Name: {name}")
-                    print(f"Website: {website}")
-
-                    # 評価点数の取得
-                    rating = ""
-                    rating_elem = restaurant.select_one("span.list-rst__rating-val")
-                    if rating_elem:
-                        rating = rating_elem.text.strip()
-                        print(f"Rating: {rating}")
-
-                    # 詳細ページから情報を取得
-                    try:
-                        detail_response = session.get(website, headers=headers)
-                        detail_soup = BeautifulSoup(detail_response.text, "lxml")
-
-                        # 住所の取得
-                        address = ""
-                        gmap_url = ""
-                        address_elem = detail_soup.select_one(
-                            "p.rstinfo-table__address"
-                        )
-                        if address_elem:
-                            address = address_elem.text.strip()
-                            gmap_url = f"https://www.google.com/maps/search/?api=1&query={urllib.parse.quote(address)}"
-                            print(f"Address: {address}")
-
-                        # 最寄駅の取得
-                        station = ""
-                        station_elem = detail_soup.select_one(
-                            "span.linktree__parent-target-text"
-                        )
-                        if station_elem:
-                            station = station_elem.text.strip()
-                            print(f"Station: {station}")
-
-                        # ジャンルの取得
-                        genre = ""
-                        genre_elem = detail_soup.select(
-                            "span.linktree__parent-target-text"
-                        )
-                        if len(genre_elem) > 1:
-                            genre = genre_elem[1].text.strip()
-                            print(f"Genre: {genre}")
-
-                        time.sleep(2)  # 詳細ページへのアクセス後の待機
-
-                    except Exception as e:
-                        print(f"Error fetching detail page: {e}")
-
-                    restaurants.append(
-                        {
-                            "店舗名": name,
-                            "エリア": "原宿・表参道・青山",
-                            "最寄駅": station,
-                            "ジャンル": genre,
-                            "食べログURL": website,
-                            "住所": address,
-                            "Google Maps": gmap_url,
-                            "評価点数": rating,
-                        }
-                    )
+            for entry in entries:
+                if entry["website"] in seen_urls:
+                    continue
+                seen_urls.add(entry["website"])
 
+                previous = (
+                    state.reusable(entry["website"], snippet_hash(entry)) if state else None
+                )
+                if previous:
+                    restaurants.append(TabelogStore(previous))
+                    metrics.incr("items")
+                    print(f"\nUnchanged: {entry['name']}")
                     if len(restaurants) >= limit:
                         return restaurants
+                    continue
 
+                # 詳細ページから情報を取得
+                detail = {}
+                try:
+                    detail_response = fetch_response(session, entry["website"], metrics)
+                    with metrics.stage("parse"):
+                        detail = parse_detail_page(detail_response.text)
+                    if not getattr(detail_response, "from_cache", False):
+                        with metrics.stage("wait"):
+                            time.sleep(2)  # 詳細ページへのアクセス後の待機
                 except Exception as e:
-                    print(f"Error processing restaurant: {e}")
-                    continue
+                    metrics.incr("errors")
+                    print(f"Error fetching detail page: {e}")
+                    if state:
+                        state.mark_failed(entry["website"])
+
+                record = build_record(entry, detail)
+                restaurants.append(record)
+                metrics.incr("items")
+                print_record(len(restaurants), record)
 
-                time.sleep(1)  # 各店舗の処理後の待機
+                if len(restaurants) >= limit:
+                    return restaurants
+
+                with metrics.stage("wait"):
+                    time.sleep(1)  # 各店舗の処理後の待機
 
             page += 1
-            time.sleep(2)  # ページ遷移前の待機
+            with metrics.stage("wait"):
+                time.sleep(2)  # ページ遷移前の待機
 
-        except requests.RequestException as e:
+        except (requests.RequestException, ThrottledError, TransientError) as e:
+            metrics.incr("errors")
             print(f"Error fetching URL: {e}")
             break
 
     return restaurants if restaurants else None
 
 
+async def fetch_text(session, limiter, url, cache=None, metrics=None):
+    """リミッターを通してページを取得（キャッシュがあれば条件付きリクエストで再検証）
+
+    429/503・CAPTCHA・タイムアウトはリミッターが同時実行数とレートを下げて再試行する。
+    """
+    metrics = metrics or CrawlMetrics("tabelog")
+    entry = cache.load(url) if cache else None
+    if cache and cache.is_fresh(entry):
+        cache.stats["hits"] += 1
+        return entry["text"]
+
+    headers = dict(HEADERS)
+    if cache:
+        headers.update(cache.conditional_headers(entry))
+
+    async def request():
+        try:
+            with metrics.stage("fetch"):
+                async with session.get(url, headers=headers) as response:
+                    metrics.incr("requests")
+                    if cache and response.status == 304 and entry is not None:
+                        return None
+                    check_status(response.status, url, response.headers)
+                    response.raise_for_status()
+                    text = await response.text()
+                    metrics.incr(
+                        "bytes", response.content_length or len(text.encode("utf-8"))
+                    )
+                    if looks_like_captcha(text):
+                        raise ThrottledError(f"CAPTCHA {url}")
+                    return text, response.headers
+        except asyncio.TimeoutError:
+            metrics.incr("timeouts")
+            raise
+
+    result = await limiter.call(
+        url, request, retry_on=(aiohttp.ClientConnectionError, asyncio.TimeoutError)
+    )
+    if result is None:
+        cache.stats["revalidated"] += 1
+        cache.touch(url, entry)
+        return entry["text"]
+
+    text, response_headers = result
+    if cache:
+        cache.stats["misses"] += 1
+        cache.store(url, text, response_headers)
+    return text
+
+
+async def run_parser(parse_pool, parser, html, metrics=None):
+    """HTMLの解析をプロセスプールで実行（プールがなければその場で実行）"""
+    metrics = metrics or CrawlMetrics("tabelog")
+    if parse_pool is None:
+        with metrics.stage("parse"):
+            return parser(html)
+    # 待ち時間ではなくワーカー内での解析時間を記録する
+    loop = asyncio.get_running_loop()
+    result, elapsed = await loop.run_in_executor(parse_pool, timed, parser, html)
+    metrics.record("parse", elapsed)
+    return result
+
+
+async def scrape_tabelog_async(
+    url,
+    limit=5,
+    max_concurrent=4,
+    requests_per_second=1.0,
+    cache=None,
+    parse_workers=None,
+    state=None,
+    metrics=None,
+    area=AREA_NAME,
+):
+    """一覧ページと詳細ページを並行して取得する非同期版のscrape_tabelog
+
+    待機時間は固定のsleepではなく、ホストごとのレートリミッターで制御する。
+    parse_workersを指定するとHTMLの解析をプロセスプールに任せ、取得と解析を並行させる。
+    戻り値はscrape_tabelogと同じ辞書のリスト。
+    """
+    return await scrape_areas_async(
+        {area: url},
+        limit=limit,
+        max_concurrent=max_concurrent,
+        requests_per_second=requests_per_second,
+        cache=cache,
+        parse_workers=parse_workers,
+        state=state,
+        metrics=metrics,
+    )
+
+
+async def scrape_areas_async(
+    areas,
+    limit=5,
+    max_concurrent=4,
+    max_per_host=None,
+    requests_per_second=1.0,
+    cache=None,
+    parse_workers=None,
+    state=None,
+    metrics=None,
+):
+    """複数エリアの一覧ページと詳細ページを1つのフロンティアから取得する
+
+    max_concurrent個のワーカーがフロンティアから一覧ページを優先して取り出す。
+    エリアごとに一覧ページを解析した時点で次のページを積むため、どのエリアの取得中も
+    他のエリアの一覧・詳細ページで接続数とレートの枠を使い切れる。
+    複数エリアに掲載されている店舗は最初に見つけたエリアで1回だけ取得する。
+    戻り値はエリアの順に並べたscrape_tabelogと同じ辞書のリスト。
+    """
+    metrics = metrics or CrawlMetrics("tabelog")
+    # 同時実行数はmax_concurrentを上限に、サーバーの応答を見ながら調整する
+    limiter = AdaptiveLimiter(
+        requests_per_second, max_concurrency=max_concurrent, metrics=metrics
+    )
+    parse_pool = ProcessPoolExecutor(parse_workers) if parse_workers else None
+    frontier = CrawlFrontier()
+    found = dict.fromkeys(areas, 0)
+    exhausted = set()  # 一覧を最後のページまで取得したエリア
+    slots = []  # 見つけた順の{"area", "entry", "record"}
+
+    async def crawl_list(session, url, area, base_url, page):
+        """一覧ページを解析して詳細ページと次の一覧ページを積む"""
+        print(f"\nFetching {area} page {page}...")
+        html = await fetch_text(session, limiter, url, cache, metrics)
+        page_entries = await run_parser(parse_pool, parse_list_page, html, metrics)
+        if not page_entries:
+            print(f"No more restaurants found in {area}.")
+            exhausted.add(area)
+            return
+        print(f"Found {len(page_entries)} restaurants on {area} page {page}")
+
+        for entry in page_entries:
+            if found[area] >= limit:
+                return
+            previous = (
+                state.reusable(entry["website"], snippet_hash(entry)) if state else None
+            )
+            if previous:
+                if not frontier.visit(entry["website"]):
+                    continue
+                slots.append({"area": area, "record": TabelogStore(previous)})
+                metrics.incr("items")
+                print(f"\nUnchanged: {entry['name']}")
+            else:
+                if not frontier.push(DETAIL_PAGE, entry["website"], len(slots)):
+                    continue
+                slots.append({"area": area, "entry": entry, "record": None})
+            found[area] += 1
+
+        next_page = page + 1
+        frontier.push(
+            LIST_PAGE,
+            page_url_for(base_url, next_page),
+            (area, base_url, next_page),
+        )
+
+    async def crawl_detail(session, url, index):
+        slot = slots[index]
+        try:
+            html = await fetch_text(session, limiter, url, cache, metrics)
+            detail = await run_parser(parse_pool, parse_detail_page, html, metrics)
+        except Exception as e:
+            metrics.incr("errors")
+            print(f"Error fetching detail page: {e}")
+            detail = {}
+            if state:
+                state.mark_failed(url)
+        # 一覧の情報はレコードを作ったら不要になる
+        slot["record"] = build_record(slot.pop("entry"), detail, slot["area"])
+        metrics.incr("items")
+        print_record(index + 1, slot["record"])
+
+    async def work(session):
+        while True:
+            priority, url, payload = await frontier.get()
+            try:
+                if priority == LIST_PAGE:
+                    await crawl_list(session, url, *payload)
+                else:
+                    await crawl_detail(session, url, payload)
+            except Exception as e:
+                # 一覧ページの取得に失敗したエリアはそこで打ち切る
+                metrics.incr("errors")
+                print(f"Error fetching URL: {e}")
+            finally:
+                frontier.task_done()
+
+    for area, base_url in areas.items():
+        frontier.push(LIST_PAGE, base_url, (area, base_url, 1))
+
+    connector = aiohttp.TCPConnector(
+        limit=max_concurrent, limit_per_host=max_per_host or max_concurrent
+    )
+    try:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            workers = [
+                asyncio.create_task(work(session)) for _ in range(max_concurrent)
+            ]
+            await frontier.join()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+    finally:
+        if parse_pool:
+            parse_pool.shutdown()
+    print(f"\n{limiter.summary()}")
+    if state and len(exhausted) == len(areas):
+        # 全エリアの一覧を最後まで取得できたときだけ削除された店舗を検出する
+        state.complete = True
+
+    # エリアの指定順、各エリア内は見つけた順に並べる
+    order = {area: i for i, area in enumerate(areas)}
+    restaurants = [
+        slot["record"] for slot in sorted(slots, key=lambda slot: order[slot["area"]])
+    ]
+    return restaurants if restaurants else None
+
+
 def main():
     url = "https://tabelog.com/tokyo/A1306/rstLst/cond58-00-00/"  # 原宿・表参道・青山エリアのURL
-    results = scrape_tabelog(url, limit=100)
+    # 複数エリアをまとめてクロールする場合はscrape_tabelog_areas（hikaricrawler crawl-tabelog）を使う
+    results = scrape_tabelog(
+        url,
+        limit=100,
+        async_mode=True,
+        cache_dir=".http_cache",
+        parse_workers=2,
+        state_file="harajuku_state.json",
+        delta_file="harajuku_delta.json",
+        metrics_file="harajuku_metrics.json",
+        prometheus_file="harajuku_metrics.prom",
+    )
 
     if results:
-        df = pd.DataFrame(results)
+        df = records_to_frame(results, TabelogStore.FIELDS)
         df.to_csv("harajuku_restaurants.csv", index=False, encoding="utf-8-sig")
+        write_table(df, "harajuku_restaurants.parquet", TABELOG_SCHEMA)
         print("\nデータの取得が完了しました！")
         print(f"取得件数: {len(results)}件")
         print("\n取得したデータ:")
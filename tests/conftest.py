@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# モジュールは兄弟インポートのため、各ディレクトリを検索パスに加える
+ROOT = Path(__file__).resolve().parent.parent
+for directory in (ROOT, ROOT / "tabelog", ROOT / "kyabakyaba"):
+    sys.path.insert(0, str(directory))
@@ -0,0 +1,56 @@
+import pytest
+
+from common.dedup import DedupIndex, address_floor, normalize_address
+
+BUILDING = "東京都新宿区歌舞伎町1-7-1 J2ビル"
+
+
+@pytest.fixture
+def index():
+    index = DedupIndex()
+    index.add("Club Rose", name="Club Rose", phone="03-1111-1111", address=BUILDING + "3F")
+    index.add(
+        "Fairy - フェアリー",
+        name="Fairy - フェアリー",
+        address="東京都新宿区歌舞伎町7丁目 12-3 ABCビル2F",
+    )
+    return index
+
+
+def test_different_phone_in_same_building_is_another_store(index):
+    assert (
+        index.find_duplicate(
+            name="Club Ruby", phone="03-2222-2222", address=BUILDING + "5F"
+        )
+        is None
+    )
+
+
+def test_similar_name_in_same_building_is_another_store(index):
+    assert index.find_duplicate(name="Lounge Rose", address=BUILDING) is None
+    assert index.find_duplicate(name="Club Rose", address=BUILDING + "6F") is None
+
+
+def test_same_store_with_different_address_notation(index):
+    assert (
+        index.find_duplicate(name="CLUB ROSE", address="新宿区歌舞伎町1丁目7番1号 3階")
+        == 0
+    )
+
+
+def test_name_only_matches_store_with_address(index):
+    assert index.find_duplicate(name="Fairy") == 1
+
+
+@pytest.mark.parametrize(
+    "address, expected, floor",
+    [
+        ("新宿区歌舞伎町7丁目 12-3", "新宿区歌舞伎町7-12-3", ""),
+        ("新宿区歌舞伎町1丁目7番1号 2F", "新宿区歌舞伎町1-7-1", "2"),
+        ("新宿区歌舞伎町１－７－１　Ｊ２ビル３Ｆ", "新宿区歌舞伎町1-7-1", "3"),
+        ("新宿区歌舞伎町1-7-1 地下1階", "新宿区歌舞伎町1-7-1", "B1"),
+    ],
+)
+def test_normalize_address(address, expected, floor):
+    assert normalize_address(address) == expected
+    assert address_floor(address) == floor
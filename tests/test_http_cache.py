@@ -0,0 +1,81 @@
+import pytest
+
+import common.adaptive_limiter
+from common.adaptive_limiter import ThrottledError
+from common.metrics import CrawlMetrics
+from http_cache import CachedSession, ResponseCache
+from tabecrawler import fetch_response, validate_response
+
+URL = "https://tabelog.com/tokyo/A1306/rstLst/cond58-00-00/"
+PAGE = "<html><head><title>原宿のレストラン</title></head><body>ok</body></html>"
+CAPTCHA = "<html><head><title>CAPTCHA</title></head><body>robot?</body></html>"
+
+
+class FakeResponse:
+    def __init__(self, url, text, status_code=200):
+        self.url = url
+        self.text = text
+        self.content = text.encode("utf-8")
+        self.status_code = status_code
+        self.headers = {"ETag": '"v1"'}
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    """順番にレスポンスを返すrequests.Sessionの代わり"""
+
+    def __init__(self, *texts):
+        self.texts = list(texts)
+        self.calls = 0
+
+    def get(self, url, headers=None):
+        self.calls += 1
+        return FakeResponse(url, self.texts.pop(0))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "cache"))
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(common.adaptive_limiter.time, "sleep", lambda delay: None)
+
+
+def test_same_url_twice_is_served_from_cache(cache):
+    network = FakeSession(PAGE)
+    session = CachedSession(network, cache, validate=validate_response)
+    metrics = CrawlMetrics("test")
+
+    first = fetch_response(session, URL, metrics)
+    second = fetch_response(session, URL, metrics)
+
+    assert first.text == second.text == PAGE
+    assert second.from_cache
+    assert network.calls == 1
+    assert cache.stats["hits"] == 1
+
+
+def test_captcha_page_is_not_cached(cache):
+    network = FakeSession(CAPTCHA, PAGE)
+    session = CachedSession(network, cache, validate=validate_response)
+
+    response = fetch_response(session, URL, CrawlMetrics("test"))
+
+    # CAPTCHAはキャッシュされず、再試行でネットワークから正しいページを取り直す
+    assert response.text == PAGE
+    assert network.calls == 2
+    assert cache.stats["hits"] == 0
+    assert cache.load(URL)["text"] == PAGE
+
+
+def test_rejected_response_leaves_cache_empty(cache):
+    session = CachedSession(FakeSession(CAPTCHA), cache, validate=validate_response)
+
+    with pytest.raises(ThrottledError):
+        session.get(URL)
+
+    assert cache.load(URL) is None